@@ -0,0 +1,198 @@
+"""
+Analítica vectorizada (NumPy) de tiempos de resolución de incidentes.
+
+Los datos llegan en una sola consulta como arrays: segundos hasta el cierre y,
+por cada dimensión (severidad, origen, responsable), un código entero por
+incidente más la lista de etiquetas. Para agrupar no se recorre ningún
+incidente en Python: cada dimensión se resuelve con una única ordenación de
+claves enteras `código << bits | segundos` (de 32 bits si caben), que deja
+cada grupo contiguo y ordenado. Percentiles, histogramas y cumplimiento de
+SLA se obtienen después con búsquedas e índices sobre ese array.
+"""
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.backend.core.constants import (
+    ANALYTICS_PERCENTILES,
+    ANALYTICS_HISTOGRAM_EDGES_HOURS,
+    SLA_RESOLUTION_TARGETS,
+)
+
+DIMENSIONS = ("severity", "source", "owner")
+
+# Límite de los segundos admitidos (~34.000 años): la clave de ordenación cabe en 64 bits
+_MAX_SECONDS = (1 << 40) - 1
+
+# Estado SLA de cada incidente (columna de la tabla de recuentos por grupo)
+SLA_NONE, SLA_MISSED, SLA_MET = 0, 1, 2
+
+HISTOGRAM_EDGES = np.array([int(hours * 3600) for hours in ANALYTICS_HISTOGRAM_EDGES_HOURS], dtype=np.int64)
+
+
+class Dimension(NamedTuple):
+    codes: np.ndarray  # int64, un código por incidente
+    labels: list  # etiqueta de cada código
+
+
+class ResolutionSample(NamedTuple):
+    """Incidentes cerrados: segundos hasta el cierre y códigos por dimensión"""
+    seconds: np.ndarray
+    dimensions: dict[str, Dimension]
+
+    @property
+    def size(self) -> int:
+        return len(self.seconds)
+
+
+def factorize(values: Sequence, count: int) -> Dimension:
+    """Convertir una columna en códigos enteros consecutivos (en orden de aparición)"""
+    labels = list(dict.fromkeys(values))
+    index = {label: code for code, label in enumerate(labels)}
+    codes = np.fromiter(map(index.__getitem__, values), dtype=np.int64, count=count)
+    return Dimension(codes, labels)
+
+
+def sample_from_rows(rows: list[tuple]) -> ResolutionSample:
+    """Construir la muestra a partir de filas (segundos, severidad, origen, responsable)"""
+    count = len(rows)
+    columns = list(zip(*rows)) if rows else [()] * (1 + len(DIMENSIONS))
+    seconds = np.fromiter(columns[0], dtype=np.int64, count=count)
+    dimensions = {name: factorize(column, count) for name, column in zip(DIMENSIONS, columns[1:])}
+    return ResolutionSample(np.clip(seconds, 0, _MAX_SECONDS), dimensions)
+
+
+def _percentiles(values_at, starts: np.ndarray, counts: np.ndarray) -> dict[int, np.ndarray]:
+    """
+    Percentiles con interpolación lineal (mismo criterio que np.percentile).
+
+    `values_at(indices)` devuelve los valores en esas posiciones de un array en
+    el que cada grupo ocupa el tramo ordenado [start, start + count).
+    """
+    nonempty = counts > 0
+    percentiles = {}
+    for pct in ANALYTICS_PERCENTILES:
+        position = starts + np.maximum(counts - 1, 0) * (pct / 100)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, starts + np.maximum(counts - 1, 0))
+        if nonempty.any():
+            low_values = values_at(np.where(nonempty, lower, 0))
+            high_values = values_at(np.where(nonempty, upper, 0))
+            values = low_values + (high_values - low_values) * (position - lower)
+        else:
+            values = np.zeros(len(counts))
+        percentiles[pct] = np.where(nonempty, values, np.nan)
+    return percentiles
+
+
+def _key_dtype(bits: int) -> type:
+    """Entero sin signo más pequeño para las claves: ordenar 32 bits cuesta la mitad que 64"""
+    return np.uint32 if bits <= 32 else np.uint64
+
+
+def _group_stats(
+    seconds: np.ndarray,
+    seconds_float: np.ndarray,
+    seconds_bits: int,
+    codes: np.ndarray,
+    groups: int,
+    sla_state: np.ndarray,
+) -> dict:
+    """Recuento, suma, percentiles, histograma y SLA por grupo (arrays de longitud `groups`)"""
+    dtype = _key_dtype(seconds_bits + groups.bit_length())
+    mask = (1 << seconds_bits) - 1
+
+    # Operaciones en el sitio: un único array temporal de N enteros por paso
+    keys = codes.astype(dtype)
+    keys <<= seconds_bits
+    keys |= seconds.astype(dtype, copy=False)
+    keys.sort()
+
+    # Una sola pasada para recuento y SLA: columnas SLA_NONE / SLA_MISSED / SLA_MET
+    state_codes = codes * 3
+    state_codes += sla_state
+    states = np.bincount(state_codes, minlength=groups * 3).reshape(groups, 3)
+    counts = states.sum(axis=1)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+
+    # Histograma: límites de cada cubeta buscados dentro del tramo ordenado de cada grupo
+    # (un límite mayor que cualquier valor apunta al inicio del grupo siguiente)
+    edges = np.minimum(HISTOGRAM_EDGES, mask + 1)
+    bounds = (np.arange(groups, dtype=np.int64)[:, None] << seconds_bits) + edges[None, :]
+    positions = np.searchsorted(keys, bounds.ravel().astype(dtype)).reshape(groups, len(HISTOGRAM_EDGES))
+
+    return {
+        "count": counts,
+        "sum": np.bincount(codes, weights=seconds_float, minlength=groups),
+        "percentiles": _percentiles(lambda idx: keys[idx] & dtype(mask), starts, counts),
+        "histogram": np.diff(np.concatenate([positions, ends[:, None]], axis=1), axis=1),
+        "sla_eligible": states[:, SLA_MISSED] + states[:, SLA_MET],
+        "sla_met": states[:, SLA_MET],
+    }
+
+
+def _overall_stats(seconds: np.ndarray, seconds_bits: int, partial: dict) -> dict:
+    """Totales a partir de los grupos de cualquier dimensión; los percentiles requieren ordenar"""
+    totals = {
+        key: partial[key].sum(axis=0, keepdims=True)
+        for key in ("count", "sum", "histogram", "sla_eligible", "sla_met")
+    }
+    ordered = np.sort(seconds.astype(_key_dtype(seconds_bits)))
+    starts, counts = np.zeros(1, dtype=np.int64), np.array([len(seconds)])
+    totals["percentiles"] = _percentiles(lambda idx: ordered[idx], starts, counts)
+    return totals
+
+
+def _number(value: float, digits: int = 1) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _rows(labels: list, stats: dict) -> list[dict]:
+    rows = []
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = stats["sum"] / stats["count"]
+        sla_ratio = stats["sla_met"] / stats["sla_eligible"]
+    for idx, label in enumerate(labels):
+        rows.append({
+            "value": label,
+            "count": int(stats["count"][idx]),
+            "mean_seconds": _number(mean[idx]),
+            **{f"p{pct}_seconds": _number(values[idx]) for pct, values in stats["percentiles"].items()},
+            "sla_met_ratio": _number(sla_ratio[idx], 4),
+            "histogram": stats["histogram"][idx].tolist(),
+        })
+    rows.sort(key=lambda row: -row["count"])
+    return rows
+
+
+def resolution_report(sample: ResolutionSample) -> dict:
+    """Percentiles, histogramas y cumplimiento de SLA globales y por dimensión"""
+    seconds = sample.seconds
+    severity = sample.dimensions["severity"]
+
+    # Objetivo SLA de cada incidente según su severidad (sin objetivo: no cuenta)
+    targets = np.array([SLA_RESOLUTION_TARGETS.get(label, -1) for label in severity.labels], dtype=np.int64)
+    incident_targets = targets[severity.codes] if len(targets) else np.zeros(0, dtype=np.int64)
+    sla_state = np.where(seconds <= incident_targets, SLA_MET, SLA_MISSED)
+    if (targets < 0).any():
+        sla_state[incident_targets < 0] = SLA_NONE
+
+    report = {
+        "count": sample.size,
+        "percentiles": list(ANALYTICS_PERCENTILES),
+        "histogram_edges_hours": list(ANALYTICS_HISTOGRAM_EDGES_HOURS),
+        "sla_targets_seconds": SLA_RESOLUTION_TARGETS,
+    }
+    # bincount convierte los pesos a float: una sola conversión para todas las dimensiones
+    seconds_float = seconds.astype(np.float64)
+    # Bits que ocupan los segundos: las claves de ordenación son tan estrechas como sea posible
+    seconds_bits = max(int(seconds.max()).bit_length(), 1) if sample.size else 1
+    by_dimension = {}
+    for name, dimension in sample.dimensions.items():
+        stats = _group_stats(seconds, seconds_float, seconds_bits, dimension.codes, len(dimension.labels), sla_state)
+        by_dimension[f"by_{name}"] = _rows(dimension.labels, stats)
+        if name == "severity":
+            report["overall"] = _rows([None], _overall_stats(seconds, seconds_bits, stats))[0]
+    report.update(by_dimension)
+    return report
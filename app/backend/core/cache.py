@@ -0,0 +1,193 @@
+"""
+Cachés en memoria del proceso (TTL + límite LRU) con contadores de aciertos.
+
+Cada worker de uvicorn mantiene su propia copia; las invalidaciones explícitas
+son inmediatas en el proceso que escribe y el TTL acota el desfase en el resto,
+salvo en las cachés sincronizadas con un contador de revisión compartido
+(`sync_revision`), que se vacían en cuanto otro worker lo incrementa.
+Una carga que empezó antes de una invalidación no guarda su resultado (ya
+obsoleto) al terminar.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from app.backend.core.constants import (
+    USER_CACHE_MAX_SIZE,
+    USER_CACHE_TTL_SECONDS,
+    FACET_CACHE_MAX_SIZE,
+    FACET_CACHE_TTL_SECONDS,
+    DASHBOARD_CACHE_TTL_SECONDS,
+    TREND_CACHE_TTL_SECONDS,
+    TREND_CACHE_MAX_SIZE,
+    ANALYTICS_CACHE_TTL_SECONDS,
+    ANALYTICS_CACHE_MAX_SIZE,
+    OWNER_NAMES_CACHE_TTL_SECONDS,
+)
+
+
+class TTLCache:
+    """Caché LRU acotada con expiración por entrada"""
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Cambia con cada invalidación: descarta las cargas que empezaron antes
+        self._generation = 0
+        # Último contador de revisión compartido visto (sync_revision)
+        self._revision: Optional[int] = None
+        # Última lectura por clave (acotado como las entradas), para precalcular solo lo que se usa
+        self._last_read: OrderedDict[Hashable, float] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Obtener un valor vigente (None si no existe o ha expirado)"""
+        now = time.monotonic()
+        with self._lock:
+            self._last_read[key] = now
+            self._last_read.move_to_end(key)
+            if len(self._last_read) > self.max_size:
+                self._last_read.popitem(last=False)
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> bool:
+        """
+        Guardar un valor, desalojando el menos usado si se supera el límite.
+
+        Con `generation` (la de antes de calcular el valor) no se guarda si la
+        caché se ha invalidado desde entonces; retorna si se ha guardado.
+        """
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], refresh: bool = False) -> Any:
+        """
+        Devolver el valor cacheado o calcularlo con `loader` (no se cachean None).
+
+        Con `refresh` se recalcula siempre y se renueva el TTL (precálculo en segundo plano).
+        """
+        value = None if refresh else self.get(key)
+        if value is None:
+            generation = self._generation
+            value = loader()
+            if value is not None:
+                self.set(key, value, generation)
+        return value
+
+    def needs_warming(self, key: Hashable, horizon: float, idle: float) -> bool:
+        """
+        Si conviene precalcular `key`: se ha leído en los últimos `idle`
+        segundos y falta (invalidada o caducada) o caduca antes de `horizon`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            last_read = self._last_read.get(key)
+            if last_read is None or now - last_read > idle:
+                return False
+            item = self._data.get(key)
+            return item is None or item[0] - now < horizon
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Eliminar las entradas que cumplan el predicado (retorna cantidad eliminada)"""
+        with self._lock:
+            self._generation += 1
+            keys = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def sync_revision(self, revision: int) -> bool:
+        """Vaciar la caché si el contador compartido ha cambiado desde la última llamada (retorna si se ha vaciado)"""
+        with self._lock:
+            if revision == self._revision:
+                return False
+            self._revision = revision
+            self._generation += 1
+            self._data.clear()
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# Usuarios autenticados indexados por email (cookie de sesión)
+user_cache = TTLCache("users", USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+
+# Facetas de filtros de incidentes indexadas por la combinación de filtros aplicada
+facet_cache = TTLCache("facets", FACET_CACHE_MAX_SIZE, FACET_CACHE_TTL_SECONDS)
+
+# Agregados del dashboard (una única entrada compartida)
+dashboard_cache = TTLCache("dashboard", 1, DASHBOARD_CACHE_TTL_SECONDS)
+
+# Gráficas de tendencia indexadas por (ventana, resolución, zona horaria)
+trend_cache = TTLCache("trend", TREND_CACHE_MAX_SIZE, TREND_CACHE_TTL_SECONDS)
+
+# Informes de tiempos de resolución indexados por rango de fechas
+analytics_cache = TTLCache("analytics", ANALYTICS_CACHE_MAX_SIZE, ANALYTICS_CACHE_TTL_SECONDS)
+
+# Nombre de cada usuario por id para mostrar responsables (una única entrada)
+owner_names_cache = TTLCache("owner_names", 1, OWNER_NAMES_CACHE_TTL_SECONDS)
+
+ALL_CACHES = (user_cache, facet_cache, dashboard_cache, trend_cache, analytics_cache, owner_names_cache)
+
+
+def invalidate_incident_caches() -> None:
+    """Invalidar las cachés derivadas de la tabla de incidentes (tras cualquier escritura)"""
+    facet_cache.clear()
+    dashboard_cache.clear()
+    trend_cache.clear()
+    analytics_cache.clear()
+
+
+def invalidate_user(email: Optional[str] = None, user_id: Optional[int] = None) -> None:
+    """Invalidar un usuario por email y/o id (el email puede haber cambiado)"""
+    owner_names_cache.clear()
+    if email:
+        user_cache.invalidate(email)
+    if user_id is not None:
+        user_cache.invalidate_where(lambda _, cached: cached.id == user_id)
@@ -0,0 +1,172 @@
+"""
+Difusión de cambios de incidentes entre workers de un mismo host.
+
+El bus de eventos (`core/events.py`) es por proceso: con varios workers de
+uvicorn, un dashboard conectado a uno no recibiría las escrituras atendidas
+por otro y sus KPIs, que se mantienen sumando deltas, se desviarían. Cada
+worker añade sus cambios confirmados a un registro en un fichero SQLite (WAL)
+común a todos los procesos del host (`CYBERWATCH_CHANGE_LOG_DB`, por defecto
+`./changes.db`), como el rate limiting y las métricas. Una tarea lee cada
+CHANGE_LOG_POLL_INTERVAL segundos las entradas nuevas de los demás workers,
+invalida las cachés de incidentes de este y las vuelve a publicar en su bus
+marcadas como remotas (no se registran de nuevo). Las entradas de más de
+CHANGE_LOG_RETENTION_SECONDS se purgan cada CHANGE_LOG_PURGE_EVERY escrituras.
+
+`CYBERWATCH_CHANGE_LOG=off` lo desactiva (despliegues de un solo worker).
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from app.backend.core.cache import invalidate_incident_caches
+from app.backend.core.constants import CHANGE_LOG_POLL_INTERVAL, CHANGE_LOG_RETENTION_SECONDS, CHANGE_LOG_PURGE_EVERY
+from app.backend.core.events import EventBus, IncidentChange, incident_events
+from app.backend.core.metrics import WORKER_ID
+from app.backend.repositories.incident_repository import IncidentRow
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG_ENABLED = os.getenv("CYBERWATCH_CHANGE_LOG", "on") != "off"
+CHANGE_LOG_PATH = os.getenv("CYBERWATCH_CHANGE_LOG_DB", "./changes.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incident_change (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    worker TEXT NOT NULL,
+    created REAL NOT NULL,
+    payload TEXT NOT NULL
+)
+"""
+
+_ROW_DATETIMES = ("detected_at", "updated_at")
+_CHANGE_DATETIMES = ("closed_before", "closed_after", "ts")
+
+
+def _encode_datetime(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"No serializable: {type(value).__name__}")
+
+
+def _parse_datetimes(values: dict, fields: tuple[str, ...]) -> dict:
+    for field in fields:
+        if isinstance(values.get(field), str):
+            values[field] = datetime.fromisoformat(values[field])
+    return values
+
+
+def encode_change(change: IncidentChange) -> str:
+    values = change._asdict()
+    for field in ("before", "after"):
+        values[field] = values[field]._asdict() if values[field] is not None else None
+    del values["remote"]
+    return json.dumps(values, default=_encode_datetime, separators=(",", ":"))
+
+
+def decode_change(payload: str) -> IncidentChange:
+    values = _parse_datetimes(json.loads(payload), _CHANGE_DATETIMES)
+    for field in ("before", "after"):
+        if values[field] is not None:
+            values[field] = IncidentRow(**_parse_datetimes(values[field], _ROW_DATETIMES))
+    return IncidentChange(**values, remote=True)
+
+
+class ChangeLog:
+    """Registro compartido de cambios: escribe los de este worker y republica los de los demás"""
+
+    def __init__(self, bus: EventBus, path: str = CHANGE_LOG_PATH, poll_interval: float = CHANGE_LOG_POLL_INTERVAL):
+        self.bus = bus
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._last_id = 0
+        self._writes = 0
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.received = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Perder los últimos cambios en una caída del sistema solo retrasa la resincronización
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def record(self, change: IncidentChange) -> None:
+        """Suscriptor del bus: añadir un cambio de este worker al registro"""
+        if change.remote:
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO incident_change (worker, created, payload) VALUES (?, ?, ?)",
+                (WORKER_ID, time.time(), encode_change(change)),
+            )
+        self.recorded += 1
+        self._writes += 1
+        if self._writes % CHANGE_LOG_PURGE_EVERY == 0:
+            self.purge()
+
+    def purge(self, max_age: float = CHANGE_LOG_RETENTION_SECONDS) -> int:
+        conn = self._connect()
+        with conn:
+            return conn.execute("DELETE FROM incident_change WHERE created < ?", (time.time() - max_age,)).rowcount
+
+    def read_new(self) -> list[IncidentChange]:
+        """Cambios de otros workers posteriores a la última lectura, en orden"""
+        rows = self._connect().execute(
+            "SELECT id, payload FROM incident_change WHERE id > ? AND worker != ? ORDER BY id",
+            (self._last_id, WORKER_ID),
+        ).fetchall()
+        if rows:
+            self._last_id = rows[-1][0]
+        return [decode_change(payload) for _, payload in rows]
+
+    def start(self) -> None:
+        """Empezar a registrar y a leer desde el final actual (no se reproduce el historial)"""
+        self._last_id = self._connect().execute("SELECT coalesce(max(id), 0) FROM incident_change").fetchone()[0]
+        self.bus.subscribe(self.record)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        self.bus.unsubscribe(self.record)
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                changes = await asyncio.to_thread(self.read_new)
+            except Exception:
+                logger.exception("Error al leer el registro de cambios compartido")
+                continue
+            if not changes:
+                continue
+            self.received += len(changes)
+            # Las cachés de este worker no han visto esas escrituras
+            invalidate_incident_caches()
+            for change in changes:
+                self.bus.publish(change)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "recorded": self.recorded,
+            "received": self.received,
+            "last_id": self._last_id,
+        }
+
+
+change_log = ChangeLog(incident_events)
@@ -0,0 +1,95 @@
+"""
+Compresión gzip de respuestas de texto (HTML, JSON, CSV...).
+
+A diferencia de `GZipMiddleware` de Starlette, solo comprime tipos de texto
+(las imágenes y los estáticos precomprimidos pasan intactos), respeta un
+tamaño mínimo y en las respuestas en streaming vacía el compresor en cada
+fragmento, de modo que el cliente recibe los datos según se generan.
+"""
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.backend.core.constants import COMPRESSION_MIN_SIZE, COMPRESSION_LEVEL
+
+COMPRESSIBLE_TYPES = {
+    "text/html",
+    "application/json",
+    "text/csv",
+    "text/plain",
+    # Estáticos sin build previo (los del build ya llevan Content-Encoding)
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+}
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE, level: int = COMPRESSION_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("accept-encoding", ""):
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(send, self.minimum_size, self.level)
+        await self.app(scope, receive, responder.send_compressed)
+
+
+class _CompressionResponder:
+    """Estado de compresión de una única respuesta"""
+
+    def __init__(self, send: Send, minimum_size: int, level: int):
+        self.send = send
+        self.minimum_size = minimum_size
+        self.level = level
+        self.start_message: Message | None = None
+        self.compressor = None
+        self.passthrough = False
+
+    def should_compress(self, body: bytes, more_body: bool) -> bool:
+        headers = Headers(raw=self.start_message["headers"])
+        content_type = headers.get("content-type", "").split(";")[0].strip()
+        if "content-encoding" in headers or content_type not in COMPRESSIBLE_TYPES:
+            return False
+        return more_body or len(body) >= self.minimum_size
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Se retiene hasta conocer el primer fragmento del cuerpo
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not self.should_compress(body, more_body):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            # wbits=31: formato gzip
+            self.compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = "gzip"
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                compressed = self.compressor.compress(body) + self.compressor.flush()
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            await self.send(self.start_message)
+
+        flush_mode = zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+        compressed = self.compressor.compress(body) + self.compressor.flush(flush_mode)
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
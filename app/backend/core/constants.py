@@ -5,10 +5,29 @@ Constantes de la aplicación CyberWatch
 # Seguridad y autenticación
 BCRYPT_MAX_PASSWORD_LENGTH = 72
 SESSION_COOKIE_MAX_AGE = 3600  # 1 hora
+USER_CACHE_TTL_SECONDS = 60  # Solo acota cambios hechos fuera de UserRepository (los demás invalidan todos los workers)
+USER_CACHE_MAX_SIZE = 1024
+PASSWORD_HASH_WORKERS = 4  # Hilos dedicados a bcrypt por worker
+PASSWORD_HASH_MAX_PENDING = 64  # Operaciones en curso + en cola antes de rechazar
+
+# Cachés
+FACET_CACHE_TTL_SECONDS = 30  # Se invalida al escribir; el TTL cubre las escrituras de otros workers
+FACET_CACHE_MAX_SIZE = 256
+DASHBOARD_CACHE_TTL_SECONDS = 30  # Agregados del dashboard (página y estado inicial del stream)
+TREND_CACHE_TTL_SECONDS = 15  # Gráficas de tendencia por (ventana, resolución, zona horaria)
+TREND_CACHE_MAX_SIZE = 128
+TREND_MAX_BUCKETS = 1000  # Cubetas por gráfica; por encima se agrupan (p. ej. 90d/1h en cubetas de 3 h)
+ANALYTICS_CACHE_TTL_SECONDS = 60  # Informes de tiempos de resolución por rango de fechas
+ANALYTICS_CACHE_MAX_SIZE = 32
+OWNER_NAMES_CACHE_TTL_SECONDS = 60  # Nombres de responsables por id (renombrados en otros workers)
 
 # Paginación
 PAGINATION_OPTIONS = [10, 25, 100]
 DEFAULT_PER_PAGE = 25
+TIMELINE_PAGE_SIZE = 200
+API_DEFAULT_LIMIT = 50
+API_MAX_LIMIT = 200
+EXPORT_BATCH_SIZE = 1000  # Filas leídas por lote y escritas por fragmento al exportar CSV
 
 # Límites de tamaño
 MAX_LOG_FILE_SIZE = 1_000_000  # 1MB en caracteres
@@ -20,7 +39,88 @@ MAX_INCIDENT_TITLE_LENGTH = 200
 MAX_INCIDENT_DESCRIPTION_LENGTH = 5000
 MAX_INCIDENT_CODE_LENGTH = 50
 
+# Timeline de logs
+TIMELINE_CHUNK_SIZE = 64_000  # Caracteres leídos por consulta al recorrer un adjunto
+
+# Estáticos y compresión
+STATIC_IMMUTABLE_MAX_AGE = 31_536_000  # 1 año: los nombres con huella cambian con el contenido
+COMPRESSION_MIN_SIZE = 1024  # Bytes; por debajo la cabecera gzip no compensa
+COMPRESSION_LEVEL = 6
+
+# Instrumentación de consultas SQL por petición
+QUERY_REPEAT_WARN_THRESHOLD = 10  # Repeticiones de una misma forma de consulta antes de avisar (N+1)
+QUERY_LOG_SQL_MAX_LENGTH = 500  # Caracteres de SQL en los logs
+
+# Métricas (/metrics)
+METRICS_FLUSH_INTERVAL = 5  # Segundos entre volcados de cada worker al almacenamiento compartido
+
+# Perfilado por muestreo (/admin/diagnostics/profiles)
+PROFILE_SAMPLE_INTERVAL = 0.005  # Segundos entre muestras de pila
+PROFILE_MAX_SECONDS = 30  # Muestreo máximo por petición (streams largos)
+PROFILE_MAX_FILES = 200
+PROFILE_MAX_AGE_DAYS = 7
+
+# Memoria (tracemalloc, /admin/diagnostics/memory)
+MEMORY_TRACE_FRAMES = 10  # Marcos por traza (más marcos, más coste)
+MEMORY_TOP_SITES = 20  # Puntos de asignación en cada informe
+MEMORY_SNAPSHOT_INTERVAL = 600  # Segundos entre instantáneas del job periódico
+MEMORY_SNAPSHOT_HISTORY = 48  # Instantáneas conservadas (8 horas)
+MEMORY_REQUEST_HISTORY = 200  # Peticiones muestreadas conservadas
+MEMORY_GROWTH_WARN_BYTES = 50_000_000  # Crecimiento entre instantáneas que se registra como aviso
+
+# Dashboard en vivo (Server-Sent Events)
+SSE_MAX_CLIENTS = 200  # Conexiones simultáneas por worker
+SSE_QUEUE_SIZE = 256  # Eventos pendientes por cliente antes de desconectarlo
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 5000  # Espera de reconexión sugerida al navegador
+DASHBOARD_SNAPSHOT_INTERVAL = 300  # Estado completo periódico: corrige la deriva de los deltas
+
+# Cambios de incidentes compartidos entre workers (dashboard en vivo, SLA)
+CHANGE_LOG_POLL_INTERVAL = 1  # Segundos entre lecturas de los cambios de otros workers
+CHANGE_LOG_RETENTION_SECONDS = 3600
+CHANGE_LOG_PURGE_EVERY = 1000  # Cada cuántas escrituras se purgan las entradas antiguas
+
+# Analítica de tiempos de resolución
+ANALYTICS_PERCENTILES = (50, 90, 99)
+ANALYTICS_HISTOGRAM_EDGES_HOURS = (0, 0.25, 0.5, 1, 2, 4, 8, 24, 48, 72, 168, 336, 720)  # Última cubeta abierta
+SLA_RESOLUTION_TARGETS = {  # Tiempo máximo de resolución por severidad (segundos)
+    "Crítico": 4 * 3600,
+    "Alto": 24 * 3600,
+    "Medio": 72 * 3600,
+    "Bajo": 168 * 3600,
+}
+
+# Monitor de SLA de atención: tiempo máximo en estado "Abierto" por severidad (segundos)
+SLA_OPEN_STATUS = "Abierto"
+SLA_OPEN_TARGETS = {
+    "Crítico": 15 * 60,
+    "Alto": 3600,
+    "Medio": 4 * 3600,
+    "Bajo": 24 * 3600,
+}
+SLA_BREACHES_SHOWN = 8  # Incumplimientos recientes en el dashboard
+
+# Tareas en segundo plano (intervalos en segundos; jitter como fracción del intervalo)
+JOB_JITTER_RATIO = 0.1
+JOB_CACHE_WARM_INTERVAL = 12  # Con jitter, por debajo del menor TTL precalculado (tendencia, 15 s)
+JOB_CACHE_WARM_IDLE_SECONDS = 120  # Sin lecturas en este tiempo, las cachés dejan de precalcularse
+JOB_OPTIMIZE_INTERVAL = 3600
+JOB_VACUUM_INTERVAL = 6 * 3600
+JOB_VACUUM_MAX_PAGES = 2000
+JOB_CLEANUP_INTERVAL = 3600
+JOB_ANALYZE_DELAY = 30  # ANALYZE completo poco después de arrancar
+ANALYZE_ROW_LIMIT = 1000  # Filas muestreadas por índice en ANALYZE
+JOB_ARCHIVE_INTERVAL = 24 * 3600
+OWNER_MIGRATION_BATCH_SIZE = 1000  # Incidentes por transacción al rellenar owner_id
+CODE_MIGRATION_BATCH_SIZE = 1000  # Incidentes por transacción al rellenar severity_code/status_code
+EVENT_CODE_MIGRATION_BATCH_SIZE = 10_000  # Eventos por transacción al rellenar old_code/new_code
+
+# Archivo de incidentes cerrados (particiones mensuales)
+ARCHIVE_AFTER_DAYS = 180  # Días desde el cierre antes de archivar
+ARCHIVE_BATCH_SIZE = 500  # Incidentes por transacción
+
 # Rate limiting
 LOGIN_RATE_LIMIT = "5/minute"
 INCIDENT_CREATE_RATE_LIMIT = "10/minute"
 FILE_UPLOAD_RATE_LIMIT = "5/minute"
+RATE_LIMIT_PURGE_EVERY = 1000  # Cada cuántas escrituras se purgan claves caducadas
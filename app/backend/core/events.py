@@ -0,0 +1,64 @@
+"""
+Bus de eventos en proceso para cambios de incidentes.
+
+El repositorio publica un `IncidentChange` tras cada escritura confirmada, con
+la fila anterior y la posterior, de modo que los suscriptores (dashboard en
+vivo, auditoría, SLA...) calculan sus deltas sin volver a consultar la base
+de datos. Los suscriptores se ejecutan de forma síncrona en el hilo que
+escribe: deben ser rápidos y no lanzar excepciones (se registran y se ignoran).
+"""
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from app.backend.repositories.incident_repository import IncidentRow
+
+logger = logging.getLogger(__name__)
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+
+class IncidentChange(NamedTuple):
+    kind: str
+    before: Optional["IncidentRow"]
+    after: Optional["IncidentRow"]
+    # Fecha del último cierre antes y después del cambio (None si no está cerrado)
+    closed_before: Optional[datetime] = None
+    closed_after: Optional[datetime] = None
+    # Momento del cambio (el mismo que llevan los eventos del historial)
+    ts: Optional[datetime] = None
+    # Escritura de otro worker recibida por el registro compartido (core/change_log.py)
+    remote: bool = False
+
+    @property
+    def incident_id(self) -> int:
+        return (self.after or self.before).id
+
+
+class EventBus:
+    """Lista de suscriptores síncronos"""
+
+    def __init__(self):
+        self._listeners: list[Callable] = []
+
+    def subscribe(self, listener: Callable) -> Callable:
+        """Registrar un suscriptor (se puede usar como decorador)"""
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener: Callable) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def publish(self, event) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Error en suscriptor de eventos %r", listener)
+
+
+incident_events = EventBus()
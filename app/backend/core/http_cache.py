@@ -0,0 +1,37 @@
+"""
+Validación condicional HTTP (ETag / If-None-Match).
+
+Los ETag son débiles (W/"...") y se derivan de valores baratos de obtener
+(id + updated_at, recuentos y última modificación), de modo que una petición
+repetida puede responderse con 304 sin cargar ni serializar el recurso.
+"""
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts: Any) -> str:
+    """ETag débil a partir de los valores que determinan el contenido de la respuesta"""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Comprobar If-None-Match (comparación débil, admite listas y `*`)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [value.strip().removeprefix("W/") for value in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+def cache_headers(etag: str) -> dict[str, str]:
+    # Los clientes pueden guardar la respuesta pero deben revalidarla siempre
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
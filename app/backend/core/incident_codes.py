@@ -0,0 +1,81 @@
+"""
+Códigos canónicos de severidad y estado de los incidentes.
+
+Cada valor tiene un entero pequeño (lo que se indexa, filtra y agrega) y una
+etiqueta canónica para mostrar. Las variantes escritas a mano ("En
+Investigación", "critico", "cerrada"...) se normalizan a la misma entrada al
+escribir y al migrar. Los estados cerrados usan códigos desde
+CLOSED_STATUS_MIN: "activo" es `status_code < CLOSED_STATUS_MIN`, la condición
+del índice parcial de incidentes activos.
+"""
+import unicodedata
+from typing import Optional
+
+# Severidad: el orden de los códigos es el de gravedad
+SEVERITY_LOW = 1
+SEVERITY_MEDIUM = 2
+SEVERITY_HIGH = 3
+SEVERITY_CRITICAL = 4
+SEVERITIES = {
+    SEVERITY_LOW: "Bajo",
+    SEVERITY_MEDIUM: "Medio",
+    SEVERITY_HIGH: "Alto",
+    SEVERITY_CRITICAL: "Crítico",
+}
+
+# Estado: en el orden del ciclo de vida; los cerrados, a partir de CLOSED_STATUS_MIN
+STATUS_OPEN = 1
+STATUS_CLOSED = 90
+CLOSED_STATUS_MIN = 90
+STATUSES = {
+    STATUS_OPEN: "Abierto",
+    2: "Asignado",
+    3: "En investigación",
+    4: "Pendiente",
+    5: "Monitorizando",
+    6: "Mitigado",
+    STATUS_CLOSED: "Cerrado",
+}
+
+# Variantes conocidas que no se reducen a la etiqueta canónica solo con normalize()
+SEVERITY_ALIASES = {
+    "baja": SEVERITY_LOW, "low": SEVERITY_LOW,
+    "media": SEVERITY_MEDIUM, "medium": SEVERITY_MEDIUM,
+    "alta": SEVERITY_HIGH, "high": SEVERITY_HIGH,
+    "critica": SEVERITY_CRITICAL, "critical": SEVERITY_CRITICAL,
+}
+STATUS_ALIASES = {
+    "abierta": STATUS_OPEN, "nuevo": STATUS_OPEN, "open": STATUS_OPEN,
+    "asignada": 2, "investigacion": 3, "investigando": 3, "pendientes": 4,
+    "monitorizacion": 5, "mitigada": 6,
+    "cerrada": STATUS_CLOSED, "resuelto": STATUS_CLOSED, "closed": STATUS_CLOSED,
+}
+
+
+def normalize(label: str) -> str:
+    """Clave de comparación: sin tildes, en minúsculas y con espacios simples"""
+    decomposed = unicodedata.normalize("NFKD", label)
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).casefold().split())
+
+
+_SEVERITY_BY_KEY = {normalize(label): code for code, label in SEVERITIES.items()} | SEVERITY_ALIASES
+_STATUS_BY_KEY = {normalize(label): code for code, label in STATUSES.items()} | STATUS_ALIASES
+
+
+def severity_code(label: Optional[str]) -> Optional[int]:
+    """Código de una severidad (None si no es reconocible)"""
+    return _SEVERITY_BY_KEY.get(normalize(label)) if label else None
+
+
+def status_code(label: Optional[str]) -> Optional[int]:
+    """Código de un estado (None si no es reconocible)"""
+    return _STATUS_BY_KEY.get(normalize(label)) if label else None
+
+
+def is_closed_code(code: Optional[int]) -> bool:
+    return code is not None and code >= CLOSED_STATUS_MIN
+
+
+def is_active_code(code: Optional[int]) -> bool:
+    """Igual que la condición SQL: un estado sin código no es activo ni cerrado"""
+    return code is not None and code < CLOSED_STATUS_MIN
@@ -0,0 +1,101 @@
+"""
+Línea temporal unificada de logs adjuntos a un incidente.
+
+Cada adjunto se recorre como un iterador de líneas (leído por trozos desde la
+base de datos) y todos ellos se combinan con un merge k-way sobre un heap, de
+modo que la memoria usada depende del número de ficheros y no de su tamaño.
+"""
+import heapq
+import re
+from datetime import datetime
+from itertools import dropwhile, islice, takewhile
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+# Marcas de tiempo al inicio de línea: "2025-12-09 14:32:15" o "2025-12-09T14:32:15Z"
+_TIMESTAMP_RE = re.compile(r"^\s*(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})")
+
+
+class TimelineEntry(NamedTuple):
+    timestamp: datetime
+    attachment_id: int
+    filename: str
+    line_no: int
+    text: str
+
+
+def parse_line_timestamp(line: str) -> Optional[datetime]:
+    """Extraer la marca de tiempo del inicio de una línea de log (si existe)"""
+    match = _TIMESTAMP_RE.match(line)
+    if not match:
+        return None
+    try:
+        return datetime.fromisoformat(f"{match.group(1)} {match.group(2)}")
+    except ValueError:
+        return None
+
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Convertir un flujo de trozos de texto en líneas, guardando solo la línea parcial"""
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find("\n", start)
+            if end == -1:
+                break
+            yield pending[start:end].rstrip("\r")
+            start = end + 1
+        pending = pending[start:]
+    if pending:
+        yield pending.rstrip("\r")
+
+
+def iter_attachment_entries(
+    attachment_id: int,
+    filename: str,
+    chunks: Iterable[str],
+    fallback_timestamp: datetime,
+) -> Iterator[TimelineEntry]:
+    """
+    Generar las entradas de un adjunto. Las líneas sin marca de tiempo
+    (continuaciones de un evento) heredan la última marca vista; las anteriores
+    a la primera marca usan la fecha de subida del adjunto.
+    """
+    current = fallback_timestamp
+    for line_no, line in enumerate(iter_lines(chunks), start=1):
+        if not line.strip():
+            continue
+        timestamp = parse_line_timestamp(line)
+        if timestamp is not None:
+            current = timestamp
+        yield TimelineEntry(current, attachment_id, filename, line_no, line)
+
+
+def merge_timelines(
+    streams: Iterable[Iterator[TimelineEntry]],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Iterator[TimelineEntry]:
+    """
+    Combinar cronológicamente varias secuencias de entradas ordenadas.
+
+    Se asume que cada log está ordenado en el tiempo (lo habitual en firewall,
+    EDR y SIEM); las entradas anteriores a `since` se descartan por fichero
+    antes del merge y el recorrido se corta en cuanto se supera `until`.
+    """
+    if since is not None:
+        streams = [dropwhile(lambda e: e.timestamp < since, s) for s in streams]
+
+    merged = heapq.merge(
+        *streams,
+        key=lambda e: (e.timestamp, e.attachment_id, e.line_no),
+    )
+    if until is not None:
+        merged = takewhile(lambda e: e.timestamp <= until, merged)
+    return merged
+
+
+def paginate(entries: Iterator[TimelineEntry], offset: int, limit: int) -> list[TimelineEntry]:
+    """Obtener una página del timeline sin materializar las entradas anteriores"""
+    return list(islice(entries, offset, offset + limit))
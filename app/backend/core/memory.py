@@ -0,0 +1,250 @@
+"""
+Contabilidad de memoria y detección de fugas con tracemalloc.
+
+Con `CYBERWATCH_TRACEMALLOC=on` cada worker traza sus asignaciones desde el
+arranque (MEMORY_TRACE_FRAMES marcos por traza; cuesta CPU y memoria, por eso
+está desactivado por defecto) y toma una instantánea cada
+MEMORY_SNAPSHOT_INTERVAL segundos. Cada instantánea se compara con la anterior:
+el crecimiento y los puntos de asignación que más han crecido quedan en el
+historial y, si supera MEMORY_GROWTH_WARN_BYTES, se registra un aviso. Un
+crecimiento sostenido entre instantáneas (con las cachés ya llenas) es una fuga.
+
+Mientras se traza, `MemoryMiddleware` mide el pico de memoria de una fracción
+de las peticiones (`CYBERWATCH_MEMORY_SAMPLE_RATE`, por defecto 0.1): el pico
+de tracemalloc es global, así que se mide una petición muestreada a la vez y
+el valor incluye lo que asignen las peticiones simultáneas (es una cota
+superior).
+
+El estado de cada worker se consulta en `/admin/diagnostics/memory`.
+"""
+import gc
+import logging
+import os
+import random
+import resource
+import threading
+import time
+import tracemalloc
+from collections import deque
+from itertools import islice
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.backend.core.constants import (
+    MEMORY_TRACE_FRAMES,
+    MEMORY_TOP_SITES,
+    MEMORY_SNAPSHOT_HISTORY,
+    MEMORY_REQUEST_HISTORY,
+    MEMORY_GROWTH_WARN_BYTES,
+)
+from app.backend.core.metrics import request_memory_peak, route_template
+
+logger = logging.getLogger(__name__)
+
+TRACEMALLOC_ENABLED = os.getenv("CYBERWATCH_TRACEMALLOC", "off") == "on"
+MEMORY_SAMPLE_RATE = float(os.getenv("CYBERWATCH_MEMORY_SAMPLE_RATE", "0.1"))
+
+# Asignaciones de tracemalloc (las instantáneas guardadas) y de la maquinaria de importación.
+# Se descartan de las estadísticas ya agrupadas: filtrar las trazas cuesta segundos
+_NOISE = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+
+def resident_bytes() -> Optional[int]:
+    """Memoria residente actual del proceso (None fuera de Linux)"""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_resident_bytes() -> int:
+    """Máximo de memoria residente del proceso desde que arrancó"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def site_stats(snapshot: tracemalloc.Snapshot, limit: int, group_by: str = "lineno") -> list[dict]:
+    """Puntos de asignación con más memoria viva"""
+    return [
+        {
+            "site": _site(stat.traceback, group_by),
+            "size": stat.size,
+            "count": stat.count,
+        }
+        for stat in _relevant(snapshot.statistics(group_by), limit)
+    ]
+
+
+def growth_stats(snapshot: tracemalloc.Snapshot, previous: tracemalloc.Snapshot, limit: int, group_by: str = "lineno") -> list[dict]:
+    """Puntos de asignación que más han crecido desde `previous`"""
+    return _growth_sites(snapshot.compare_to(previous, group_by), limit, group_by)
+
+
+def _growth_sites(stats: Iterable[tracemalloc.StatisticDiff], limit: int, group_by: str) -> list[dict]:
+    return [
+        {
+            "site": _site(stat.traceback, group_by),
+            "size": stat.size,
+            "size_diff": stat.size_diff,
+            "count_diff": stat.count_diff,
+        }
+        for stat in _relevant((stat for stat in stats if stat.size_diff > 0), limit)
+    ]
+
+
+def _relevant(stats: Iterable, limit: Optional[int] = None) -> list:
+    """Las primeras `limit` estadísticas que no son ruido (según el marco que asigna)"""
+    return list(islice((stat for stat in stats if stat.traceback[-1].filename not in _NOISE), limit))
+
+
+def _site(traceback: tracemalloc.Traceback, group_by: str) -> str:
+    if group_by == "traceback":
+        # Del marco más externo al que asigna, como las pilas de profiler
+        return ";".join(f"{frame.filename}:{frame.lineno}" for frame in traceback)
+    frame = traceback[-1]
+    return frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryTracker:
+    """Instantáneas de tracemalloc y picos de las peticiones muestreadas de este worker"""
+
+    def __init__(self):
+        self.snapshots: deque[dict] = deque(maxlen=MEMORY_SNAPSHOT_HISTORY)
+        self.requests: deque[dict] = deque(maxlen=MEMORY_REQUEST_HISTORY)
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = MEMORY_TRACE_FRAMES) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info("tracemalloc activado (%d marcos por traza)", frames)
+
+    def stop(self) -> None:
+        """Dejar de trazar (libera las trazas; el historial se conserva)"""
+        tracemalloc.stop()
+        with self._lock:
+            self._previous = None
+
+    def take(self) -> tracemalloc.Snapshot:
+        """Instantánea de la memoria viva (tras una recolección completa)"""
+        gc.collect()
+        return tracemalloc.take_snapshot()
+
+    def snapshot(self, limit: int = MEMORY_TOP_SITES) -> Optional[dict]:
+        """Tomar una instantánea y compararla con la anterior (None si no se está trazando)"""
+        if not tracemalloc.is_tracing():
+            return None
+        start = time.perf_counter()
+        current = self.take()
+        with self._lock:
+            previous, self._previous = self._previous, current
+        # Total y crecimiento sin el ruido (las instantáneas guardadas no cuentan)
+        if previous is None:
+            stats = _relevant(current.statistics("lineno"))
+            growth = None
+        else:
+            stats = _relevant(current.compare_to(previous, "lineno"))
+            growth = sum(stat.size_diff for stat in stats)
+        entry = {
+            "taken_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "traced_bytes": sum(stat.size for stat in stats),
+            "resident_bytes": resident_bytes(),
+            "growth_bytes": growth,
+            "growth_sites": _growth_sites(stats, limit, "lineno") if growth is not None else [],
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        self.snapshots.append(entry)
+        if entry["growth_bytes"] is not None and entry["growth_bytes"] > MEMORY_GROWTH_WARN_BYTES:
+            logger.warning(
+                "La memoria trazada ha crecido %.1f MB desde la instantánea anterior; mayor crecimiento: %s",
+                entry["growth_bytes"] / 1e6,
+                entry["growth_sites"][0]["site"] if entry["growth_sites"] else "-",
+            )
+        return entry
+
+    def record_request(self, method: str, route: str, status_code: int, peak: int, retained: int, seconds: float) -> None:
+        request_memory_peak.observe(peak, method, route)
+        self.requests.append({
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "method": method,
+            "route": route,
+            "status": status_code,
+            "peak_bytes": peak,
+            "retained_bytes": retained,
+            "duration_ms": round(seconds * 1000, 1),
+        })
+
+    def request_summary(self) -> list[dict]:
+        """Pico máximo y medio por ruta de las peticiones muestreadas recientes"""
+        routes: dict[tuple[str, str], list[int]] = {}
+        for request in list(self.requests):
+            routes.setdefault((request["method"], request["route"]), []).append(request["peak_bytes"])
+        summary = [
+            {"method": method, "route": route, "count": len(peaks), "max_peak_bytes": max(peaks), "mean_peak_bytes": sum(peaks) // len(peaks)}
+            for (method, route), peaks in routes.items()
+        ]
+        return sorted(summary, key=lambda item: item["max_peak_bytes"], reverse=True)
+
+    def stats(self) -> dict:
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": self.tracing,
+            "frames": tracemalloc.get_traceback_limit() if self.tracing else None,
+            "resident_bytes": resident_bytes(),
+            "peak_resident_bytes": peak_resident_bytes(),
+            "traced_bytes": traced,
+            "traced_peak_bytes": traced_peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+            "gc_counts": gc.get_count(),
+        }
+
+
+tracker = MemoryTracker()
+
+
+class MemoryMiddleware:
+    """Pico de memoria (tracemalloc) de una fracción de las peticiones, de una en una"""
+
+    def __init__(self, app: ASGIApp, sample_rate: float = MEMORY_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+        self._measuring = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or self._measuring
+            or not tracemalloc.is_tracing()
+            or random.random() >= self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+        # Solo el event loop modifica el indicador: no hace falta lock
+        self._measuring = True
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self._measuring = False
+            if tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                tracker.record_request(
+                    scope["method"], route_template(scope), status_code,
+                    max(peak - before, 0), current - before, time.perf_counter() - start,
+                )
@@ -0,0 +1,348 @@
+"""
+Métricas en formato de texto de Prometheus, agregadas entre workers.
+
+Cada worker acumula contadores, gauges e histogramas en memoria (un lock por
+métrica: una suma por observación en el camino caliente). Periódicamente, y
+al servir `/metrics`, vuelca su instantánea en un fichero SQLite (WAL) común a
+todos los procesos del host (`CYBERWATCH_METRICS_DB`, por defecto
+`./metrics.db`), como el rate limiting. `/metrics` suma las filas de todos los
+workers: contadores e histogramas también de los que ya han terminado (los
+totales no retroceden al reiniciar un worker) y los gauges solo de los vivos.
+
+Los valores que ya llevan otros componentes (aciertos de caché, colas, pool
+de conexiones) se copian en sus métricas justo antes de cada volcado con los
+colectores registrados en `register_collector`.
+"""
+import bisect
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+METRICS_DB_PATH = os.getenv("CYBERWATCH_METRICS_DB", "./metrics.db")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_sample (
+    worker TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    sample TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    live INTEGER NOT NULL,
+    PRIMARY KEY (worker, sample, labels)
+) WITHOUT ROWID
+"""
+
+# Identificador del worker: el pid puede reutilizarse tras reiniciar
+WORKER_ID = f"{os.getpid()}-{time.time_ns()}"
+# Serie donde se acumulan los contadores de los workers que ya han terminado
+RETIRED = "retired"
+_RETIRE_SQL = """
+INSERT INTO metric_sample (worker, pid, metric, sample, labels, value, live)
+SELECT ?, 0, metric, sample, labels, value, 0 FROM metric_sample WHERE worker = ? AND live = 0
+ON CONFLICT(worker, sample, labels) DO UPDATE SET value = value + excluded.value
+"""
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+SIZE_BUCKETS = (1024, 4096, 16_384, 65_536, 262_144, 524_288, 1_000_000, 4_000_000)
+MEMORY_BUCKETS = (1_000_000, 4_000_000, 16_000_000, 64_000_000, 128_000_000, 256_000_000, 512_000_000, 1_000_000_000)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metric:
+    kind = ""
+    live = False  # Solo cuenta mientras el worker está vivo (gauges)
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = {}
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        """(nombre de la muestra, etiquetas formateadas, valor)"""
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set_total(self, value: float, *labels) -> None:
+        """Copiar un total acumulado que lleva otro componente (colectores)"""
+        with self._lock:
+            self._values[labels] = value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+    live = True
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...], labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Por etiquetas: [recuento por cubeta (no acumulado) ..., +Inf, suma]
+        self._series: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterable[tuple[str, str, float]]:
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        for labels, values in series:
+            base = _format_labels(self.labelnames, labels)
+            prefix = f"{base}," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", f'{prefix}le="{bound}"', cumulative
+            yield f"{self.name}_sum", base, values[-1]
+            yield f"{self.name}_count", base, cumulative
+
+
+class Registry:
+    def __init__(self, path: str = METRICS_DB_PATH):
+        self.path = path
+        self.metrics: list[Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+        self._local = threading.local()
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, buckets: tuple[float, ...], labelnames: tuple[str, ...] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets, labelnames))
+
+    def register_collector(self, collector: Callable[[], None]) -> Callable[[], None]:
+        """Función que actualiza métricas a partir del estado de otro componente antes de cada volcado"""
+        self._collectors.append(collector)
+        return collector
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Las métricas no necesitan durabilidad ante caídas del sistema operativo
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def flush(self) -> int:
+        """Sustituir la instantánea de este worker en el almacenamiento compartido; retorna las muestras"""
+        for collector in self._collectors:
+            collector()
+        pid = os.getpid()
+        rows = [
+            (WORKER_ID, pid, metric.name, sample, labels, value, int(metric.live))
+            for metric in self.metrics
+            for sample, labels, value in metric.samples()
+        ]
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM metric_sample WHERE worker = ?", (WORKER_ID,))
+            conn.executemany("INSERT INTO metric_sample VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _retire_dead_workers(self, conn: sqlite3.Connection) -> None:
+        """Acumular los contadores de los workers terminados en una sola serie y descartar sus gauges"""
+        workers = conn.execute("SELECT DISTINCT worker, pid FROM metric_sample WHERE worker != ?", (RETIRED,)).fetchall()
+        dead = [worker for worker, pid in workers if worker != WORKER_ID and not _pid_alive(pid)]
+        with conn:
+            for worker in dead:
+                conn.execute(_RETIRE_SQL, (RETIRED, worker))
+                conn.execute("DELETE FROM metric_sample WHERE worker = ?", (worker,))
+
+    def render(self) -> str:
+        """Texto de Prometheus con la suma de todos los workers"""
+        self.flush()
+        conn = self._connect()
+        self._retire_dead_workers(conn)
+        samples: dict[str, list[tuple[str, str, float]]] = {}
+        for metric, sample, labels, value in conn.execute(
+            "SELECT metric, sample, labels, sum(value) FROM metric_sample GROUP BY metric, sample, labels"
+        ):
+            samples.setdefault(metric, []).append((sample, labels, value))
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample, labels, value in samples.get(metric.name, []):
+                lines.append(f"{sample}{{{labels}}} {_format_value(value)}" if labels else f"{sample} {_format_value(value)}")
+        lines.extend(_hit_ratio_lines(samples.get(cache_requests.name, [])))
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _hit_ratio_lines(cache_samples: list[tuple[str, str, float]]) -> list[str]:
+    """Proporción de aciertos por caché, calculada sobre los totales de todos los workers"""
+    totals: dict[str, dict[str, float]] = {}
+    for _, labels, value in cache_samples:
+        fields = dict(item.split("=", 1) for item in labels.split(","))
+        totals.setdefault(fields["cache"], {})[fields["result"].strip('"')] = value
+    lines = [
+        "# HELP cyberwatch_cache_hit_ratio Aciertos / consultas de cada caché (todos los workers)",
+        "# TYPE cyberwatch_cache_hit_ratio gauge",
+    ]
+    for cache, results in sorted(totals.items()):
+        total = results.get("hit", 0) + results.get("miss", 0)
+        if total:
+            lines.append(f"cyberwatch_cache_hit_ratio{{cache={cache}}} {round(results.get('hit', 0) / total, 4)}")
+    return lines
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "cyberwatch_http_requests_total", "Peticiones HTTP por ruta y código", ("method", "route", "status"),
+)
+http_request_duration = registry.histogram(
+    "cyberwatch_http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta", LATENCY_BUCKETS, ("method", "route"),
+)
+http_in_flight = registry.gauge("cyberwatch_http_requests_in_flight", "Peticiones HTTP en curso")
+db_query_duration = registry.histogram(
+    "cyberwatch_db_query_duration_seconds", "Duración de las consultas SQL por operación", QUERY_BUCKETS, ("operation",),
+)
+db_pool_checkout_wait = registry.histogram(
+    "cyberwatch_db_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool", POOL_WAIT_BUCKETS,
+)
+db_pool_connections = registry.gauge(
+    "cyberwatch_db_pool_connections", "Conexiones del pool por estado", ("state",),
+)
+cache_requests = registry.counter(
+    "cyberwatch_cache_requests_total", "Consultas a las cachés en memoria", ("cache", "result"),
+)
+cache_entries = registry.gauge("cyberwatch_cache_entries", "Entradas de cada caché", ("cache",))
+queue_depth = registry.gauge(
+    "cyberwatch_queue_depth", "Trabajo pendiente en las colas internas", ("queue",),
+)
+upload_bytes = registry.counter("cyberwatch_upload_bytes_total", "Bytes de adjuntos subidos")
+attachment_size = registry.histogram(
+    "cyberwatch_attachment_size_bytes", "Tamaño de los adjuntos subidos", SIZE_BUCKETS,
+)
+resident_memory = registry.gauge("cyberwatch_process_resident_memory_bytes", "Memoria residente de los workers")
+request_memory_peak = registry.histogram(
+    "cyberwatch_request_memory_peak_bytes", "Pico de memoria de las peticiones muestreadas (tracemalloc)",
+    MEMORY_BUCKETS, ("method", "route"),
+)
+
+
+class MetricsMiddleware:
+    """Peticiones en curso, y recuento y latencia por plantilla de ruta (`/incidents/{incident_id}`)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec()
+            route = route_template(scope)
+            http_requests.inc(scope["method"], route, str(status_code))
+            http_request_duration.observe(time.perf_counter() - start, scope["method"], route)
+
+
+_routes: dict[object, str] = {}
+
+
+def route_template(scope: Scope) -> str:
+    """Plantilla de la ruta atendida (el enrutador deja su endpoint en el scope); 'unmatched' si ninguna"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    template = _routes.get(endpoint)
+    if template is None:
+        template = next(
+            (route.path for route in scope["app"].routes if getattr(route, "endpoint", getattr(route, "app", None)) is endpoint),
+            "unmatched",
+        )
+        _routes[endpoint] = template
+    return template
+
+
+def query_operation(statement: str) -> str:
+    """SELECT, INSERT, UPDATE, DELETE u other"""
+    operation = statement.lstrip()[:6].upper()
+    return operation.lower() if operation in ("SELECT", "INSERT", "UPDATE", "DELETE") else "other"
+
+
+def observe_pool(pool) -> None:
+    """Copiar el estado de un QueuePool de SQLAlchemy en las métricas"""
+    db_pool_connections.set(pool.checkedout(), "checked_out")
+    db_pool_connections.set(pool.checkedin(), "idle")
+    db_pool_connections.set(max(pool.overflow(), 0), "overflow")
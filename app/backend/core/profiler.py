@@ -0,0 +1,306 @@
+"""
+Perfilado por muestreo de peticiones en vivo.
+
+Se perfila una fracción de las peticiones (`CYBERWATCH_PROFILE_SAMPLE_RATE`,
+por defecto 0) y, a demanda, cualquier petición de un administrador que lleve
+la cabecera `X-CyberWatch-Profile: 1`. Mientras haya alguna petición perfilada,
+un hilo toma cada PROFILE_SAMPLE_INTERVAL segundos las pilas de todos los
+hilos (`sys._current_frames`) y se queda con las de la petición:
+  - en el hilo del event loop, cuando la tarea en ejecución es la de la
+    petición o una creada desde ella (p. ej. la que envía el cuerpo de una
+    respuesta en streaming);
+  - en los hilos del threadpool, las que pasan por su endpoint o por una
+    función definida dentro de él (los generadores de las exportaciones). Las
+    de otras peticiones simultáneas al mismo endpoint síncrono también cuentan.
+Cada sesión deja de muestrear a los PROFILE_MAX_SECONDS (streams SSE).
+
+Al terminar la respuesta se guarda el perfil en formato de pilas colapsadas
+(`marco;marco;marco muestras`, el de flamegraph.pl y speedscope) en
+`CYBERWATCH_PROFILE_DIR` (por defecto `./profiles`), conservando como mucho
+PROFILE_MAX_FILES ficheros y PROFILE_MAX_AGE_DAYS días. La respuesta indica el
+fichero en la cabecera `X-CyberWatch-Profile-Id`.
+
+Desactivado (sin cabecera y con tasa 0) el coste por petición es la búsqueda
+de una cabecera: no hay hilo de muestreo ni se registran tareas.
+"""
+import asyncio
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+from weakref import WeakKeyDictionary
+
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.backend.database import engine
+from app.backend.repositories.user_repository import get_cached_user_by_email
+from app.backend.core.constants import (
+    PROFILE_SAMPLE_INTERVAL,
+    PROFILE_MAX_SECONDS,
+    PROFILE_MAX_FILES,
+    PROFILE_MAX_AGE_DAYS,
+)
+
+PROFILE_DIR = os.getenv("CYBERWATCH_PROFILE_DIR", "./profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("CYBERWATCH_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = "x-cyberwatch-profile"
+PROFILE_ID_HEADER = "X-CyberWatch-Profile-Id"
+PROFILE_SUFFIX = ".collapsed"
+PROFILE_ID_PATTERN = re.compile(r"^[\w.-]+\.collapsed$")
+
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+# Rutas relativas a la raíz del proyecto o a la entrada de sys.path que las contiene
+_PREFIXES = sorted(
+    {os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))}
+    | {os.path.abspath(p) for p in sys.path if p},
+    key=len,
+    reverse=True,
+)
+
+
+@lru_cache(maxsize=8192)
+def _frame_label(code) -> str:
+    """`ruta/relativa.py:Clase.funcion` (sin ';', que separa marcos en el formato colapsado)"""
+    filename = code.co_filename
+    for prefix in _PREFIXES:
+        if filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    return f"{filename}:{code.co_qualname}".replace(";", ",")
+
+
+def _collapse(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class ProfileSession:
+    """Muestras de una petición"""
+
+    def __init__(self, profile_id: str, scope: Scope, loop: asyncio.AbstractEventLoop):
+        self.profile_id = profile_id
+        self.scope = scope
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self.started = time.monotonic()
+        self.samples = 0
+        self.stacks: Counter[str] = Counter()
+
+    def runs_endpoint(self, frame) -> bool:
+        """Si la pila pasa por el endpoint o por una función definida dentro de él"""
+        code = getattr(self.scope.get("endpoint"), "__code__", None)
+        if code is None:
+            return False
+        nested = code.co_qualname + ".<locals>."
+        while frame is not None:
+            if frame.f_code is code or (
+                frame.f_code.co_filename == code.co_filename and frame.f_code.co_qualname.startswith(nested)
+            ):
+                return True
+            frame = frame.f_back
+        return False
+
+
+# Tarea -> sesión: la de la petición y las que se crean desde ella (heredan el contexto)
+_task_sessions: WeakKeyDictionary = WeakKeyDictionary()
+_current_session: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    """Registrar en `_task_sessions` las tareas creadas durante una petición perfilada"""
+    previous = loop.get_task_factory()
+    if getattr(previous, "profiler", False):
+        return
+
+    def factory(loop, coro, context=None):
+        kwargs = {} if context is None else {"context": context}
+        task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+        session = context.get(_current_session) if context is not None else _current_session.get()
+        if session is not None:
+            _task_sessions[task] = session
+        return task
+
+    factory.profiler = True
+    loop.set_task_factory(factory)
+
+
+class Sampler:
+    """Hilo de muestreo: solo existe mientras hay sesiones activas"""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._sessions: set[ProfileSession] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, session: ProfileSession) -> None:
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, session: ProfileSession) -> None:
+        with self._lock:
+            self._sessions.discard(session)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            # Cada pasada con el lock: al salir de stop() la sesión ya no cambia
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                now = time.monotonic()
+                sessions = [s for s in self._sessions if now - s.started < PROFILE_MAX_SECONDS]
+                if sessions:
+                    self._sample(sessions, own)
+            time.sleep(self.interval)
+
+    def _sample(self, sessions: list[ProfileSession], own: int) -> None:
+        loops = {s.loop_thread: s.loop for s in sessions}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            if thread_id in loops:
+                # Tarea que está ejecutando el event loop en este momento (None si está esperando)
+                task = asyncio.tasks._current_tasks.get(loops[thread_id])
+                owners = [_task_sessions.get(task)] if task is not None else []
+            else:
+                owners = [s for s in sessions if s.runs_endpoint(frame)]
+            owners = [s for s in owners if s in sessions]
+            if owners:
+                stack = _collapse(frame)
+                for session in owners:
+                    session.stacks[stack] += 1
+        for session in sessions:
+            session.samples += 1
+
+
+sampler = Sampler()
+
+
+def new_profile_id(scope: Scope) -> str:
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    slug = _SLUG.sub("_", scope["path"]).strip("_")[:60] or "root"
+    return f"{timestamp}_{scope['method']}_{slug}{PROFILE_SUFFIX}"
+
+
+def write_profile(session: ProfileSession, seconds: float, status_code: int) -> str:
+    """Guardar las pilas colapsadas (con una cabecera de comentario) y aplicar la retención"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, session.profile_id)
+    with open(path, "w", encoding="utf-8") as f:
+        query = session.scope.get("query_string", b"").decode("latin-1")
+        f.write(
+            f"# {session.scope['method']} {session.scope['path']}{'?' + query if query else ''} "
+            f"status={status_code} duration_ms={seconds * 1000:.1f} "
+            f"samples={session.samples} interval_ms={sampler.interval * 1000:g}\n"
+        )
+        for stack, count in session.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    purge_profiles()
+    return path
+
+
+def list_profiles() -> list[dict]:
+    """Perfiles guardados, del más reciente al más antiguo"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    entries = [entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(PROFILE_SUFFIX)]
+    entries.sort(key=lambda entry: entry.name, reverse=True)
+    return [
+        {
+            "id": entry.name,
+            "size": entry.stat().st_size,
+            "created_at": datetime.fromtimestamp(entry.stat().st_mtime, timezone.utc).isoformat(timespec="seconds"),
+        }
+        for entry in entries
+    ]
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """Ruta de un perfil guardado (None si el id no es válido o no existe)"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id)
+    return path if os.path.isfile(path) else None
+
+
+def purge_profiles(max_files: int = PROFILE_MAX_FILES, max_age_days: float = PROFILE_MAX_AGE_DAYS) -> int:
+    """Eliminar los perfiles más antiguos que `max_age_days` y los que excedan `max_files`"""
+    profiles = list_profiles()
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+    stale = [p for i, p in enumerate(profiles) if i >= max_files or p["created_at"] < cutoff]
+    for profile in stale:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, profile["id"]))
+        except FileNotFoundError:
+            pass
+    return len(stale)
+
+
+def _is_admin(email: Optional[str]) -> bool:
+    if not email:
+        return False
+    with Session(engine) as session:
+        user = get_cached_user_by_email(session, email)
+    return bool(user and user.is_active and user.role == "admin")
+
+
+class ProfilerMiddleware:
+    def __init__(self, app: ASGIApp, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def should_profile(self, scope: Scope) -> bool:
+        headers = Headers(scope=scope)
+        if headers.get(PROFILE_HEADER) == "1":
+            email = cookie_parser(headers.get("cookie", "")).get("user_email")
+            return await run_in_threadpool(_is_admin, email)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not await self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        loop = asyncio.get_running_loop()
+        _install_task_factory(loop)
+        session = ProfileSession(new_profile_id(scope), scope, loop)
+        task = asyncio.current_task()
+        _task_sessions[task] = session
+        token = _current_session.set(session)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(raw=message["headers"]).append(PROFILE_ID_HEADER, session.profile_id)
+            await send(message)
+
+        sampler.start(session)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop(session)
+            _current_session.reset(token)
+            _task_sessions.pop(task, None)
+            await run_in_threadpool(write_profile, session, time.perf_counter() - start, status_code)
+
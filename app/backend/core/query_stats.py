@@ -0,0 +1,164 @@
+"""
+Instrumentación de consultas SQL por petición.
+
+Los eventos de cursor de SQLAlchemy (en todos los engines: base activa y
+particiones de archivo) acumulan en el contexto de la petición en curso el
+número de consultas, el tiempo total en la base de datos y la consulta más
+lenta. El contexto se propaga a los hilos del threadpool, de modo que cuentan
+también las consultas de los endpoints síncronos; las tareas en segundo plano
+no tienen petición y solo cuentan en el histograma de duración de /metrics.
+
+`QueryStatsMiddleware` expone el resumen en la cabecera `Server-Timing` (con
+las consultas hechas hasta enviar las cabeceras: en una respuesta en streaming
+no están las del cuerpo) y, al terminar la respuesta, en una línea JSON del
+logger `app.backend.core.query_stats`. Si una misma forma de consulta (la SQL
+con los parámetros ya sustituidos por `?` y las listas IN colapsadas) se
+repite más de QUERY_REPEAT_WARN_THRESHOLD veces en una petición se registra
+un aviso: suele ser un N+1.
+
+uvicorn solo configura sus propios loggers (la raíz queda en WARNING): las
+líneas INFO solo se escriben arrancando con `--log-config log_config.json`,
+que envía este logger a stdout; sin él solo aparecen los avisos.
+
+`CYBERWATCH_QUERY_STATS=off` desactiva la instrumentación.
+"""
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.backend.core.constants import QUERY_REPEAT_WARN_THRESHOLD, QUERY_LOG_SQL_MAX_LENGTH
+from app.backend.core.metrics import db_query_duration, query_operation
+
+logger = logging.getLogger(__name__)
+
+QUERY_STATS_ENABLED = os.getenv("CYBERWATCH_QUERY_STATS", "on") != "off"
+
+# Listas IN expandidas ("?, ?, ?") y literales numéricos de SQL escrito a mano
+_IN_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Forma de una consulta: la misma para todas sus ejecuciones con distintos parámetros"""
+    shape = _IN_LIST.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+class RequestQueries:
+    """Consultas de una petición"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.shapes: Counter[str] = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Formas ejecutadas más de `threshold` veces (posibles N+1)"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.seconds * 1000:.2f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest_seconds * 1000:.2f}"
+        )
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+# El inicio se guarda en el contexto de ejecución (uno por sentencia): si la
+# sentencia falla no hay after_cursor_execute y se descarta con el contexto
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    seconds = time.perf_counter() - start
+    # El histograma de /metrics incluye también las consultas de las tareas en segundo plano
+    db_query_duration.observe(seconds, query_operation(statement))
+    queries = _current.get()
+    if queries is not None:
+        queries.record(statement, seconds)
+
+
+def install() -> None:
+    """Registrar los eventos de cursor (una vez por proceso)"""
+    if QUERY_STATS_ENABLED and not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp, repeat_threshold: int = QUERY_REPEAT_WARN_THRESHOLD):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not QUERY_STATS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        queries = RequestQueries()
+        token = _current.set(queries)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append(
+                    "Server-Timing",
+                    f"{queries.server_timing()}, app;dur={(time.perf_counter() - start) * 1000:.2f}",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self.log(scope, status_code, queries, time.perf_counter() - start)
+
+    def log(self, scope: Scope, status_code: int, queries: RequestQueries, seconds: float) -> None:
+        slowest = queries.slowest_statement
+        logger.info(json.dumps({
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round(seconds * 1000, 2),
+            "queries": queries.count,
+            "db_ms": round(queries.seconds * 1000, 2),
+            "slowest_ms": round(queries.slowest_seconds * 1000, 2),
+            "slowest_sql": _SPACES.sub(" ", slowest)[:QUERY_LOG_SQL_MAX_LENGTH] if slowest else None,
+        }, ensure_ascii=False))
+        for shape, count in queries.repeated(self.repeat_threshold):
+            logger.warning(
+                "Consulta repetida %d veces en %s %s (¿N+1?): %s",
+                count, scope["method"], scope["path"], shape[:QUERY_LOG_SQL_MAX_LENGTH],
+            )
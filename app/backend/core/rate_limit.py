@@ -0,0 +1,200 @@
+"""
+Rate limiting compartido entre workers de un mismo host.
+
+El almacenamiento en memoria por defecto de slowapi multiplica los límites por
+el número de workers de uvicorn. Este módulo registra en `limits` un backend
+sobre un fichero SQLite en modo WAL (`sqlitewal:///ruta.db`) y expone un único
+`limiter` para toda la aplicación.
+
+Se usa la estrategia sliding-window-counter: una fila por clave con el contador
+de la ventana actual y el de la anterior. Cada hit es un único UPSERT atómico
+que rota la ventana, comprueba el recuento ponderado y suma en la misma
+sentencia, sin lecturas previas ni transacciones explícitas.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from app.backend.core.constants import RATE_LIMIT_PURGE_EVERY
+
+RATE_LIMIT_STORAGE_URI = os.getenv("CYBERWATCH_RATE_LIMIT_STORAGE", "sqlitewal:///./ratelimit.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit (
+    key TEXT PRIMARY KEY,
+    expiry INTEGER NOT NULL,
+    window_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    prev_count INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+# Rotación de ventana común a todas las sentencias: si la fila pertenece a la
+# ventana anterior su contador pasa a ser el "previo"; si es más antigua, se descarta.
+_PREV = "CASE WHEN window_id = :window_id THEN prev_count WHEN window_id = :window_id - 1 THEN count ELSE 0 END"
+_CURR = "CASE WHEN window_id = :window_id THEN count ELSE 0 END"
+
+_ACQUIRE_SQL = f"""
+INSERT INTO rate_limit (key, expiry, window_id, count, prev_count)
+VALUES (:key, :expiry, :window_id, :amount, 0)
+ON CONFLICT(key) DO UPDATE SET
+    prev_count = {_PREV},
+    count = {_CURR} + :amount,
+    window_id = :window_id,
+    expiry = :expiry
+WHERE CAST({_PREV} * :weight + {_CURR} AS INTEGER) + :amount <= :limit
+RETURNING count
+"""
+
+_INCR_SQL = f"""
+INSERT INTO rate_limit (key, expiry, window_id, count, prev_count)
+VALUES (:key, :expiry, :window_id, :amount, 0)
+ON CONFLICT(key) DO UPDATE SET
+    prev_count = {_PREV},
+    count = {_CURR} + :amount,
+    window_id = :window_id,
+    expiry = :expiry
+RETURNING count
+"""
+
+
+class SQLiteWALStorage(Storage, SlidingWindowCounterSupport):
+    """Backend de `limits` sobre SQLite (WAL) compartido por todos los procesos del host"""
+
+    STORAGE_SCHEME = ["sqlitewal"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # Mismo convenio que SQLAlchemy: sqlitewal:///relativa.db, sqlitewal:////absoluta.db
+        self.path = uri.split("://", 1)[1][1:]
+        self._local = threading.local()
+        self._writes = 0
+        self._connect()
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit: cada sentencia es su propia transacción
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Los contadores no necesitan durabilidad ante caídas del sistema operativo
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _params(self, key: str, expiry: int, amount: int, now: float) -> dict:
+        return {
+            "key": key,
+            "expiry": expiry,
+            "window_id": int(now // expiry),
+            "amount": amount,
+        }
+
+    def _after_write(self) -> None:
+        self._writes += 1
+        if self._writes % RATE_LIMIT_PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Eliminar claves cuya ventana actual y previa ya han caducado"""
+        cursor = self._connect().execute(
+            "DELETE FROM rate_limit WHERE (window_id + 2) * expiry < ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+    # --- SlidingWindowCounterSupport ---
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        params = self._params(key, expiry, amount, now)
+        params["limit"] = limit
+        # Peso de la ventana anterior: fracción de ella que sigue dentro de la ventana deslizante
+        params["weight"] = 1 - (now % expiry) / expiry
+        row = self._connect().execute(_ACQUIRE_SQL, params).fetchone()
+        self._after_write()
+        return row is not None
+
+    def get_sliding_window(self, key: str, expiry: int) -> tuple[int, float, int, float]:
+        now = time.time()
+        window = int(now // expiry)
+        row = self._connect().execute(
+            "SELECT window_id, count, prev_count FROM rate_limit WHERE key = ?", (key,)
+        ).fetchone()
+        previous_count, current_count = 0, 0
+        if row:
+            row_window, count, prev_count = row
+            if row_window == window:
+                previous_count, current_count = prev_count, count
+            elif row_window == window - 1:
+                previous_count = count
+        previous_ttl = (1 - (now % expiry) / expiry) * expiry if previous_count else 0.0
+        current_ttl = (1 - (now % expiry) / expiry) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        self.clear(key)
+
+    # --- Storage (ventana fija) ---
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        params = self._params(key, expiry, amount, time.time())
+        row = self._connect().execute(_INCR_SQL, params).fetchone()
+        self._after_write()
+        return row[0]
+
+    def get(self, key: str) -> int:
+        row = self._connect().execute(
+            "SELECT count, window_id, expiry FROM rate_limit WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return 0
+        count, window_id, expiry = row
+        return count if window_id == int(time.time() // expiry) else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._connect().execute(
+            "SELECT window_id, expiry FROM rate_limit WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return time.time()
+        window_id, expiry = row
+        return (window_id + 1) * expiry
+
+    def check(self) -> bool:
+        try:
+            self._connect().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int | None:
+        return self._connect().execute("DELETE FROM rate_limit").rowcount
+
+    def clear(self, key: str) -> None:
+        self._connect().execute("DELETE FROM rate_limit WHERE key = ?", (key,))
+
+
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy="sliding-window-counter",
+)
+
+
+def purge_expired_keys() -> int:
+    """Purgar claves caducadas (tarea periódica: cubre los periodos sin escrituras)"""
+    storage = limiter._storage
+    return storage.purge_expired() if isinstance(storage, SQLiteWALStorage) else 0
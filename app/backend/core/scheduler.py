@@ -0,0 +1,180 @@
+"""
+Planificador de tareas en segundo plano (asyncio, uno por worker).
+
+Cada tarea periódica tiene su propio bucle que espera `interval` más un desfase
+aleatorio de hasta `jitter` segundos, para que los workers no ejecuten a la vez
+la misma tarea. Si al llegar su turno la tarea ya tiene `max_concurrency`
+ejecuciones en curso (una ejecución lenta o lanzada a mano), el turno se salta
+en lugar de acumularse. Las funciones síncronas se ejecutan en un hilo para no
+bloquear el bucle de eventos. Duración, fallos y último éxito de cada tarea se
+exponen en `stats()`.
+
+`CYBERWATCH_SCHEDULER=off` impide arrancarlo (benchmarks, procesos auxiliares).
+"""
+import asyncio
+import inspect
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("CYBERWATCH_SCHEDULER", "on") != "off"
+
+
+class Job:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        interval: Optional[float],
+        jitter: float,
+        delay: float,
+        max_concurrency: int,
+    ):
+        self.name = name
+        self.fn = fn
+        self.interval = interval  # None: se ejecuta una sola vez
+        self.jitter = jitter
+        self.delay = delay
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds: Optional[float] = None
+        self.last_started: Optional[datetime] = None
+        self.last_success: Optional[datetime] = None
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_ms": round(self.last_seconds * 1000, 1) if self.last_seconds is not None else None,
+            "mean_ms": round(self.total_seconds * 1000 / self.runs, 1) if self.runs else None,
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "last_started": self.last_started.isoformat() if self.last_started else None,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    def __init__(self):
+        self._jobs: dict[str, Job] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def every(
+        self,
+        name: str,
+        interval: float,
+        fn: Callable[[], Any],
+        jitter: float = 0.0,
+        delay: Optional[float] = None,
+        max_concurrency: int = 1,
+    ) -> Job:
+        """Registrar una tarea periódica (la primera ejecución, tras `delay` o un intervalo)"""
+        return self._add(Job(name, fn, interval, jitter, interval if delay is None else delay, max_concurrency))
+
+    def once(self, name: str, fn: Callable[[], Any], delay: float = 0.0, jitter: float = 0.0) -> Job:
+        """Registrar una tarea que se ejecuta una sola vez tras `delay` segundos"""
+        return self._add(Job(name, fn, None, jitter, delay, 1))
+
+    def _add(self, job: Job) -> Job:
+        if job.name in self._jobs:
+            raise ValueError(f"Tarea duplicada: {job.name}")
+        self._jobs[job.name] = job
+        if self._loop is not None:
+            self._spawn(self._schedule(job))
+        return job
+
+    def start(self) -> None:
+        """Lanzar los bucles de todas las tareas (se llama en el startup de la aplicación)"""
+        self._loop = asyncio.get_running_loop()
+        for job in self._jobs.values():
+            self._spawn(self._schedule(job))
+
+    def stop(self) -> None:
+        """Cancelar bucles y ejecuciones en curso (las que corren en un hilo terminan solas)"""
+        for task in list(self._tasks):
+            task.cancel()
+        self._loop = None
+
+    def run(self, name: str) -> bool:
+        """
+        Lanzar una ejecución ahora, desde el bucle de eventos.
+
+        Devuelve False si la tarea ya está en su límite de ejecuciones
+        simultáneas; lanza KeyError si no existe.
+        """
+        job = self._jobs[name]
+        if job.running >= job.max_concurrency:
+            job.skipped += 1
+            return False
+        # Se cuenta antes de crear la tarea: dos llamadas seguidas no superan el límite
+        job.running += 1
+        self._spawn(self._execute(job))
+        return True
+
+    def _spawn(self, coro) -> None:
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _schedule(self, job: Job) -> None:
+        await asyncio.sleep(job.delay + random.uniform(0, job.jitter))
+        while True:
+            self.run(job.name)
+            if job.interval is None:
+                return
+            await asyncio.sleep(job.interval + random.uniform(0, job.jitter))
+
+    async def _execute(self, job: Job) -> None:
+        job.last_started = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(job.fn):
+                result = await job.fn()
+            else:
+                result = await asyncio.to_thread(job.fn)
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            logger.exception("Error en la tarea %s", job.name)
+        else:
+            job.last_success = datetime.now(timezone.utc)
+            job.last_result = result
+            job.last_error = None
+        finally:
+            elapsed = time.perf_counter() - start
+            job.running -= 1
+            job.runs += 1
+            job.total_seconds += elapsed
+            job.max_seconds = max(job.max_seconds, elapsed)
+            job.last_seconds = elapsed
+
+    def stats(self) -> dict:
+        return {name: job.stats() for name, job in self._jobs.items()}
+
+    def summary(self) -> dict:
+        """Estado agregado sin detalles de cada tarea (público en /health; el detalle es solo para admin)"""
+        return {
+            "jobs": len(self._jobs),
+            "failing": sum(1 for job in self._jobs.values() if job.last_error is not None),
+        }
+
+
+# Planificador de la aplicación (las tareas se registran en app/backend/jobs.py)
+scheduler = Scheduler()
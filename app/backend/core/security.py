@@ -0,0 +1,108 @@
+"""
+Hash y verificación de contraseñas fuera del event loop.
+
+bcrypt consume ~200-300 ms de CPU por operación; ejecutarlo dentro de un
+handler `async` congela todas las peticiones del worker. Las operaciones se
+envían a un pool de hilos acotado (bcrypt libera el GIL) con un límite de
+operaciones pendientes: al superarlo se rechaza la petición en lugar de
+acumular una cola de espera ilimitada.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from app.backend.core.constants import (
+    BCRYPT_MAX_PASSWORD_LENGTH,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def truncate_password(password: str) -> str:
+    """Truncar password a 72 bytes (limitación de bcrypt)"""
+    password_bytes = password.encode('utf-8')
+    if len(password_bytes) > BCRYPT_MAX_PASSWORD_LENGTH:
+        password = password_bytes[:BCRYPT_MAX_PASSWORD_LENGTH].decode('utf-8', errors='ignore')
+    return password
+
+
+class PasswordHasherBusy(Exception):
+    """Se ha alcanzado el máximo de operaciones de hash pendientes"""
+
+
+class PasswordHasher:
+    """Pool acotado para operaciones bcrypt con métricas básicas"""
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.errors = 0
+        self.queue_wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.max_run_seconds = 0.0
+
+    async def _run(self, fn, *args):
+        # Solo se modifica desde el event loop: no necesita lock
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        self.pending += 1
+        submitted = time.perf_counter()
+        timing = {}
+
+        def timed():
+            timing["started"] = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timing["finished"] = time.perf_counter()
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, timed)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.pending -= 1
+            if "finished" in timing:
+                run = timing["finished"] - timing["started"]
+                self.completed += 1
+                self.queue_wait_seconds += timing["started"] - submitted
+                self.run_seconds += run
+                self.max_run_seconds = max(self.max_run_seconds, run)
+
+    async def hash(self, password: str) -> str:
+        """Hashear una contraseña (truncada a 72 bytes)"""
+        return await self._run(pwd_context.hash, truncate_password(password))
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """Verificar una contraseña; lanza excepción si `hashed` no es un hash reconocible"""
+        return await self._run(pwd_context.verify, password, hashed)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "avg_queue_wait_ms": round(self.queue_wait_seconds * 1000 / self.completed, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.run_seconds * 1000 / self.completed, 2) if self.completed else 0.0,
+            "max_run_ms": round(self.max_run_seconds * 1000, 2),
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
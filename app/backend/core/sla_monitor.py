@@ -0,0 +1,180 @@
+"""
+Monitor de SLA de atención basado en un montículo de plazos.
+
+En lugar de recorrer periódicamente todos los incidentes abiertos, se mantiene
+un min-heap con el plazo de cada uno: se construye una vez al arrancar y se
+actualiza con los cambios que publica el repositorio en el bus de eventos. La
+tarea asyncio duerme hasta el plazo más próximo y solo se despierta antes si un
+cambio lo adelanta. Las entradas que quedan obsoletas (incidente cerrado, plazo
+recalculado...) no se buscan dentro del montículo: se descartan al salir
+comparándolas con el plazo vigente del incidente.
+
+Cada worker ve solo los cambios que escribe él; quien registra el
+incumplimiento debe comprobar en la base de datos que sigue vigente.
+"""
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Callable, Iterable, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from app.backend.core.events import IncidentChange
+
+logger = logging.getLogger(__name__)
+
+# Entradas obsoletas toleradas antes de reconstruir el montículo
+_COMPACT_SLACK = 64
+
+
+class SLADeadline(NamedTuple):
+    incident_id: int
+    code: str
+    severity: str
+    opened_at: datetime
+    deadline: Optional[datetime]  # None si la severidad no tiene objetivo
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """UTC sin zona (formato en que se guardan las fechas)"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def utcnow() -> datetime:
+    return to_naive_utc(datetime.now(timezone.utc))
+
+
+class SLAMonitor:
+    def __init__(
+        self,
+        targets: dict[str, int],
+        status: str,
+        on_breach: Callable[[list[SLADeadline]], None],
+    ):
+        self.targets = {severity: timedelta(seconds=seconds) for severity, seconds in targets.items()}
+        self.status = status
+        self._on_breach = on_breach
+        # Incidentes en `status` indexados por id, y los que ya incumplieron su plazo vigente
+        self._open: dict[int, SLADeadline] = {}
+        self._breached: set[int] = set()
+        self._heap: list[tuple[datetime, int]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.wakeups = 0
+
+    @property
+    def next_deadline(self) -> Optional[datetime]:
+        return self._heap[0][0] if self._heap else None
+
+    def start(self, open_incidents: Iterable[tuple[int, str, str, datetime]]) -> None:
+        """Cargar los incidentes abiertos (id, código, severidad, abierto desde) y lanzar la tarea"""
+        self._open.clear()
+        self._breached.clear()
+        for incident_id, code, severity, opened_at in open_incidents:
+            self._open[incident_id] = self._entry(incident_id, code, severity, opened_at)
+        self._rebuild()
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def handle(self, change: "IncidentChange") -> None:
+        """Suscriptor del bus de eventos (seguro desde cualquier hilo)"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is None or running is self._loop:
+            self._apply(change)
+        else:
+            self._loop.call_soon_threadsafe(self._apply, change)
+
+    def _apply(self, change: "IncidentChange") -> None:
+        after = change.after
+        if after is None or after.status != self.status:
+            self._open.pop(change.incident_id, None)
+            self._breached.discard(change.incident_id)
+            return
+        # El reloj corre desde la entrada en el estado, no desde la última modificación
+        current = self._open.get(after.id)
+        still_open = change.before is not None and change.before.status == self.status
+        if still_open and current:
+            opened_at = current.opened_at
+        else:
+            opened_at = to_naive_utc(change.ts) if change.ts else utcnow()
+        entry = self._entry(after.id, after.code, after.severity, opened_at)
+        self._open[after.id] = entry
+        if current and current.deadline == entry.deadline:
+            return
+        self._breached.discard(after.id)
+        if entry.deadline is not None:
+            self._push(entry)
+
+    def _entry(self, incident_id: int, code: str, severity: str, opened_at: datetime) -> SLADeadline:
+        target = self.targets.get(severity)
+        return SLADeadline(incident_id, code, severity, opened_at, opened_at + target if target else None)
+
+    def _push(self, entry: SLADeadline) -> None:
+        earliest = self.next_deadline
+        heapq.heappush(self._heap, (entry.deadline, entry.incident_id))
+        if len(self._heap) > 2 * len(self._open) + _COMPACT_SLACK:
+            self._rebuild()
+        # Solo hace falta despertar la tarea si el plazo más próximo se adelanta
+        if (earliest is None or entry.deadline < earliest) and self._wakeup:
+            self._wakeup.set()
+
+    def _rebuild(self) -> None:
+        self._heap = [
+            (entry.deadline, incident_id)
+            for incident_id, entry in self._open.items()
+            if entry.deadline is not None and incident_id not in self._breached
+        ]
+        heapq.heapify(self._heap)
+
+    def _pop_due(self, now: datetime) -> list[SLADeadline]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, incident_id = heapq.heappop(self._heap)
+            entry = self._open.get(incident_id)
+            if entry is None or entry.deadline != deadline or incident_id in self._breached:
+                continue  # Entrada obsoleta
+            self._breached.add(incident_id)
+            due.append(entry)
+        return due
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            due = self._pop_due(utcnow())
+            if due:
+                self.expired += len(due)
+                try:
+                    await asyncio.to_thread(self._on_breach, due)
+                except Exception:
+                    logger.exception("Error registrando incumplimientos de SLA")
+                continue
+            timeout = (self._heap[0][0] - utcnow()).total_seconds() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeups += 1
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self._open),
+            "pending": sum(
+                1 for incident_id, entry in self._open.items()
+                if entry.deadline is not None and incident_id not in self._breached
+            ),
+            "heap_size": len(self._heap),
+            "next_deadline": self.next_deadline.isoformat() if self._heap else None,
+            "expired": self.expired,
+            "wakeups": self.wakeups,
+        }
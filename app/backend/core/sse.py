@@ -0,0 +1,120 @@
+"""
+Difusión de Server-Sent Events a clientes conectados.
+
+Cada evento se serializa una sola vez y se encola (put_nowait) en la cola
+acotada de cada cliente: coste O(1) por cliente y evento, sin esperas. Un
+cliente que no consume se desconecta al llenar su cola en lugar de frenar al
+resto; al reconectar (EventSource lo hace solo) recibe un estado completo.
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+
+class BrokerFull(Exception):
+    """Se ha alcanzado el máximo de conexiones simultáneas"""
+
+
+def format_sse(event: str, data: dict, retry_ms: Optional[int] = None) -> bytes:
+    lines = []
+    if retry_ms is not None:
+        lines.append(f"retry: {retry_ms}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), ensure_ascii=False)}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class SSEBroker:
+    def __init__(self, max_clients: int, queue_size: int, heartbeat_seconds: float):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self._queues: set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._queues)
+
+    @property
+    def queued(self) -> int:
+        """Eventos encolados pendientes de enviar, sumando todos los clientes"""
+        return sum(queue.qsize() for queue in list(self._queues))
+
+    def connect(self) -> asyncio.Queue:
+        """Registrar un cliente (lanza BrokerFull si se supera el límite)"""
+        if len(self._queues) >= self.max_clients:
+            self.rejected += 1
+            raise BrokerFull()
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._queues.add(queue)
+        return queue
+
+    def disconnect(self, queue: asyncio.Queue) -> None:
+        self._queues.discard(queue)
+
+    def publish(self, event: str, data: dict) -> None:
+        """Enviar un evento a todos los clientes (seguro desde cualquier hilo)"""
+        if not self._queues or self._loop is None:
+            return
+        message = format_sse(event, data)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fan_out(message)
+        else:
+            self._loop.call_soon_threadsafe(self._fan_out, message)
+
+    def _fan_out(self, message: bytes) -> None:
+        self.published += 1
+        for queue in list(self._queues):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._close(queue)
+                self.dropped += 1
+
+    def _close(self, queue: asyncio.Queue) -> None:
+        # Vaciar la cola para que quepa la marca de fin (None)
+        self._queues.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def close_all(self) -> None:
+        """Terminar todas las conexiones (apagado de la aplicación)"""
+        for queue in list(self._queues):
+            self._close(queue)
+
+    async def stream(self, queue: asyncio.Queue, initial: bytes) -> AsyncIterator[bytes]:
+        """Cuerpo de la respuesta: mensaje inicial, eventos y latidos periódicos"""
+        try:
+            yield initial
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield b": ping\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.disconnect(queue)
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._queues),
+            "queued": self.queued,
+            "max_clients": self.max_clients,
+            "published": self.published,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
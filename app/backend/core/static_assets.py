@@ -0,0 +1,168 @@
+"""
+Pipeline de recursos estáticos.
+
+`python build_static.py` genera en `STATIC_BUILD_DIR`, a partir de
+`app/frontend/static`:
+  - cada fichero minificado (CSS/JS) con su nombre original y con una copia
+    con huella de contenido (`css/style.3f2a9c1b7d0e.css`),
+  - variantes precomprimidas `.gz` (y `.br` si está instalado `brotli`),
+  - `manifest.json` con la correspondencia nombre original -> nombre con huella.
+
+Las plantillas usan `static_url('css/style.css')`. Si existe el manifiesto se
+sirve el directorio generado: los ficheros con huella con caché inmutable de
+un año y la variante precomprimida que acepte el navegador. Sin build (entorno
+de desarrollo) se sirven los ficheros originales, siempre revalidados.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import stat
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.backend.core.constants import STATIC_IMMUTABLE_MAX_AGE
+
+try:
+    import brotli
+except ImportError:  # Dependencia opcional: sin ella solo se generan variantes gzip
+    brotli = None
+
+STATIC_SOURCE_DIR = "app/frontend/static"
+STATIC_BUILD_DIR = "app/frontend/static_build"
+MANIFEST_NAME = "manifest.json"
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".map"}
+FINGERPRINT_LENGTH = 12
+
+
+def minify_css(source: str) -> str:
+    """Eliminar comentarios y espacios innecesarios (sin reescribir reglas)"""
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.DOTALL)
+    source = re.sub(r"\s+", " ", source)
+    source = re.sub(r"\s*([{};,>])\s*", r"\1", source)
+    source = re.sub(r":\s+", ":", source)
+    return source.replace(";}", "}").strip()
+
+
+def minify_js(source: str) -> str:
+    """Minificación conservadora: sangría, líneas vacías y comentarios de línea completa"""
+    lines = (line.strip() for line in source.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def fingerprinted_name(path: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:FINGERPRINT_LENGTH]
+    base, ext = os.path.splitext(path)
+    return f"{base}.{digest}{ext}"
+
+
+def _write(path: str, content: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def _write_variants(path: str, content: bytes) -> None:
+    """Escribir el fichero y sus variantes comprimidas (solo si ocupan menos)"""
+    _write(path, content)
+    if os.path.splitext(path)[1] not in COMPRESSIBLE_EXTENSIONS:
+        return
+    compressed = gzip.compress(content, compresslevel=9, mtime=0)
+    if len(compressed) < len(content):
+        _write(path + ".gz", compressed)
+    if brotli is not None:
+        compressed = brotli.compress(content, quality=11)
+        if len(compressed) < len(content):
+            _write(path + ".br", compressed)
+
+
+def build(source_dir: str = STATIC_SOURCE_DIR, build_dir: str = STATIC_BUILD_DIR) -> dict[str, str]:
+    """Generar el directorio de recursos optimizados y su manifiesto"""
+    shutil.rmtree(build_dir, ignore_errors=True)
+    manifest: dict[str, str] = {}
+    for root, _, files in os.walk(source_dir):
+        for filename in sorted(files):
+            source_path = os.path.join(root, filename)
+            relative = os.path.relpath(source_path, source_dir).replace(os.sep, "/")
+            with open(source_path, "rb") as f:
+                content = f.read()
+            minifier = MINIFIERS.get(os.path.splitext(filename)[1])
+            if minifier:
+                content = minifier(content.decode("utf-8")).encode("utf-8")
+            hashed = fingerprinted_name(relative, content)
+            _write_variants(os.path.join(build_dir, relative), content)
+            _write_variants(os.path.join(build_dir, hashed), content)
+            manifest[relative] = hashed
+
+    # El manifiesto se escribe al final: su presencia indica un build completo
+    _write(os.path.join(build_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def load_manifest(build_dir: str = STATIC_BUILD_DIR) -> dict[str, str]:
+    try:
+        with open(os.path.join(build_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+manifest = load_manifest()
+
+
+def static_url(path: str) -> str:
+    """URL pública de un recurso estático (con huella si hay build)"""
+    return f"/static/{manifest.get(path, path)}"
+
+
+class AssetStaticFiles(StaticFiles):
+    """StaticFiles con variantes precomprimidas y caché inmutable para ficheros con huella"""
+
+    def __init__(self, *, directory: str, manifest: dict[str, str]):
+        super().__init__(directory=directory)
+        self.immutable_paths = set(manifest.values())
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await self._precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            if path.replace(os.sep, "/") in self.immutable_paths:
+                response.headers["Cache-Control"] = f"public, max-age={STATIC_IMMUTABLE_MAX_AGE}, immutable"
+            else:
+                response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    async def _precompressed_response(self, path: str, scope: Scope) -> Response | None:
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in accept_encoding:
+                continue
+            full_path, stat_result = self.lookup_path(path + suffix)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers["Content-Encoding"] = encoding
+                media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                if media_type.startswith("text/"):
+                    media_type += "; charset=utf-8"
+                response.headers["Content-Type"] = media_type
+                response.headers["Vary"] = "Accept-Encoding"
+                return response
+        return None
+
+
+def create_static_app() -> AssetStaticFiles:
+    """Servir el directorio generado si hay build; si no, los ficheros originales"""
+    if manifest:
+        return AssetStaticFiles(directory=STATIC_BUILD_DIR, manifest=manifest)
+    return AssetStaticFiles(directory=STATIC_SOURCE_DIR, manifest={})
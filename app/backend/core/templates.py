@@ -0,0 +1,59 @@
+"""
+Entorno Jinja2 único para toda la aplicación.
+
+Todos los routers comparten el mismo `Environment` (y por tanto la misma caché
+de plantillas compiladas). En producción (`CYBERWATCH_ENV=production`) se
+desactiva la comprobación de cambios en disco y el bytecode compilado se
+persiste en `CYBERWATCH_JINJA_CACHE_DIR`, de modo que un worker nuevo no
+recompila las plantillas desde el código fuente.
+"""
+import os
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from app.backend.core.static_assets import static_url
+
+TEMPLATES_DIR = "app/frontend/templates"
+IS_PRODUCTION = os.getenv("CYBERWATCH_ENV", "development") == "production"
+JINJA_CACHE_DIR = os.getenv("CYBERWATCH_JINJA_CACHE_DIR", ".cache/jinja")
+
+
+def _bytecode_cache() -> FileSystemBytecodeCache:
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    return FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=True,
+    auto_reload=not IS_PRODUCTION,
+    bytecode_cache=_bytecode_cache(),
+)
+
+env.globals["static_url"] = static_url
+
+templates = Jinja2Templates(env=env)
+
+
+def precompile_templates() -> int:
+    """Compilar y cachear todas las plantillas (se llama al arrancar la aplicación)"""
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def purge_stale_bytecode() -> int:
+    """Eliminar del directorio de caché el bytecode de plantillas que ya no existen"""
+    cache = env.bytecode_cache
+    current = {
+        cache.pattern % cache.get_cache_key(name, env.loader.get_source(env, name)[1])
+        for name in env.list_templates()
+    }
+    removed = 0
+    for entry in os.scandir(JINJA_CACHE_DIR):
+        if entry.is_file() and entry.name.startswith("__jinja2_") and entry.name not in current:
+            os.remove(entry.path)
+            removed += 1
+    return removed
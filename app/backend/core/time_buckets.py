@@ -0,0 +1,144 @@
+"""
+Ventanas y cubetas temporales para las gráficas del dashboard.
+
+Las cubetas se alinean en la zona horaria del analista: con resolución diaria
+cada cubeta empieza en una medianoche local (un día con cambio de hora dura 23
+o 25 horas). La base de datos agrega los incidentes en franjas UTC de
+`slot_seconds`, lo bastante finas para que cada franja caiga entera dentro de
+una cubeta (los desfases horarios son múltiplos de 15 minutos), y aquí solo se
+suman esas franjas: nunca se recorren incidentes individuales.
+
+Si una ventana tuviera más de TREND_MAX_BUCKETS cubetas con la resolución
+pedida (p. ej. 90d/5m), se agrupan en el menor paso de DOWNSAMPLE_STEPS que
+no la supere.
+"""
+from bisect import bisect_right
+from calendar import timegm
+from datetime import datetime, time, timedelta, timezone
+from typing import NamedTuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.backend.core.constants import TREND_MAX_BUCKETS
+
+WINDOWS = {
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "90d": timedelta(days=90),
+}
+RESOLUTIONS = {
+    "5m": timedelta(minutes=5),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+LABEL_FORMATS = {"5m": "%H:%M", "1h": "%Hh", "1d": "%d/%m"}
+# Las cubetas agrupadas abarcan varios días: la etiqueta lleva la fecha
+DOWNSAMPLED_LABEL_FORMAT = "%d/%m %H:%M"
+
+# Pasos para agrupar cubetas (segundos; dividen un día, así que siguen alineados con el reloj local)
+DOWNSAMPLE_STEPS = (300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200)
+
+# Granularidad máxima de las franjas agregadas en SQL (divide cualquier desfase horario)
+MAX_SLOT_SECONDS = 900
+# Franjas del agregado persistente de detecciones (la resolución más fina)
+ROLLUP_SLOT_SECONDS = 300
+
+
+class InvalidTrendSpec(ValueError):
+    """Ventana, resolución o zona horaria no válidas"""
+
+
+class TrendSpec(NamedTuple):
+    window: str
+    resolution: str
+    tz: str
+
+    @property
+    def step_seconds(self) -> int:
+        """Duración de cada cubeta: la resolución pedida o la agrupada"""
+        step = int(RESOLUTIONS[self.resolution].total_seconds())
+        if self.resolution == "1d":
+            return step
+        window = WINDOWS[self.window].total_seconds()
+        return next(
+            (size for size in DOWNSAMPLE_STEPS if size >= step and window // size <= TREND_MAX_BUCKETS),
+            DOWNSAMPLE_STEPS[-1],
+        )
+
+    @property
+    def downsampled(self) -> bool:
+        return self.step_seconds != RESOLUTIONS[self.resolution].total_seconds()
+
+    @property
+    def bucket_count(self) -> int:
+        return int(WINDOWS[self.window].total_seconds()) // self.step_seconds
+
+    @property
+    def slot_seconds(self) -> int:
+        return min(self.step_seconds, MAX_SLOT_SECONDS)
+
+
+def parse_trend_spec(window: str, resolution: str, tz: str) -> TrendSpec:
+    """Validar los parámetros de una gráfica de tendencia"""
+    if window not in WINDOWS:
+        raise InvalidTrendSpec(f"Ventana no válida. Permitidas: {', '.join(WINDOWS)}")
+    if resolution not in RESOLUTIONS:
+        raise InvalidTrendSpec(f"Resolución no válida. Permitidas: {', '.join(RESOLUTIONS)}")
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise InvalidTrendSpec(f"Zona horaria no válida: {tz}")
+    spec = TrendSpec(window, resolution, tz)
+    if spec.bucket_count < 1:
+        raise InvalidTrendSpec(f"La combinación {window}/{resolution} no genera ninguna cubeta")
+    return spec
+
+
+def bucket_boundaries(spec: TrendSpec, now: datetime) -> list[int]:
+    """
+    Límites de las cubetas en segundos epoch (una más que cubetas).
+
+    La última cubeta es la que contiene `now` (en curso).
+    """
+    tz = ZoneInfo(spec.tz)
+    count = spec.bucket_count
+    local_now = now.astimezone(tz)
+
+    if spec.resolution == "1d":
+        today = local_now.date()
+        days = [today - timedelta(days=offset) for offset in range(count - 1, -2, -1)]
+        return [int(datetime.combine(day, time(), tzinfo=tz).timestamp()) for day in days]
+
+    step = spec.step_seconds
+    now_ts = int(now.timestamp())
+    # Alinear con el reloj local (p. ej. horas en punto en zonas con desfase de media hora)
+    current = now_ts - (now_ts + int(local_now.utcoffset().total_seconds())) % step
+    return [current + step * offset for offset in range(-(count - 1), 2)]
+
+
+def bucket_labels(spec: TrendSpec, boundaries: list[int]) -> list[str]:
+    tz = ZoneInfo(spec.tz)
+    fmt = DOWNSAMPLED_LABEL_FORMAT if spec.downsampled else LABEL_FORMATS[spec.resolution]
+    return [datetime.fromtimestamp(start, tz).strftime(fmt) for start in boundaries[:-1]]
+
+
+def rollup(boundaries: list[int], slots: list[tuple[int, int, int]]) -> tuple[list[int], list[int]]:
+    """Sumar franjas (inicio epoch, total, críticos) en las cubetas delimitadas por `boundaries`"""
+    total = [0] * (len(boundaries) - 1)
+    critical = [0] * (len(boundaries) - 1)
+    for slot_start, slot_total, slot_critical in slots:
+        idx = bisect_right(boundaries, slot_start) - 1
+        if 0 <= idx < len(total):
+            total[idx] += slot_total
+            critical[idx] += slot_critical
+    return total, critical
+
+
+def epoch_to_naive_utc(seconds: int) -> datetime:
+    """Epoch -> datetime UTC sin zona (formato en que se guardan las fechas)"""
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+def naive_utc_to_epoch(value: datetime) -> int:
+    """Inversa de epoch_to_naive_utc (las fechas con zona se convierten a UTC)"""
+    return timegm(value.utctimetuple())
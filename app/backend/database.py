@@ -1,16 +1,142 @@
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import Engine, MetaData, Table, text
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.schema import CreateColumn, CreateTable
 from sqlmodel import SQLModel, create_engine, Session
 
-DATABASE_URL = "sqlite:///./cyberwatch.db"
+from app.backend.core.metrics import db_pool_checkout_wait
+
+DATABASE_URL = os.getenv("CYBERWATCH_DATABASE_URL", "sqlite:///./cyberwatch.db")
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que registra cuánto espera cada petición por una conexión"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - start)
+
 
 engine = create_engine(
     DATABASE_URL,
     echo=False,
     connect_args={"check_same_thread": False},
+    poolclass=TimedQueuePool,
 )
 
+# Modo auto_vacuum de SQLite en que las páginas libres se devuelven con incremental_vacuum
+AUTO_VACUUM_INCREMENTAL = 2
+
+def add_missing_columns(target: Engine, tables: Optional[list[Table]] = None) -> list[str]:
+    """
+    Añadir las columnas nuevas del modelo a tablas existentes (create_all no lo hace).
+
+    Solo columnas que admiten NULL: ALTER TABLE ADD COLUMN no reescribe la
+    tabla y las filas existentes quedan a NULL hasta que se rellenen.
+    """
+    added = []
+    with target.begin() as conn:
+        for table in tables or SQLModel.metadata.sorted_tables:
+            existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table.name}")')}
+            if not existing:
+                continue
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {CreateColumn(column).compile(target)}'))
+                    added.append(f"{table.name}.{column.name}")
+    return added
+
+def enable_autoincrement(table: Table, floor: int = 0, target: Engine = engine) -> bool:
+    """
+    Reconstruir una tabla creada sin AUTOINCREMENT (retorna si se ha reconstruido).
+
+    Sin AUTOINCREMENT SQLite asigna max(id) + 1 y reutiliza los ids de las
+    filas borradas. La secuencia arranca en el mayor id de la tabla o en
+    `floor` (ids que siguen existiendo fuera de ella), el que sea mayor.
+    """
+    with target.connect() as conn:
+        # Bloqueo de escritura antes de comprobar: otro worker puede estar arrancando a la vez
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        sql = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+        ).scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            conn.rollback()
+            return False
+        # Procedimiento de SQLite para cambiar el esquema: tabla nueva, copia, borrado y renombrado
+        # Las tablas referenciadas acompañan a la copia para compilar sus claves foráneas
+        metadata = MetaData()
+        for foreign_key in table.foreign_keys:
+            foreign_key.column.table.to_metadata(metadata)
+        rebuilt = table.to_metadata(metadata, name=f"_rebuild_{table.name}")
+        conn.execute(CreateTable(rebuilt))
+        columns = ", ".join(f'"{column.name}"' for column in table.columns)
+        conn.exec_driver_sql(f'INSERT INTO "{rebuilt.name}" ({columns}) SELECT {columns} FROM "{table.name}"')
+        conn.exec_driver_sql(f'DROP TABLE "{table.name}"')
+        conn.exec_driver_sql(f'ALTER TABLE "{rebuilt.name}" RENAME TO "{table.name}"')
+        for index in table.indexes:
+            index.create(conn)
+        seq = conn.exec_driver_sql("SELECT seq FROM sqlite_sequence WHERE name = ?", (table.name,)).scalar()
+        if seq is None:
+            conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table.name, floor))
+        elif seq < floor:
+            conn.exec_driver_sql("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (floor, table.name))
+        conn.commit()
+    return True
+
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Solo tiene efecto en una base de datos nueva (antes de crear la primera tabla)
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        SQLModel.metadata.create_all(conn)
+    add_missing_columns(engine)
+    # create_all no añade índices nuevos a tablas que ya existen
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+def analyze_db(analysis_limit: int) -> None:
+    """Recalcular las estadísticas del planificador de consultas (muestreando como mucho `analysis_limit` filas por índice)"""
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        conn.exec_driver_sql("ANALYZE")
+        conn.commit()
+
+def optimize_db() -> None:
+    """PRAGMA optimize: vuelve a analizar solo las tablas cuyas estadísticas han quedado desfasadas"""
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA optimize")
+        conn.commit()
+
+def incremental_vacuum(max_pages: int) -> int:
+    """Devolver al sistema hasta `max_pages` páginas libres; retorna las liberadas"""
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            return 0
+        free_before = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        pages = min(free_before, max_pages)
+        if not pages:
+            return 0
+        # sqlite3 avanza la sentencia un solo paso, que libera una página: se repite
+        # dentro de una única transacción (unos microsegundos por página)
+        cursor.execute("BEGIN")
+        for _ in range(pages):
+            cursor.execute("PRAGMA incremental_vacuum")
+        # Ejecutar otra sentencia termina la última; con ella pendiente no se puede confirmar
+        free_after = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.commit()
+        return free_before - free_after
+    finally:
+        conn.close()
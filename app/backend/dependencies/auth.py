@@ -1,8 +1,9 @@
 from fastapi import Depends, Request, HTTPException, status
-from sqlmodel import Session, select
+from sqlmodel import Session
 
 from app.backend.database import get_session
 from app.backend.models import User
+from app.backend.repositories.user_repository import get_cached_user_by_email
 
 
 def get_current_user(
@@ -12,8 +13,15 @@ def get_current_user(
     email = request.cookies.get("user_email")
     if not email:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    statement = select(User).where(User.email == email)
-    user = session.exec(statement).first()
+    # La sesión de la petición solo abre conexión si hay fallo de caché
+    user = get_cached_user_by_email(session, email)
     if not user or not user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    return user
\ No newline at end of file
+    return user
+
+
+def require_admin(user: User = Depends(get_current_user)) -> User:
+    """Dependencia que requiere que el usuario sea administrador"""
+    if user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acceso denegado: solo administradores")
+    return user
@@ -0,0 +1,106 @@
+"""
+Tareas de mantenimiento y precálculo en segundo plano.
+
+Se registran en el planificador de la aplicación, que se arranca en el startup
+y se detiene en el shutdown. Cada worker ejecuta las suyas, con jitter para no
+coincidir.
+"""
+from datetime import timedelta
+from typing import Optional
+
+from sqlmodel import Session
+
+from app.backend.database import engine, analyze_db, optimize_db, incremental_vacuum
+from app.backend.repositories.incident_repository import IncidentRepository, UNFILTERED_FACETS
+from app.backend.repositories.incident_archive_repository import IncidentArchiveRepository
+from app.backend.routers.dashboard import DEFAULT_TREND, get_dashboard_data, push_dashboard_snapshot
+from app.backend.core.constants import (
+    JOB_JITTER_RATIO,
+    JOB_CACHE_WARM_INTERVAL,
+    JOB_CACHE_WARM_IDLE_SECONDS,
+    DASHBOARD_SNAPSHOT_INTERVAL,
+    JOB_OPTIMIZE_INTERVAL,
+    JOB_VACUUM_INTERVAL,
+    JOB_VACUUM_MAX_PAGES,
+    JOB_CLEANUP_INTERVAL,
+    JOB_ANALYZE_DELAY,
+    ANALYZE_ROW_LIMIT,
+    JOB_ARCHIVE_INTERVAL,
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_BATCH_SIZE,
+    METRICS_FLUSH_INTERVAL,
+    MEMORY_SNAPSHOT_INTERVAL,
+)
+from app.backend.core.cache import invalidate_incident_caches, dashboard_cache, facet_cache, trend_cache
+from app.backend.core.metrics import registry as metrics_registry
+from app.backend.core.profiler import purge_profiles
+from app.backend.core.memory import TRACEMALLOC_ENABLED, tracker as memory_tracker
+from app.backend.core.rate_limit import purge_expired_keys
+from app.backend.core.scheduler import scheduler
+from app.backend.core.sla_monitor import utcnow
+from app.backend.core.templates import purge_stale_bytecode
+
+
+def warm_caches() -> list[str]:
+    """
+    Recalcular dashboard, tendencia por defecto y facetas sin filtros antes de
+    que caduquen o tras invalidarse, solo si se han leído hace poco: sin
+    tráfico no se recorre la tabla de incidentes. Retorna lo recalculado.
+    """
+    horizon = JOB_CACHE_WARM_INTERVAL * (1 + JOB_JITTER_RATIO)
+    warmed = []
+    with Session(engine) as session:
+        repo = IncidentRepository(session)
+        # La tendencia primero: el dashboard la reutiliza desde la caché
+        if trend_cache.needs_warming(DEFAULT_TREND, horizon, JOB_CACHE_WARM_IDLE_SECONDS):
+            repo.get_trend(DEFAULT_TREND, refresh=True)
+            warmed.append("trend")
+        if dashboard_cache.needs_warming("dashboard", horizon, JOB_CACHE_WARM_IDLE_SECONDS):
+            get_dashboard_data(session, refresh=True)
+            warmed.append("dashboard")
+        if facet_cache.needs_warming(UNFILTERED_FACETS, horizon, JOB_CACHE_WARM_IDLE_SECONDS):
+            repo.get_facets(refresh=True)
+            warmed.append("facets")
+    return warmed
+
+
+def archive_closed_incidents() -> int:
+    """Mover al archivo los incidentes cerrados hace más de ARCHIVE_AFTER_DAYS días"""
+    now = utcnow()
+    with Session(engine) as session:
+        archived = IncidentArchiveRepository(session).archive_closed(
+            now - timedelta(days=ARCHIVE_AFTER_DAYS), now, ARCHIVE_BATCH_SIZE
+        )
+    if archived:
+        invalidate_incident_caches()
+    return archived
+
+
+def cleanup() -> dict:
+    return {
+        "rate_limit_keys": purge_expired_keys(),
+        "stale_bytecode": purge_stale_bytecode(),
+        "profiles": purge_profiles(),
+    }
+
+
+def snapshot_memory() -> Optional[int]:
+    """Instantánea de tracemalloc; el historial completo está en /admin/diagnostics/memory"""
+    entry = memory_tracker.snapshot()
+    return entry["growth_bytes"] if entry else None
+
+
+def periodic(name: str, interval: float, fn, **kwargs) -> None:
+    scheduler.every(name, interval, fn, jitter=interval * JOB_JITTER_RATIO, **kwargs)
+
+
+periodic("warm_caches", JOB_CACHE_WARM_INTERVAL, warm_caches, delay=0)
+periodic("dashboard_snapshot", DASHBOARD_SNAPSHOT_INTERVAL, push_dashboard_snapshot)
+periodic("optimize", JOB_OPTIMIZE_INTERVAL, optimize_db)
+periodic("incremental_vacuum", JOB_VACUUM_INTERVAL, lambda: incremental_vacuum(JOB_VACUUM_MAX_PAGES))
+periodic("cleanup", JOB_CLEANUP_INTERVAL, cleanup)
+periodic("archive", JOB_ARCHIVE_INTERVAL, archive_closed_incidents)
+periodic("metrics_flush", METRICS_FLUSH_INTERVAL, metrics_registry.flush)
+if TRACEMALLOC_ENABLED:
+    periodic("memory_snapshot", MEMORY_SNAPSHOT_INTERVAL, snapshot_memory)
+scheduler.once("analyze", lambda: analyze_db(ANALYZE_ROW_LIMIT), delay=JOB_ANALYZE_DELAY, jitter=JOB_ANALYZE_DELAY)
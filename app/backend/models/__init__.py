@@ -1,5 +1,11 @@
 from .incident import Incident
 from .user import User
 from .incident_attachment import IncidentAttachment
+from .incident_event import IncidentEvent
+from .sla_breach import SLABreach
+from .archived_incident import ArchivedIncident
+from .incident_code import IncidentSeverity, IncidentStatus
+from .revision import Revision
+from .detection_slot import DetectionSlot
 
-__all__ = ["User", "Incident", "IncidentAttachment"]
\ No newline at end of file
+__all__ = ["User", "Incident", "IncidentAttachment", "IncidentEvent", "SLABreach", "ArchivedIncident", "IncidentSeverity", "IncidentStatus", "Revision", "DetectionSlot"]
\ No newline at end of file
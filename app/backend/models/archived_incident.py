@@ -0,0 +1,22 @@
+from typing import Optional
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+class ArchivedIncident(SQLModel, table=True):
+    """
+    Catálogo de incidentes movidos a una partición de archivo.
+
+    Fila ligera que se queda en la base activa: localiza la partición,
+    mantiene únicos los códigos y conserva lo necesario para la analítica de
+    tiempos de resolución sin abrir los ficheros de archivo.
+    """
+    id: int = Field(primary_key=True)  # Mismo id que tenía en `incident`
+    code: str = Field(index=True, unique=True, max_length=50)
+    partition: str = Field(max_length=7)  # AAAA_MM del mes de detección
+    severity: str = Field(max_length=20)
+    severity_code: Optional[int] = None
+    source: str = Field(max_length=50)
+    owner: Optional[str] = Field(default=None, max_length=200)
+    detected_at: datetime = Field(index=True)
+    closed_at: datetime
+    archived_at: datetime
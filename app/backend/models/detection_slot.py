@@ -0,0 +1,7 @@
+from sqlmodel import SQLModel, Field
+
+class DetectionSlot(SQLModel, table=True):
+    """Incidentes detectados (activos y archivados) por franja UTC de ROLLUP_SLOT_SECONDS"""
+    slot_start: int = Field(primary_key=True)  # Inicio de la franja en segundos epoch
+    total: int = 0
+    critical: int = 0
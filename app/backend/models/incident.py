@@ -1,15 +1,32 @@
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field
 
+from app.backend.core.incident_codes import CLOSED_STATUS_MIN
+
 class Incident(SQLModel, table=True):
+    __table_args__ = (
+        # Lista filtrada por estado, más recientes primero
+        Index("ix_incident_status_detected", "status_code", "detected_at"),
+        # Cola de trabajo: solo contiene los incidentes activos
+        Index("ix_incident_active_detected", "detected_at", sqlite_where=text(f"status_code < {CLOSED_STATUS_MIN}")),
+        # Ids nunca reutilizados: los archivados siguen existiendo fuera de la tabla
+        {"sqlite_autoincrement": True},
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     code: str = Field(index=True, unique=True, max_length=50)
     title: str = Field(max_length=200)
-    severity: str = Field(index=True, max_length=20)
-    status: str = Field(index=True, max_length=50)
+    # Severidad y estado: el código es lo que se filtra e indexa; la etiqueta canónica se guarda para mostrarla
+    severity_code: Optional[int] = Field(default=None, foreign_key="incidentseverity.code", index=True)
+    severity: str = Field(max_length=20)
+    status_code: Optional[int] = Field(default=None, foreign_key="incidentstatus.code")
+    status: str = Field(max_length=50)
     source: str = Field(max_length=50)
+    # Responsable: el id es la referencia; el nombre se guarda desnormalizado para mostrarlo
+    owner_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
     owner: Optional[str] = Field(default=None, max_length=200)
-    detected_at: datetime = Field(default_factory=datetime.utcnow)
+    detected_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     description: Optional[str] = Field(default=None, max_length=5000)
@@ -4,6 +4,9 @@ from sqlmodel import SQLModel, Field
 
 class IncidentAttachment(SQLModel, table=True):
     """Modelo para almacenar archivos de texto adjuntos a incidentes"""
+    # Ids nunca reutilizados: los adjuntos archivados conservan el suyo en la partición
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id: Optional[int] = Field(default=None, primary_key=True)
     incident_id: int = Field(foreign_key="incident.id", index=True)
     filename: str = Field(max_length=255)
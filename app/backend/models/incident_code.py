@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel, Field
+
+class IncidentSeverity(SQLModel, table=True):
+    """Tabla de consulta de severidades (se sincroniza al arrancar con core/incident_codes)"""
+    code: int = Field(primary_key=True)
+    label: str = Field(max_length=20)
+
+class IncidentStatus(SQLModel, table=True):
+    """Tabla de consulta de estados (se sincroniza al arrancar con core/incident_codes)"""
+    code: int = Field(primary_key=True)
+    label: str = Field(max_length=50)
+    closed: bool = False
@@ -0,0 +1,23 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+class IncidentEvent(SQLModel, table=True):
+    """Transición de estado, severidad o responsable de un incidente (tabla de solo inserción)"""
+    __table_args__ = (
+        # Historial de un incidente y recorridos por tipo de evento en un rango de fechas
+        Index("ix_incidentevent_incident_ts", "incident_id", "ts"),
+        Index("ix_incidentevent_type_ts", "type", "ts"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # Sin clave foránea: el historial se conserva aunque se elimine el incidente
+    incident_id: int
+    ts: datetime
+    type: str = Field(max_length=20)
+    old_value: Optional[str] = Field(default=None, max_length=200)
+    new_value: Optional[str] = Field(default=None, max_length=200)
+    # Códigos de estado (eventos de estado y borrado) o severidad: los cierres se filtran por entero
+    old_code: Optional[int] = None
+    new_code: Optional[int] = None
@@ -0,0 +1,6 @@
+from sqlmodel import SQLModel, Field
+
+class Revision(SQLModel, table=True):
+    """Contador de cambios por tema, compartido por todos los workers (ETag e invalidación de cachés)"""
+    name: str = Field(primary_key=True, max_length=50)
+    value: int = 0
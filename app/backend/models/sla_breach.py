@@ -0,0 +1,20 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Index, UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+class SLABreach(SQLModel, table=True):
+    """Incumplimiento del SLA de atención: el incidente siguió abierto al vencer el plazo"""
+    __table_args__ = (
+        # Un plazo solo se incumple una vez aunque lo detecten varios workers o reinicios
+        UniqueConstraint("incident_id", "deadline", name="uq_slabreach_incident_deadline"),
+        Index("ix_slabreach_breached_at", "breached_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    incident_id: int
+    code: str = Field(max_length=50)
+    severity: str = Field(max_length=20)
+    opened_at: datetime
+    deadline: datetime
+    breached_at: datetime
@@ -1,4 +1,4 @@
-from .user_repository import get_user_by_email
+from .user_repository import get_user_by_email, get_cached_user_by_email
 from .incident_repository import IncidentRepository, get_incident_repository
 
-__all__ = ["get_user_by_email", "IncidentRepository", "get_incident_repository"]
+__all__ = ["get_user_by_email", "get_cached_user_by_email", "IncidentRepository", "get_incident_repository"]
@@ -0,0 +1,104 @@
+from collections import defaultdict
+from typing import TYPE_CHECKING, Iterable, Optional
+from sqlalchemy import Integer, case, cast, delete, insert, union_all
+from sqlalchemy.dialects.sqlite import insert as upsert
+from sqlmodel import Session, select, func
+
+from app.backend.core.incident_codes import SEVERITY_CRITICAL
+from app.backend.core.time_buckets import ROLLUP_SLOT_SECONDS, naive_utc_to_epoch
+from app.backend.models.archived_incident import ArchivedIncident
+from app.backend.models.detection_slot import DetectionSlot
+from app.backend.models.incident import Incident
+
+if TYPE_CHECKING:
+    from app.backend.repositories.incident_repository import IncidentRow
+
+
+def slot_of(row: "IncidentRow") -> int:
+    """Franja de la detección de un incidente (las fechas sin zona son UTC)"""
+    epoch = naive_utc_to_epoch(row.detected_at)
+    return epoch - epoch % ROLLUP_SLOT_SECONDS
+
+
+class DetectionSlotRepository:
+    """
+    Agregado de detecciones por franja para las gráficas de tendencia.
+
+    El repositorio de incidentes aplica los cambios en la misma transacción
+    que la escritura, así que leer una ventana no recorre incidentes. Archivar
+    no lo modifica: el agregado cubre la base activa y el archivo.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def apply(self, changes: Iterable[tuple[Optional["IncidentRow"], Optional["IncidentRow"]]]) -> None:
+        """Restar el estado previo y sumar el nuevo de cada cambio (sin confirmar)"""
+        deltas: dict[int, list[int]] = defaultdict(lambda: [0, 0])
+        for before, after in changes:
+            for row, sign in ((before, -1), (after, 1)):
+                if row is not None:
+                    delta = deltas[slot_of(row)]
+                    delta[0] += sign
+                    delta[1] += sign if row.severity_code == SEVERITY_CRITICAL else 0
+        rows = [
+            dict(slot_start=slot, total=total, critical=critical)
+            for slot, (total, critical) in deltas.items()
+            if total or critical
+        ]
+        if not rows:
+            return
+        statement = upsert(DetectionSlot)
+        statement = statement.on_conflict_do_update(
+            index_elements=[DetectionSlot.slot_start],
+            set_={
+                "total": DetectionSlot.total + statement.excluded.total,
+                "critical": DetectionSlot.critical + statement.excluded.critical,
+            },
+        )
+        self.session.connection().execute(statement, rows)
+
+    def get_slots(self, since: int, slot_seconds: int) -> list[tuple[int, int, int]]:
+        """Franjas de `slot_seconds` desde `since` (epoch): (inicio, total, críticos)"""
+        slot = DetectionSlot.slot_start // slot_seconds * slot_seconds
+        statement = (
+            select(slot, func.sum(DetectionSlot.total), func.sum(DetectionSlot.critical))
+            .where(DetectionSlot.slot_start >= since, DetectionSlot.total > 0)
+            .group_by(slot)
+        )
+        return [tuple(row) for row in self.session.exec(statement).all()]
+
+    def rebuild(self) -> int:
+        """Recalcular el agregado desde los incidentes activos y el catálogo del archivo; retorna las franjas"""
+        detections = union_all(
+            select(Incident.detected_at, Incident.severity_code),
+            select(ArchivedIncident.detected_at, ArchivedIncident.severity_code),
+        ).subquery()
+        epoch = cast(func.strftime("%s", detections.c.detected_at), Integer)
+        slot = (epoch - epoch % ROLLUP_SLOT_SECONDS).label("slot_start")
+        aggregate = select(
+            slot,
+            func.count(),
+            func.sum(case((detections.c.severity_code == SEVERITY_CRITICAL, 1), else_=0)),
+        ).group_by(slot)
+        self.session.exec(delete(DetectionSlot))
+        result = self.session.exec(
+            insert(DetectionSlot).from_select(["slot_start", "total", "critical"], aggregate)
+        )
+        self.session.commit()
+        return result.rowcount
+
+    def sync(self) -> bool:
+        """
+        Reconstruir el agregado si no cuadra con el número de incidentes
+        (bases anteriores o inserciones fuera del repositorio); retorna si se ha reconstruido.
+        """
+        counted = self.session.exec(select(func.coalesce(func.sum(DetectionSlot.total), 0))).one()
+        incidents = self.session.exec(select(func.count()).select_from(Incident)).one()
+        archived = self.session.exec(select(func.count()).select_from(ArchivedIncident)).one()
+        # Fin de la lectura: la reconstrucción abre su propia transacción de escritura
+        self.session.rollback()
+        if counted == incidents + archived:
+            return False
+        self.rebuild()
+        return True
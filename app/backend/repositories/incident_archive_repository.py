@@ -0,0 +1,303 @@
+"""
+Archivo de incidentes cerrados en particiones mensuales (ficheros SQLite).
+
+Los incidentes cerrados hace más de N días se mueven, con sus adjuntos, a
+`CYBERWATCH_ARCHIVE_DIR/incidents_AAAA_MM.db` según el mes de detección, de
+modo que la base activa (y sus índices y copias de seguridad) solo crece con
+el trabajo en curso. En la base activa queda una fila ligera por incidente en
+`ArchivedIncident` y su historial de eventos.
+
+Cada lote se mueve en una única transacción sobre la base activa con la
+partición adjunta (ATTACH): SQLite confirma ambos ficheros de forma atómica.
+Las lecturas no adjuntan nada: cada partición tiene el mismo esquema, así que
+las mismas consultas se ejecutan en su propio engine y el repositorio de
+incidentes combina los resultados.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import Engine, MetaData, bindparam, create_engine, delete, insert, select as core_select, update
+from sqlmodel import Session, SQLModel, select, col, func
+
+from app.backend.database import engine, add_missing_columns, enable_autoincrement
+from app.backend.models.archived_incident import ArchivedIncident
+from app.backend.models.incident import Incident
+from app.backend.models.incident_attachment import IncidentAttachment
+from app.backend.core.incident_codes import CLOSED_STATUS_MIN, is_closed_code, status_code
+from app.backend.repositories.incident_event_repository import IncidentEventRepository
+
+ARCHIVE_DIR = os.getenv("CYBERWATCH_ARCHIVE_DIR", "./archive")
+PARTITION_FORMAT = "%Y_%m"
+ARCHIVE_SCHEMA = "archive"
+
+# Tablas que se mueven, y las mismas cualificadas con el esquema de la partición adjunta
+ARCHIVED_TABLES = [Incident.__table__, IncidentAttachment.__table__]
+_archive_metadata = MetaData()
+_archive_incident = Incident.__table__.to_metadata(_archive_metadata, schema=ARCHIVE_SCHEMA)
+_archive_attachment = IncidentAttachment.__table__.to_metadata(_archive_metadata, schema=ARCHIVE_SCHEMA)
+
+_engines: dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def partition_key(value: datetime) -> str:
+    return value.strftime(PARTITION_FORMAT)
+
+
+def partition_path(partition: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"incidents_{partition}.db")
+
+
+def list_partitions() -> list[str]:
+    """Particiones existentes en disco, de la más antigua a la más reciente"""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    return sorted(
+        entry.name[len("incidents_"):-len(".db")]
+        for entry in os.scandir(ARCHIVE_DIR)
+        if entry.name.startswith("incidents_") and entry.name.endswith(".db")
+    )
+
+
+def partition_engine(partition: str) -> Engine:
+    """Engine de una partición (se crea con su esquema la primera vez)"""
+    with _engines_lock:
+        partition_engine = _engines.get(partition)
+        if partition_engine is None:
+            os.makedirs(ARCHIVE_DIR, exist_ok=True)
+            partition_engine = create_engine(
+                f"sqlite:///{partition_path(partition)}",
+                connect_args={"check_same_thread": False},
+            )
+            SQLModel.metadata.create_all(partition_engine, tables=ARCHIVED_TABLES)
+            # Particiones creadas con un esquema anterior
+            add_missing_columns(partition_engine, ARCHIVED_TABLES)
+            for table in ARCHIVED_TABLES:
+                for index in table.indexes:
+                    index.create(partition_engine, checkfirst=True)
+            _engines[partition] = partition_engine
+        return partition_engine
+
+
+class IncidentArchiveRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    @staticmethod
+    def partitions_for(
+        status: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> list[str]:
+        """
+        Particiones que pueden contener resultados para estos filtros.
+
+        Solo hay incidentes cerrados en el archivo: un filtro por un estado
+        activo no abre ninguna partición, y un rango de detección solo abre
+        los meses que lo cortan.
+        """
+        if status and not is_closed_code(status_code(status)):
+            return []
+        first = partition_key(since) if since else None
+        last = partition_key(until) if until else None
+        return [
+            partition for partition in list_partitions()
+            if (first is None or partition >= first) and (last is None or partition <= last)
+        ]
+
+    @staticmethod
+    def execute(partition: str, statement) -> list:
+        with Session(partition_engine(partition)) as session:
+            return list(session.exec(statement))
+
+    @staticmethod
+    def stream(partition: str, statement) -> Iterator:
+        """Recorrer el resultado sin materializarlo (la sesión se cierra al agotarlo)"""
+        with Session(partition_engine(partition)) as session:
+            yield from session.exec(statement)
+
+    def get_partition(self, incident_id: int) -> Optional[str]:
+        entry = self.session.get(ArchivedIncident, incident_id)
+        return entry.partition if entry else None
+
+    def get(self, incident_id: int) -> Optional[Incident]:
+        """Incidente archivado (desligado de su sesión, solo lectura)"""
+        partition = self.get_partition(incident_id)
+        if partition is None:
+            return None
+        with Session(partition_engine(partition)) as session:
+            return session.get(Incident, incident_id)
+
+    def get_by_code(self, code: str) -> Optional[Incident]:
+        entry = self.session.exec(select(ArchivedIncident).where(ArchivedIncident.code == code)).first()
+        return self.get(entry.id) if entry else None
+
+    def get_last_code(self, prefix: str) -> Optional[str]:
+        statement = select(func.max(ArchivedIncident.code)).where(col(ArchivedIncident.code).startswith(prefix))
+        return self.session.exec(statement).one()
+
+    @contextmanager
+    def data_session(self, incident_id: int) -> Iterator[Session]:
+        """Sesión donde están los adjuntos del incidente: la actual o la de su partición"""
+        partition = self.get_partition(incident_id)
+        if partition is None:
+            yield self.session
+            return
+        with Session(partition_engine(partition)) as session:
+            yield session
+
+    def delete(self, incident_id: int) -> bool:
+        """Eliminar un incidente archivado con sus adjuntos"""
+        partition = self.get_partition(incident_id)
+        if partition is None:
+            return False
+        with Session(partition_engine(partition)) as session:
+            session.exec(delete(IncidentAttachment).where(IncidentAttachment.incident_id == incident_id))
+            session.exec(delete(Incident).where(Incident.id == incident_id))
+            session.commit()
+        self.session.exec(delete(ArchivedIncident).where(ArchivedIncident.id == incident_id))
+        self.session.commit()
+        return True
+
+    @staticmethod
+    def backfill_owner_ids(owner_names: dict[int, str]) -> int:
+        """Enlazar por nombre los responsables de los incidentes archivados sin `owner_id`"""
+        ids_by_name: dict[str, int] = {}
+        for user_id, name in sorted(owner_names.items(), reverse=True):
+            ids_by_name[name] = user_id  # Con nombres repetidos gana el id más bajo
+        if not ids_by_name:
+            return 0
+        statement = (
+            update(Incident)
+            .where(Incident.owner == bindparam("name"), Incident.owner_id == None)
+            .values(owner_id=bindparam("user_id"))
+        )
+        params = [{"name": name, "user_id": user_id} for name, user_id in ids_by_name.items()]
+        linked = 0
+        for partition in list_partitions():
+            with partition_engine(partition).begin() as conn:
+                linked += conn.execute(statement, params).rowcount
+        return linked
+
+    @staticmethod
+    def release_owner(user_id: int, now: datetime) -> None:
+        """Quitar el id de un usuario eliminado de los incidentes archivados (conservan el nombre)"""
+        statement = update(Incident).where(Incident.owner_id == user_id).values(owner_id=None, updated_at=now)
+        for partition in list_partitions():
+            with partition_engine(partition).begin() as conn:
+                conn.execute(statement)
+
+    def reserve_ids(self) -> list[str]:
+        """
+        Reconstruir con AUTOINCREMENT las tablas de una base anterior; retorna las reconstruidas.
+
+        La secuencia de cada tabla arranca por encima de los ids archivados
+        (catálogo y adjuntos de las particiones): SQLite no debe reasignarlos.
+        """
+        archived_incident = self.session.exec(select(func.max(ArchivedIncident.id))).one() or 0
+        self.session.rollback()
+        archived_attachment = max(
+            (
+                self.execute(partition, select(func.max(IncidentAttachment.id)))[0] or 0
+                for partition in list_partitions()
+            ),
+            default=0,
+        )
+        floors = {Incident.__table__: archived_incident, IncidentAttachment.__table__: archived_attachment}
+        return [table.name for table, floor in floors.items() if enable_autoincrement(table, floor)]
+
+    def archive_closed(self, cutoff: datetime, now: datetime, batch_size: int) -> int:
+        """
+        Mover a su partición los incidentes cerrados antes de `cutoff`; retorna cuántos.
+
+        La fecha de cierre sale del historial de eventos (o de la última
+        modificación si no hay). Los ids archivados no vuelven a asignarse:
+        `incident` e `incidentattachment` usan AUTOINCREMENT (ver `reserve_ids`).
+        """
+        close_times = IncidentEventRepository.close_times_statement().subquery()
+        closed_at = func.coalesce(close_times.c.closed_at, Incident.updated_at)
+        candidates = (
+            select(Incident.id, Incident.detected_at, closed_at)
+            .outerjoin(close_times, close_times.c.incident_id == Incident.id)
+            .where(
+                Incident.status_code >= CLOSED_STATUS_MIN,
+                closed_at < cutoff,
+            )
+            .order_by(Incident.detected_at)
+            .limit(batch_size)
+        )
+        archived = 0
+        while True:
+            rows = self.session.exec(candidates).all()
+            self.session.rollback()  # Liberar la lectura antes de escribir desde otra conexión
+            if not rows:
+                return archived
+            by_partition: dict[str, dict[int, datetime]] = {}
+            for incident_id, detected_at, incident_closed_at in rows:
+                by_partition.setdefault(partition_key(detected_at), {})[incident_id] = incident_closed_at
+            moved = sum(self._move(partition, closed, now) for partition, closed in by_partition.items())
+            if not moved:
+                return archived
+            archived += moved
+
+    @staticmethod
+    def _move(partition: str, closed_at: dict[int, datetime], now: datetime) -> int:
+        """Copiar a la partición, catalogar y borrar de la base activa en una sola transacción"""
+        partition_engine(partition)  # Crea el fichero y su esquema si no existen
+        with engine.connect() as conn:
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (partition_path(partition),))
+            try:
+                # Bloqueo de escritura desde el principio: nadie cambia los candidatos entre sentencias
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    core_select(
+                        Incident.id,
+                        Incident.code,
+                        Incident.severity,
+                        Incident.severity_code,
+                        Incident.source,
+                        Incident.owner,
+                        Incident.detected_at,
+                    ).where(col(Incident.id).in_(list(closed_at)), Incident.status_code >= CLOSED_STATUS_MIN)
+                ).all()
+                ids = [row.id for row in rows]
+                if ids:
+                    incident_columns = [column.name for column in Incident.__table__.columns]
+                    attachment_columns = [column.name for column in IncidentAttachment.__table__.columns]
+                    conn.execute(insert(_archive_incident).from_select(
+                        incident_columns,
+                        core_select(*Incident.__table__.columns).where(col(Incident.id).in_(ids)),
+                    ))
+                    conn.execute(insert(_archive_attachment).from_select(
+                        attachment_columns,
+                        core_select(*IncidentAttachment.__table__.columns).where(
+                            col(IncidentAttachment.incident_id).in_(ids)
+                        ),
+                    ))
+                    conn.execute(insert(ArchivedIncident), [
+                        {
+                            "id": row.id,
+                            "code": row.code,
+                            "partition": partition,
+                            "severity": row.severity,
+                            "severity_code": row.severity_code,
+                            "source": row.source,
+                            "owner": row.owner,
+                            "detected_at": row.detected_at,
+                            "closed_at": closed_at[row.id],
+                            "archived_at": now,
+                        }
+                        for row in rows
+                    ])
+                    conn.execute(delete(IncidentAttachment).where(col(IncidentAttachment.incident_id).in_(ids)))
+                    conn.execute(delete(Incident).where(col(Incident.id).in_(ids)))
+                conn.commit()
+                return len(ids)
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.exec_driver_sql(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
@@ -1,5 +1,5 @@
-from typing import List, Optional
-from sqlmodel import Session, select
+from typing import Iterator, List, Optional
+from sqlmodel import Session, select, func
 from app.backend.models.incident_attachment import IncidentAttachment
 
 
@@ -25,6 +25,33 @@ class IncidentAttachmentRepository:
         ).order_by(IncidentAttachment.uploaded_at.desc())
         return list(self.session.exec(statement).all())
     
+    def get_metadata_by_incident_id(self, incident_id: int) -> list:
+        """Obtener id, nombre, fecha de subida y tamaño de los adjuntos sin cargar su contenido"""
+        statement = select(
+            IncidentAttachment.id,
+            IncidentAttachment.filename,
+            IncidentAttachment.uploaded_at,
+            func.length(IncidentAttachment.content).label("size"),
+        ).where(
+            IncidentAttachment.incident_id == incident_id
+        ).order_by(IncidentAttachment.uploaded_at)
+        return list(self.session.exec(statement).all())
+
+    def iter_content_chunks(self, attachment_id: int, chunk_size: int) -> Iterator[str]:
+        """Leer el contenido de un adjunto por trozos (substr) sin cargarlo entero"""
+        start = 1
+        while True:
+            statement = select(
+                func.substr(IncidentAttachment.content, start, chunk_size)
+            ).where(IncidentAttachment.id == attachment_id)
+            chunk = self.session.exec(statement).first()
+            if not chunk:
+                return
+            yield chunk
+            if len(chunk) < chunk_size:
+                return
+            start += chunk_size
+    
     def delete(self, attachment_id: int) -> bool:
         """Eliminar un adjunto"""
         attachment = self.get_by_id(attachment_id)
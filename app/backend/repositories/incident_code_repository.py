@@ -0,0 +1,110 @@
+"""
+Tablas de consulta de severidad y estado, y migración de los incidentes a códigos.
+
+Al arrancar se sincronizan las tablas de consulta con core/incident_codes y se
+rellenan `severity_code`/`status_code` de los incidentes que aún no los tienen
+(bases anteriores o filas insertadas fuera del repositorio), normalizando de
+paso la etiqueta. Cada lote de ids es una transacción corta.
+"""
+from sqlalchemy import bindparam, select as core_select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select, func
+
+from app.backend.core.incident_codes import (
+    SEVERITIES,
+    STATUSES,
+    is_closed_code,
+    severity_code,
+    status_code,
+)
+from app.backend.models.archived_incident import ArchivedIncident
+from app.backend.models.incident import Incident
+from app.backend.models.incident_code import IncidentSeverity, IncidentStatus
+from app.backend.repositories.incident_archive_repository import list_partitions, partition_engine
+
+# Índices de texto que sustituyen los de código (bases creadas antes de la migración)
+LEGACY_INDEXES = ("ix_incident_severity", "ix_incident_status")
+# (columna de texto, columna de código, resolución, etiquetas canónicas)
+CODED_FIELDS = (
+    ("severity", "severity_code", severity_code, SEVERITIES),
+    ("status", "status_code", status_code, STATUSES),
+)
+
+
+def _pending_updates(connection, model, field: str, code_field: str, resolve, labels: dict, unknown: set) -> list[dict]:
+    """Parámetros de UPDATE por cada valor de texto distinto aún sin código"""
+    column, code_column = getattr(model, field), getattr(model, code_field)
+    params = []
+    for value in connection.execute(core_select(column).where(code_column.is_(None)).distinct()).scalars():
+        code = resolve(value)
+        if code is None:
+            unknown.add(value)
+        else:
+            params.append({"raw": value, "new_code": code, "new_label": labels[code]})
+    return params
+
+
+def _update_statement(model, field: str, code_field: str, *conditions):
+    return (
+        update(model)
+        .where(getattr(model, field) == bindparam("raw"), getattr(model, code_field).is_(None), *conditions)
+        .values({code_field: bindparam("new_code"), field: bindparam("new_label")})
+    )
+
+
+class IncidentCodeRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def sync(self) -> None:
+        """Insertar o actualizar las tablas de consulta con los códigos canónicos"""
+        connection = self.session.connection()
+        for model, rows in (
+            (IncidentSeverity, [{"code": code, "label": label} for code, label in SEVERITIES.items()]),
+            (IncidentStatus, [
+                {"code": code, "label": label, "closed": is_closed_code(code)} for code, label in STATUSES.items()
+            ]),
+        ):
+            statement = insert(model).values(rows)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=["code"],
+                set_={name: statement.excluded[name] for name in rows[0] if name != "code"},
+            ))
+        for name in LEGACY_INDEXES:
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        self.session.commit()
+
+    def backfill(self, batch_size: int) -> dict:
+        """
+        Rellenar los códigos de los incidentes que no los tienen, en lotes por rango de ids.
+
+        También las particiones de archivo y la severidad de su catálogo.
+        Retorna las columnas rellenadas en la base activa y los valores no
+        reconocidos (se quedan sin código: ni activos ni cerrados hasta que se editen).
+        """
+        migrated = 0
+        unknown: set[str] = set()
+        last_id = self.session.exec(select(func.max(Incident.id))).one() or 0
+        for field, code_field, resolve, labels in CODED_FIELDS:
+            params = _pending_updates(self.session.connection(), Incident, field, code_field, resolve, labels, unknown)
+            self.session.commit()
+            if not params:
+                continue
+            for start in range(0, last_id + 1, batch_size):
+                statement = _update_statement(
+                    Incident, field, code_field, Incident.id >= start, Incident.id < start + batch_size
+                )
+                migrated += self.session.connection().execute(statement, params).rowcount
+                self.session.commit()
+        for partition in list_partitions():
+            with partition_engine(partition).begin() as conn:
+                for field, code_field, resolve, labels in CODED_FIELDS:
+                    params = _pending_updates(conn, Incident, field, code_field, resolve, labels, unknown)
+                    if params:
+                        conn.execute(_update_statement(Incident, field, code_field), params)
+        connection = self.session.connection()
+        params = _pending_updates(connection, ArchivedIncident, "severity", "severity_code", severity_code, SEVERITIES, unknown)
+        if params:
+            connection.execute(_update_statement(ArchivedIncident, "severity", "severity_code"), params)
+        self.session.commit()
+        return {"migrated": migrated, "unknown": sorted(unknown)}
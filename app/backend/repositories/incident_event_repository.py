@@ -0,0 +1,246 @@
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+from sqlalchemy import case, insert, literal, null, update
+from sqlmodel import Session, select, col, func
+
+from app.backend.core.incident_codes import CLOSED_STATUS_MIN, severity_code, status_code
+from app.backend.models.incident import Incident
+from app.backend.models.incident_event import IncidentEvent
+from app.backend.repositories.revision_repository import RevisionRepository, EVENT_CODES_MIGRATION
+
+if TYPE_CHECKING:
+    from app.backend.repositories.incident_repository import IncidentRow
+
+STATUS = "status"
+SEVERITY = "severity"
+OWNER = "owner"
+DELETED = "deleted"
+# Campos cuyo cambio se registra (el tipo de evento es el nombre del campo)
+TRACKED_FIELDS = (STATUS, SEVERITY, OWNER)
+# Columna de IncidentRow con el código de cada campo registrado (el responsable no tiene)
+CODE_FIELDS = {STATUS: "status_code", SEVERITY: "severity_code"}
+
+
+class IncidentEventRepository:
+    """Historial de transiciones de incidentes (solo inserción)"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    @staticmethod
+    def _event_values(before: Optional["IncidentRow"], after: Optional["IncidentRow"], ts: datetime) -> Iterator[dict]:
+        if after is None:
+            yield dict(
+                incident_id=before.id, ts=ts, type=DELETED,
+                old_value=before.status, new_value=None, old_code=before.status_code, new_code=None,
+            )
+            return
+        for field in TRACKED_FIELDS:
+            old_value = getattr(before, field) if before else None
+            new_value = getattr(after, field)
+            if old_value != new_value:
+                code_field = CODE_FIELDS.get(field)
+                yield dict(
+                    incident_id=after.id, ts=ts, type=field, old_value=old_value, new_value=new_value,
+                    old_code=getattr(before, code_field) if before and code_field else None,
+                    new_code=getattr(after, code_field) if code_field else None,
+                )
+
+    def record(self, before: Optional["IncidentRow"], after: Optional["IncidentRow"], ts: datetime) -> None:
+        """
+        Añadir a la sesión los eventos de un cambio (sin confirmar).
+
+        El repositorio de incidentes los confirma en la misma transacción que
+        la escritura del incidente, de modo que historial y estado no divergen.
+        """
+        for values in self._event_values(before, after, ts):
+            self.session.add(IncidentEvent(**values))
+
+    def record_many(
+        self,
+        changes: Iterable[tuple[Optional["IncidentRow"], Optional["IncidentRow"]]],
+        ts: datetime,
+    ) -> int:
+        """Como record, para operaciones masivas: un único INSERT por lotes (sin confirmar)"""
+        rows = [values for before, after in changes for values in self._event_values(before, after, ts)]
+        if rows:
+            self.session.connection().execute(insert(IncidentEvent), rows)
+        return len(rows)
+
+    def get_by_incident_id(self, incident_id: int) -> list[IncidentEvent]:
+        """Historial de un incidente en orden cronológico"""
+        statement = (
+            select(IncidentEvent)
+            .where(IncidentEvent.incident_id == incident_id)
+            .order_by(IncidentEvent.ts, IncidentEvent.id)
+        )
+        return list(self.session.exec(statement).all())
+
+    @staticmethod
+    def close_times_statement():
+        """
+        Último cierre de cada incidente: (incident_id, closed_at).
+
+        Cuenta como cierre el paso de un estado no cerrado (o ninguno) a uno
+        cerrado, comparando códigos; cambiar entre estados cerrados no mueve la
+        fecha de cierre.
+        """
+        return (
+            select(IncidentEvent.incident_id, func.max(IncidentEvent.ts).label("closed_at"))
+            .where(
+                IncidentEvent.type == STATUS,
+                IncidentEvent.new_code >= CLOSED_STATUS_MIN,
+                col(IncidentEvent.old_code).is_(None) | (IncidentEvent.old_code < CLOSED_STATUS_MIN),
+            )
+            .group_by(IncidentEvent.incident_id)
+        )
+
+    def get_close_time(self, incident_id: int) -> Optional[datetime]:
+        statement = self.close_times_statement().where(IncidentEvent.incident_id == incident_id)
+        row = self.session.exec(statement).first()
+        return row.closed_at if row else None
+
+    def get_close_times(self, incident_ids: Optional[list[int]] = None) -> dict[int, datetime]:
+        """Fecha de cierre de los incidentes (todos, o los indicados) que se han cerrado alguna vez"""
+        statement = self.close_times_statement()
+        if incident_ids is not None:
+            statement = statement.where(col(IncidentEvent.incident_id).in_(incident_ids))
+        return {incident_id: closed_at for incident_id, closed_at in self.session.exec(statement)}
+
+    def get_open_since(self, status: str) -> list[tuple[int, str, str, datetime]]:
+        """
+        Incidentes actualmente en `status` y desde cuándo: (id, código, severidad, desde).
+
+        La entrada en el estado es el último evento de estado del incidente
+        (índice por incidente y fecha); sin historial se usa la detección.
+        """
+        entered = (
+            select(IncidentEvent.incident_id, func.max(IncidentEvent.ts).label("ts"))
+            .where(IncidentEvent.type == STATUS)
+            .group_by(IncidentEvent.incident_id)
+            .subquery()
+        )
+        statement = (
+            select(Incident.id, Incident.code, Incident.severity, func.coalesce(entered.c.ts, Incident.detected_at))
+            .outerjoin(entered, entered.c.incident_id == Incident.id)
+            .where(Incident.status_code == status_code(status))
+        )
+        return [tuple(row) for row in self.session.exec(statement)]
+
+    def get_time_in_status(
+        self,
+        now: datetime,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> list[tuple[str, int, float]]:
+        """
+        Tiempo total pasado en cada estado dentro de [since, until): (estado, incidentes, segundos).
+
+        Cada evento de estado abre un tramo que termina en el siguiente evento
+        de estado (o borrado) del mismo incidente; los tramos abiertos llegan
+        hasta `now`. Se calcula en SQL con LEAD sobre un recorrido por rango de
+        (type, ts), sin reconstruir el historial en Python.
+        """
+        until = min(until, now) if until else now
+        segments = (
+            select(
+                IncidentEvent.incident_id,
+                IncidentEvent.type,
+                IncidentEvent.new_value.label("status"),
+                IncidentEvent.ts.label("start"),
+                func.coalesce(
+                    func.lead(IncidentEvent.ts).over(
+                        partition_by=IncidentEvent.incident_id,
+                        order_by=(IncidentEvent.ts, IncidentEvent.id),
+                    ),
+                    now,
+                ).label("end"),
+            )
+            .where(col(IncidentEvent.type).in_((STATUS, DELETED)), IncidentEvent.ts < until)
+            .subquery()
+        )
+        start = func.max(segments.c.start, since) if since else segments.c.start
+        end = func.min(segments.c.end, until)
+        seconds = (func.julianday(end) - func.julianday(start)) * 86400
+        statement = (
+            select(segments.c.status, func.count(func.distinct(segments.c.incident_id)), func.sum(seconds))
+            .where(segments.c.type == STATUS, segments.c.end > (since or segments.c.start))
+            .group_by(segments.c.status)
+        )
+        return [(status, incidents, total or 0.0) for status, incidents, total in self.session.exec(statement)]
+
+    def backfill(self) -> int:
+        """
+        Registrar el estado actual de los incidentes que no tienen historial.
+
+        Para incidentes anteriores al registro de eventos (o insertados fuera
+        del repositorio): severidad y responsable desde la detección; el estado
+        desde la detección, o desde la última modificación si ya está cerrado,
+        que era la mejor aproximación disponible de la fecha de cierre.
+        """
+        closed = Incident.status_code >= CLOSED_STATUS_MIN
+        inserted = 0
+        for field in TRACKED_FIELDS:
+            column = getattr(Incident, field)
+            code = getattr(Incident, CODE_FIELDS[field]) if field in CODE_FIELDS else null()
+            ts = case((closed, Incident.updated_at), else_=Incident.detected_at) if field == STATUS else Incident.detected_at
+            # Subconsulta no correlacionada: se evalúa una vez, sea cual sea el índice que elija el planificador
+            # (sin estadísticas, una EXISTS correlacionada puede recorrer el índice por tipo para cada incidente)
+            missing = col(Incident.id).not_in(select(IncidentEvent.incident_id).where(IncidentEvent.type == field))
+            source = select(Incident.id, ts, literal(field), null(), column, code).where(column.is_not(None), missing)
+            statement = insert(IncidentEvent).from_select(
+                ["incident_id", "ts", "type", "old_value", "new_value", "new_code"], source
+            )
+            inserted += self.session.connection().execute(statement).rowcount
+        self.session.commit()
+        return inserted
+
+    def backfill_codes(self, batch_size: int) -> int:
+        """
+        Migración de una sola vez: rellenar `old_code`/`new_code` de los eventos
+        anteriores a esas columnas a partir de sus etiquetas, en lotes por rango de ids.
+
+        Las etiquetas distintas son pocas: cada lote es un único UPDATE con
+        CASE. Las no reconocibles se quedan sin código (no cuentan como cierre).
+        Retorna los eventos actualizados (0 si ya estaba hecha).
+        """
+        revisions = RevisionRepository(self.session)
+        if revisions.get(EVENT_CODES_MIGRATION):
+            return 0
+        status_types = (STATUS, DELETED)
+        # Etiqueta -> código, por separado para estados y severidades
+        status_codes: dict[str, int] = {}
+        severity_codes: dict[str, int] = {}
+        for column in (IncidentEvent.old_value, IncidentEvent.new_value):
+            statement = select(IncidentEvent.type, column).where(column.is_not(None)).distinct()
+            for event_type, value in self.session.exec(statement):
+                if event_type in status_types and status_code(value) is not None:
+                    status_codes[value] = status_code(value)
+                elif event_type == SEVERITY and severity_code(value) is not None:
+                    severity_codes[value] = severity_code(value)
+
+        def coded(column):
+            by_status = case(status_codes, value=column) if status_codes else null()
+            by_severity = case(severity_codes, value=column) if severity_codes else null()
+            return case((col(IncidentEvent.type).in_(status_types), by_status), else_=by_severity)
+
+        updated = 0
+        last_id = self.session.exec(select(func.max(IncidentEvent.id))).one() or 0
+        if status_codes or severity_codes:
+            for start in range(0, last_id + 1, batch_size):
+                statement = (
+                    update(IncidentEvent)
+                    .where(
+                        IncidentEvent.id >= start,
+                        IncidentEvent.id < start + batch_size,
+                        col(IncidentEvent.type).in_((*status_types, SEVERITY)),
+                        col(IncidentEvent.new_code).is_(None),
+                        col(IncidentEvent.old_code).is_(None),
+                    )
+                    .values(old_code=coded(IncidentEvent.old_value), new_code=coded(IncidentEvent.new_value))
+                )
+                updated += self.session.exec(statement).rowcount
+                self.session.commit()
+        revisions.bump(EVENT_CODES_MIGRATION)
+        self.session.commit()
+        return updated
@@ -1,15 +1,125 @@
-from typing import Optional
+import heapq
+from itertools import islice
+from typing import Iterator, NamedTuple, Optional
 from datetime import datetime, timezone
-from sqlmodel import Session, select, col
+from sqlalchemy import Integer, cast, delete, literal, tuple_, union_all, update
+from sqlmodel import Session, select, col, func
 
 from app.backend.models.incident import Incident
+from app.backend.models.incident_attachment import IncidentAttachment
+from app.backend.models.archived_incident import ArchivedIncident
+from app.backend.models.user import User
+from app.backend.core.cache import facet_cache, trend_cache, analytics_cache, invalidate_incident_caches
+from app.backend.core.events import incident_events, IncidentChange, CREATED, UPDATED, DELETED
+from app.backend.core.analytics import ResolutionSample, resolution_report, sample_from_rows
+from app.backend.core.time_buckets import (
+    TrendSpec,
+    bucket_boundaries,
+    bucket_labels,
+    epoch_to_naive_utc,
+    naive_utc_to_epoch,
+    rollup,
+)
+from app.backend.core.incident_codes import (
+    CLOSED_STATUS_MIN,
+    SEVERITIES,
+    STATUSES,
+    is_closed_code,
+    severity_code,
+    status_code,
+)
+from app.backend.repositories.incident_event_repository import IncidentEventRepository
+from app.backend.repositories.incident_archive_repository import IncidentArchiveRepository
+from app.backend.repositories.user_repository import get_owner_name, get_owner_names
+from app.backend.repositories.detection_slot_repository import DetectionSlotRepository
+from app.backend.repositories.revision_repository import RevisionRepository, OWNERS_REVISION
+
+# Faceta -> columna agrupada (severidad y estado por código; se devuelven con su etiqueta)
+FACET_COLUMNS = {
+    "severity": Incident.severity_code,
+    "status": Incident.status_code,
+    "source": Incident.source,
+    "owner_id": Incident.owner_id,
+}
+FACET_LABELS = {"severity": SEVERITIES, "status": STATUSES}
+# Filtro de estado que agrupa todos los estados activos (usa el índice parcial)
+ACTIVE_STATUS = "__active__"
+# Campos que admiten cambios masivos desde la lista
+BULK_FIELDS = ("owner_id", "status", "severity")
+
+
+class IncidentRow(NamedTuple):
+    """Proyección ligera de un incidente para listas (sin descripción)"""
+    id: int
+    code: str
+    title: str
+    severity: str
+    status: str
+    source: str
+    owner: Optional[str]
+    owner_id: Optional[int]
+    severity_code: Optional[int]
+    status_code: Optional[int]
+    detected_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_incident(cls, incident: Incident) -> "IncidentRow":
+        return cls(*(getattr(incident, field) for field in cls._fields))
+
+
+class IncidentExportRow(NamedTuple):
+    """Proyección de un incidente para la exportación CSV"""
+    id: int
+    code: str
+    title: str
+    severity: str
+    status: str
+    source: str
+    owner: Optional[str]
+    detected_at: datetime
+    updated_at: datetime
+    description: Optional[str]
+
+
+def _columns(row_type: type[NamedTuple]) -> list:
+    return [getattr(Incident, field) for field in row_type._fields]
+
+
+def _newest_first(row) -> tuple[datetime, int]:
+    return row.detected_at, row.id
+
+
+def active_condition():
+    """Incidentes activos: la misma expresión que el índice parcial ix_incident_active_detected"""
+    return Incident.status_code < CLOSED_STATUS_MIN
+
+
+# Clave de caché de get_facets() sin filtros (la de la lista sin filtrar)
+UNFILTERED_FACETS = (None, None, None, None, False, None, None, None)
 
 
 class IncidentRepository:
-    """Repositorio para operaciones CRUD de incidentes"""
+    """
+    Repositorio para operaciones CRUD de incidentes.
+
+    Las lecturas incluyen los incidentes archivados (ver
+    incident_archive_repository) solo cuando los filtros pueden alcanzarlos;
+    `archived=False` limita la consulta a la base activa.
+    """
 
     def __init__(self, session: Session):
         self.session = session
+        self.archive = IncidentArchiveRepository(session)
+
+    def _partitions(
+        self,
+        archived: bool,
+        status: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> list[str]:
+        return self.archive.partitions_for(status, since, until) if archived else []
 
     def generate_incident_code(self) -> str:
         """Generar código automático de incidente en formato INC-YYYY-XXXX"""
@@ -21,11 +131,14 @@ class IncidentRepository:
         ).order_by(Incident.code.desc())
         
         last_incident = self.session.exec(statement).first()
-        
-        if last_incident and last_incident.code:
+        # Los códigos de incidentes archivados tampoco se reutilizan
+        codes = [last_incident.code if last_incident else None, self.archive.get_last_code(f"INC-{current_year}-")]
+        last_code = max((code for code in codes if code), default=None)
+
+        if last_code:
             # Extraer el número secuencial del último código
             try:
-                last_number = int(last_incident.code.split('-')[-1])
+                last_number = int(last_code.split('-')[-1])
                 next_number = last_number + 1
             except (ValueError, IndexError):
                 next_number = 1
@@ -35,29 +148,62 @@ class IncidentRepository:
         # Generar código con formato INC-YYYY-XXXX (4 dígitos)
         return f"INC-{current_year}-{next_number:04d}"
 
+    @staticmethod
+    def _filter_conditions(
+        severity: Optional[str] = None,
+        status: Optional[str] = None,
+        source: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        filter_unassigned: bool = False,
+        search: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        exclude: Optional[str] = None,
+    ) -> list:
+        """Condiciones WHERE de los filtros de la lista (omitiendo la dimensión `exclude`)"""
+        conditions = []
+        if since:
+            conditions.append(Incident.detected_at >= since)
+        if until:
+            conditions.append(Incident.detected_at < until)
+        # Un valor sin código no coincide con ningún incidente (0 no es un código válido)
+        if severity and exclude != "severity":
+            conditions.append(Incident.severity_code == (severity_code(severity) or 0))
+        if status and exclude != "status":
+            if status == ACTIVE_STATUS:
+                conditions.append(active_condition())
+            else:
+                conditions.append(Incident.status_code == (status_code(status) or 0))
+        if source and exclude != "source":
+            conditions.append(Incident.source == source)
+        if exclude != "owner_id":
+            if filter_unassigned:
+                conditions.append(Incident.owner_id == None)
+            elif owner_id is not None:
+                conditions.append(Incident.owner_id == owner_id)
+        if search:
+            conditions.append(
+                col(Incident.title).contains(search)
+                | col(Incident.description).contains(search)
+                | col(Incident.code).contains(search)
+            )
+        return conditions
+
     def get_all(
         self,
         severity: Optional[str] = None,
         status: Optional[str] = None,
         source: Optional[str] = None,
-        owner: Optional[str] = None,
+        owner_id: Optional[int] = None,
         filter_unassigned: bool = False,
+        search: Optional[str] = None,
         limit: Optional[int] = None,
         offset: Optional[int] = 0,
     ) -> list[Incident]:
-        """Obtener todos los incidentes con filtros opcionales"""
-        statement = select(Incident)
-
-        if severity:
-            statement = statement.where(Incident.severity == severity)
-        if status:
-            statement = statement.where(Incident.status == status)
-        if source:
-            statement = statement.where(Incident.source == source)
-        if filter_unassigned:
-            statement = statement.where(Incident.owner == None)
-        elif owner:
-            statement = statement.where(Incident.owner == owner)
+        """Obtener todos los incidentes de la base activa con filtros opcionales"""
+        statement = select(Incident).where(
+            *self._filter_conditions(severity, status, source, owner_id, filter_unassigned, search)
+        )
 
         statement = statement.order_by(Incident.detected_at.desc())
 
@@ -68,75 +214,398 @@ class IncidentRepository:
 
         return list(self.session.exec(statement).all())
 
-    def get_by_id(self, incident_id: int) -> Optional[Incident]:
-        """Obtener un incidente por ID"""
-        return self.session.get(Incident, incident_id)
+    def get_rows(
+        self,
+        severity: Optional[str] = None,
+        status: Optional[str] = None,
+        source: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        filter_unassigned: bool = False,
+        search: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = 0,
+        after: Optional[tuple[datetime, int]] = None,
+        archived: bool = True,
+    ) -> list[IncidentRow]:
+        """
+        Como get_all, pero seleccionando solo las columnas que muestran las listas.
+
+        `after` = (detected_at, id) de la última fila vista activa la paginación
+        por clave (keyset): continúa justo después sin recorrer las filas previas.
+        `since`/`until` acotan la fecha de detección (y las particiones de archivo
+        que se consultan).
+        """
+        statement = (
+            select(*_columns(IncidentRow))
+            .where(*self._filter_conditions(severity, status, source, owner_id, filter_unassigned, search, since, until))
+            .order_by(Incident.detected_at.desc(), Incident.id.desc())
+        )
+        if after:
+            statement = statement.where(tuple_(Incident.detected_at, Incident.id) < tuple_(*after))
+        partitions = self._partitions(archived, status, since, until)
+        if not partitions:
+            if limit:
+                statement = statement.limit(limit)
+            if offset:
+                statement = statement.offset(offset)
+            return [IncidentRow(*row) for row in self.session.exec(statement)]
+
+        # Cada fuente aporta sus primeras offset + limit filas, ya ordenadas; se mezclan por (detected_at, id)
+        offset = offset or 0
+        if limit:
+            statement = statement.limit(offset + limit)
+        sources = [self.session.exec(statement).all()]
+        sources += [self.archive.execute(partition, statement) for partition in partitions]
+        merged = heapq.merge(*sources, key=_newest_first, reverse=True)
+        return [IncidentRow(*row) for row in islice(merged, offset, offset + limit if limit else None)]
+
+    def iter_export_rows(
+        self,
+        severity: Optional[str] = None,
+        status: Optional[str] = None,
+        source: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        filter_unassigned: bool = False,
+        search: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        batch_size: int = 1000,
+        archived: bool = True,
+    ) -> Iterator[IncidentExportRow]:
+        """Recorrer los incidentes filtrados por lotes, sin materializar el resultado completo"""
+        statement = (
+            select(*_columns(IncidentExportRow))
+            .where(*self._filter_conditions(severity, status, source, owner_id, filter_unassigned, search, since, until))
+            .order_by(Incident.detected_at.desc(), Incident.id.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        sources = [self.session.exec(statement)]
+        sources += [
+            self.archive.stream(partition, statement)
+            for partition in self._partitions(archived, status, since, until)
+        ]
+        for row in heapq.merge(*sources, key=_newest_first, reverse=True):
+            yield IncidentExportRow(*row)
+
+    def get_by_id(self, incident_id: int, archived: bool = True) -> Optional[Incident]:
+        """Obtener un incidente por ID (los archivados se devuelven desligados, solo lectura)"""
+        incident = self.session.get(Incident, incident_id)
+        if incident is None and archived:
+            return self.archive.get(incident_id)
+        return incident
 
     def get_by_code(self, code: str) -> Optional[Incident]:
         """Obtener un incidente por código"""
         statement = select(Incident).where(Incident.code == code)
-        return self.session.exec(statement).first()
+        return self.session.exec(statement).first() or self.archive.get_by_code(code)
+
+    def is_archived(self, incident_id: int) -> bool:
+        return self.archive.get_partition(incident_id) is not None
+
+    def _sync_owner(self, values: dict) -> dict:
+        """
+        Completar el par responsable (owner_id, owner) de unos valores a escribir.
+
+        `owner_id` manda y el nombre se copia de la caché de usuarios; si solo
+        llega el nombre (scripts antiguos) se resuelve a su id.
+        """
+        if "owner_id" in values:
+            return {**values, "owner": get_owner_name(self.session, values["owner_id"])}
+        if "owner" in values:
+            ids = [user_id for user_id, name in get_owner_names(self.session).items() if name == values["owner"]]
+            return {**values, "owner_id": min(ids) if ids else None}
+        return values
+
+    @staticmethod
+    def _sync_codes(values: dict) -> dict:
+        """Código y etiqueta canónica de la severidad y el estado a escribir (ValueError si no se reconocen)"""
+        values = dict(values)
+        for field, resolve, labels in (("severity", severity_code, SEVERITIES), ("status", status_code, STATUSES)):
+            if field in values:
+                code = resolve(values[field])
+                if code is None:
+                    raise ValueError(f"Valor de {field} no válido: {values[field]!r}")
+                values[field], values[f"{field}_code"] = labels[code], code
+        return values
 
     def create(self, incident_data: dict) -> Incident:
         """Crear un nuevo incidente"""
-        incident = Incident(**incident_data)
+        incident = Incident(**self._sync_codes(self._sync_owner(incident_data)))
         self.session.add(incident)
+        self.session.flush()  # Asigna el id para el historial
+        now = datetime.now(timezone.utc)
+        after = IncidentRow.from_incident(incident)
+        IncidentEventRepository(self.session).record(None, after, now)
+        DetectionSlotRepository(self.session).apply([(None, after)])
         self.session.commit()
         self.session.refresh(incident)
+        invalidate_incident_caches()
+        closed_after = now if is_closed_code(incident.status_code) else None
+        incident_events.publish(IncidentChange(CREATED, None, after, closed_after=closed_after, ts=now))
         return incident
 
     def update(self, incident_id: int, incident_data: dict) -> Optional[Incident]:
-        """Actualizar un incidente existente"""
-        incident = self.get_by_id(incident_id)
+        """Actualizar un incidente existente (los archivados son de solo lectura)"""
+        incident = self.get_by_id(incident_id, archived=False)
         if not incident:
             return None
+        before = IncidentRow.from_incident(incident)
+        events = IncidentEventRepository(self.session)
+        closed_before = events.get_close_time(incident_id) if is_closed_code(before.status_code) else None
 
         # Actualizar campos
-        for key, value in incident_data.items():
+        for key, value in self._sync_codes(self._sync_owner(incident_data)).items():
             if hasattr(incident, key):
                 setattr(incident, key, value)
 
         # Actualizar timestamp
-        incident.updated_at = datetime.now(timezone.utc)
+        now = datetime.now(timezone.utc)
+        incident.updated_at = now
 
+        after = IncidentRow.from_incident(incident)
+        events.record(before, after, now)
+        DetectionSlotRepository(self.session).apply([(before, after)])
         self.session.add(incident)
         self.session.commit()
         self.session.refresh(incident)
+        invalidate_incident_caches()
+        closed_after = (closed_before or now) if is_closed_code(after.status_code) else None
+        incident_events.publish(IncidentChange(UPDATED, before, after, closed_before, closed_after, now))
         return incident
 
     def delete(self, incident_id: int) -> bool:
-        """Eliminar un incidente"""
-        incident = self.get_by_id(incident_id)
+        """Eliminar un incidente con sus adjuntos"""
+        incident = self.get_by_id(incident_id, archived=False)
         if not incident:
-            return False
+            return self._delete_archived(incident_id)
 
+        before = IncidentRow.from_incident(incident)
+        events = IncidentEventRepository(self.session)
+        closed_before = events.get_close_time(incident_id) if is_closed_code(before.status_code) else None
+        now = datetime.now(timezone.utc)
+        events.record(before, None, now)
+        DetectionSlotRepository(self.session).apply([(before, None)])
+        # La clave foránea no se aplica en SQLite: los adjuntos se borran en la misma transacción
+        self.session.exec(delete(IncidentAttachment).where(IncidentAttachment.incident_id == incident_id))
         self.session.delete(incident)
         self.session.commit()
+        invalidate_incident_caches()
+        incident_events.publish(IncidentChange(DELETED, before, None, closed_before=closed_before, ts=now))
         return True
 
+    def _delete_archived(self, incident_id: int) -> bool:
+        """
+        Eliminar un incidente archivado, registrando el borrado en su historial.
+
+        No se publica en el bus: los agregados en memoria solo cubren la base activa.
+        """
+        incident = self.archive.get(incident_id)
+        if not incident:
+            return False
+        # El evento y el agregado de detecciones se confirman junto con la baja del catálogo
+        before = IncidentRow.from_incident(incident)
+        IncidentEventRepository(self.session).record(before, None, datetime.now(timezone.utc))
+        DetectionSlotRepository(self.session).apply([(before, None)])
+        self.archive.delete(incident_id)
+        invalidate_incident_caches()
+        return True
+
+    def _bulk_update(self, conditions: list, values: dict) -> list[IncidentRow]:
+        """
+        UPDATE ... RETURNING de todos los incidentes que cumplen `conditions`, en una transacción.
+
+        Las filas previas se leen antes con las mismas condiciones (SQLite solo
+        devuelve los valores nuevos) para el historial y el bus de eventos; el
+        UPDATE se limita a esas filas y solo se notifican las que devuelve.
+        """
+        invalid = set(values) - set(BULK_FIELDS)
+        if invalid:
+            raise ValueError(f"Campos no admitidos en cambios masivos: {', '.join(sorted(invalid))}")
+        values = self._sync_codes(self._sync_owner(values))
+        previous = {
+            row.id: IncidentRow(*row)
+            for row in self.session.exec(select(*_columns(IncidentRow)).where(*conditions))
+        }
+        if not previous:
+            return []
+        now = datetime.now(timezone.utc)
+        statement = (
+            update(Incident)
+            .where(col(Incident.id).in_(list(previous)), *conditions)
+            .values(**values, updated_at=now)
+            .returning(*_columns(IncidentRow))
+        )
+        updated = [IncidentRow(*row) for row in self.session.connection().execute(statement)]
+        events = IncidentEventRepository(self.session)
+        changes = [(previous[after.id], after) for after in updated]
+        events.record_many(changes, now)
+        DetectionSlotRepository(self.session).apply(changes)
+        closed = [before.id for before, _ in changes if is_closed_code(before.status_code)]
+        close_times = events.get_close_times(closed) if closed else {}
+        self.session.commit()
+        invalidate_incident_caches()
+        for before, after in changes:
+            closed_before = close_times.get(before.id) if is_closed_code(before.status_code) else None
+            closed_after = (closed_before or now) if is_closed_code(after.status_code) else None
+            incident_events.publish(IncidentChange(UPDATED, before, after, closed_before, closed_after, now))
+        return updated
+
+    def bulk_update(self, incident_ids: list[int], values: dict) -> list[IncidentRow]:
+        """Aplicar los mismos cambios (responsable, estado, severidad) a varios incidentes de la base activa"""
+        return self._bulk_update([col(Incident.id).in_(incident_ids)], values)
+
+    def release_owner(self, user_id: int) -> list[IncidentRow]:
+        """
+        Desvincular los incidentes de un usuario que se va a eliminar.
+
+        Los activos quedan sin responsable (con historial y evento); los
+        cerrados conservan el nombre como registro histórico pero pierden el
+        id, que SQLite podría reutilizar para otro usuario.
+        """
+        released = self._bulk_update(
+            [Incident.owner_id == user_id, active_condition()], {"owner_id": None}
+        )
+        # updated_at cambia también sin evento: las ETag de la API dependen de él
+        now = datetime.now(timezone.utc)
+        self.session.exec(update(Incident).where(Incident.owner_id == user_id).values(owner_id=None, updated_at=now))
+        self.session.commit()
+        self.archive.release_owner(user_id, now)
+        invalidate_incident_caches()
+        return released
+
+    def rename_owner(self, user_id: int, full_name: str) -> int:
+        """
+        Actualizar el nombre mostrado en todos los incidentes de la base activa
+        (también los cerrados) de un usuario renombrado; los archivados
+        conservan el nombre con el que se archivaron.
+        """
+        statement = (
+            update(Incident)
+            .where(Incident.owner_id == user_id)
+            .values(owner=full_name, updated_at=datetime.now(timezone.utc))
+        )
+        result = self.session.exec(statement)
+        self.session.commit()
+        invalidate_incident_caches()
+        return result.rowcount
+
+    def backfill_owner_ids(self, batch_size: int) -> int:
+        """
+        Migración en línea: rellenar `owner_id` a partir del nombre en lotes de ids.
+
+        Cada lote es una transacción corta, así que las escrituras de la
+        aplicación se intercalan; los nombres sin usuario quedan sin id.
+        `updated_at` no cambia (no es una modificación del incidente): las ETag
+        de la API incluyen la revisión OWNERS_REVISION, que sube con cada lote.
+        Retorna cuántos incidentes de la base activa se han enlazado.
+        """
+        pending = (
+            select(Incident.id)
+            .where(Incident.owner_id == None, col(Incident.owner).in_(select(User.full_name)))
+            .exists()
+        )
+        linked = 0
+        if self.session.exec(select(pending)).one():
+            user_id = select(func.min(User.id)).where(User.full_name == Incident.owner).scalar_subquery()
+            last_id = self.session.exec(select(func.max(Incident.id))).one() or 0
+            revisions = RevisionRepository(self.session)
+            for start in range(0, last_id + 1, batch_size):
+                statement = (
+                    update(Incident)
+                    .where(
+                        Incident.id >= start,
+                        Incident.id < start + batch_size,
+                        Incident.owner_id == None,
+                        col(Incident.owner).in_(select(User.full_name)),
+                    )
+                    .values(owner_id=user_id)
+                )
+                batch = self.session.exec(statement).rowcount
+                if batch:
+                    revisions.bump(OWNERS_REVISION)
+                    linked += batch
+                self.session.commit()
+        self.session.rollback()
+        if linked:
+            invalidate_incident_caches()
+        if self.archive.backfill_owner_ids(get_owner_names(self.session, refresh=True)):
+            RevisionRepository(self.session).bump(OWNERS_REVISION)
+            self.session.commit()
+        return linked
+
+    def bulk_delete(self, incident_ids: list[int]) -> int:
+        """Eliminar varios incidentes con sus adjuntos: un DELETE ... RETURNING para los de la base activa"""
+        previous = {
+            row.id: IncidentRow(*row)
+            for row in self.session.exec(select(*_columns(IncidentRow)).where(col(Incident.id).in_(incident_ids)))
+        }
+        deleted: list[int] = []
+        if previous:
+            now = datetime.now(timezone.utc)
+            events = IncidentEventRepository(self.session)
+            closed = [row.id for row in previous.values() if is_closed_code(row.status_code)]
+            close_times = events.get_close_times(closed) if closed else {}
+            self.session.exec(delete(IncidentAttachment).where(col(IncidentAttachment.incident_id).in_(list(previous))))
+            statement = delete(Incident).where(col(Incident.id).in_(list(previous))).returning(Incident.id)
+            deleted = list(self.session.connection().execute(statement).scalars())
+            events.record_many(((previous[incident_id], None) for incident_id in deleted), now)
+            DetectionSlotRepository(self.session).apply((previous[incident_id], None) for incident_id in deleted)
+            self.session.commit()
+            invalidate_incident_caches()
+            for incident_id in deleted:
+                incident_events.publish(IncidentChange(
+                    DELETED, previous[incident_id], None, closed_before=close_times.get(incident_id), ts=now
+                ))
+        # Los archivados no están en la base activa: se eliminan de su partición uno a uno
+        archived = [incident_id for incident_id in incident_ids if incident_id not in previous]
+        return len(deleted) + sum(self._delete_archived(incident_id) for incident_id in archived)
+
     def count(
         self,
         severity: Optional[str] = None,
         status: Optional[str] = None,
         source: Optional[str] = None,
-        owner: Optional[str] = None,
+        owner_id: Optional[int] = None,
         filter_unassigned: bool = False,
+        search: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        archived: bool = True,
     ) -> int:
         """Contar incidentes con filtros opcionales"""
-        statement = select(Incident)
-
-        if severity:
-            statement = statement.where(Incident.severity == severity)
-        if status:
-            statement = statement.where(Incident.status == status)
-        if source:
-            statement = statement.where(Incident.source == source)
-        if filter_unassigned:
-            statement = statement.where(Incident.owner == None)
-        elif owner:
-            statement = statement.where(Incident.owner == owner)
+        statement = select(func.count()).select_from(Incident).where(
+            *self._filter_conditions(severity, status, source, owner_id, filter_unassigned, search, since, until)
+        )
+        total = self.session.exec(statement).one()
+        for partition in self._partitions(archived, status, since, until):
+            total += self.archive.execute(partition, statement)[0]
+        return total
 
-        return len(list(self.session.exec(statement).all()))
+    def get_version(
+        self,
+        severity: Optional[str] = None,
+        status: Optional[str] = None,
+        source: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        filter_unassigned: bool = False,
+        search: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        archived: bool = True,
+    ) -> tuple[int, Optional[datetime]]:
+        """Número de incidentes filtrados y última modificación (para validar cachés de clientes)"""
+        statement = select(func.count(), func.max(Incident.updated_at)).where(
+            *self._filter_conditions(severity, status, source, owner_id, filter_unassigned, search, since, until)
+        )
+        total, last_updated = self.session.exec(statement).one()
+        for partition in self._partitions(archived, status, since, until):
+            partition_total, partition_updated = self.archive.execute(partition, statement)[0]
+            total += partition_total
+            if partition_updated and (last_updated is None or partition_updated > last_updated):
+                last_updated = partition_updated
+        return total, last_updated
 
     def get_unique_values(self, field: str) -> list[str]:
         """Obtener valores únicos de un campo (para filtros)"""
@@ -154,14 +623,149 @@ class IncidentRepository:
         results = self.session.exec(statement).all()
         return [r for r in results if r is not None]
 
+    def get_facets(
+        self,
+        severity: Optional[str] = None,
+        status: Optional[str] = None,
+        source: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        filter_unassigned: bool = False,
+        search: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        refresh: bool = False,
+    ) -> dict[str, list[tuple[Optional[str], int]]]:
+        """
+        Valores de cada filtro con su número de incidentes, en una sola consulta.
+
+        Cada faceta se cuenta aplicando el resto de filtros activos pero no el
+        suyo propio, para que sigan visibles las alternativas del mismo campo.
+        El resultado se cachea hasta la siguiente escritura de incidentes.
+        """
+        key = (severity, status, source, owner_id, filter_unassigned, search, since, until)
+
+        def load() -> dict[str, list[tuple[Optional[str], int]]]:
+            filters = dict(
+                severity=severity,
+                status=status,
+                source=source,
+                owner_id=owner_id,
+                filter_unassigned=filter_unassigned,
+                search=search,
+                since=since,
+                until=until,
+            )
+            selects = []
+            for field, column in FACET_COLUMNS.items():
+                selects.append(
+                    select(literal(field).label("facet"), column.label("value"), func.count().label("total"))
+                    .where(*self._filter_conditions(**filters, exclude=field))
+                    .group_by(column)
+                )
+            statement = union_all(*selects)
+            counts: dict[tuple[str, Optional[str]], int] = {}
+            rows = self.session.exec(statement).all()
+            # La faceta de estado ignora el filtro de estado: el archivo se consulta aunque sea un estado activo
+            for partition in self._partitions(True, None, since, until):
+                rows += self.archive.execute(partition, statement)
+            for facet, value, total in rows:
+                counts[facet, value] = counts.get((facet, value), 0) + total
+            facets: dict[str, list[tuple[Optional[str], int]]] = {field: [] for field in FACET_COLUMNS}
+            for (facet, value), total in counts.items():
+                if facet in FACET_LABELS and value is not None:
+                    value = FACET_LABELS[facet].get(value, value)
+                facets[facet].append((value, total))
+            for values in facets.values():
+                values.sort(key=lambda item: (-item[1], "" if item[0] is None else str(item[0])))
+            return facets
+
+        return facet_cache.get_or_load(key, load, refresh)
+
+    def get_detection_slots(self, since: datetime, slot_seconds: int) -> list[tuple[int, int, int]]:
+        """Incidentes detectados desde `since` agrupados en franjas UTC: (inicio epoch, total, críticos)"""
+        # Del agregado persistente (incluye los archivados), no de los incidentes
+        return DetectionSlotRepository(self.session).get_slots(naive_utc_to_epoch(since), slot_seconds)
+
+    def get_trend(self, spec: TrendSpec, refresh: bool = False) -> dict:
+        """
+        Serie de incidentes detectados (total y críticos) por cubeta de la ventana pedida.
+
+        Se cachea por (ventana, resolución, zona horaria) con un TTL corto, que
+        también acota el retraso en abrir la cubeta de la hora/día siguiente.
+        """
+
+        def load() -> dict:
+            boundaries = bucket_boundaries(spec, datetime.now(timezone.utc))
+            slots = self.get_detection_slots(epoch_to_naive_utc(boundaries[0]), spec.slot_seconds)
+            total, critical = rollup(boundaries, slots)
+            return {
+                "window": spec.window,
+                "resolution": spec.resolution,
+                "step_seconds": spec.step_seconds,
+                "tz": spec.tz,
+                "starts_ms": [start * 1000 for start in boundaries],
+                "labels": bucket_labels(spec, boundaries),
+                "total": total,
+                "critical": critical,
+            }
+
+        return trend_cache.get_or_load(spec, load, refresh)
+
+    def get_resolution_sample(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> ResolutionSample:
+        """Incidentes cerrados detectados en [since, until) como arrays NumPy (una sola consulta)"""
+        # Fecha de cierre real del historial de eventos (updated_at si no hay evento de cierre)
+        close_times = IncidentEventRepository.close_times_statement().subquery()
+        closed_at = func.coalesce(close_times.c.closed_at, Incident.updated_at)
+        days = func.julianday(closed_at) - func.julianday(Incident.detected_at)
+        seconds = cast(func.round(days * 86400), Integer)
+        statement = (
+            select(seconds, Incident.severity, Incident.source, Incident.owner)
+            .outerjoin(close_times, close_times.c.incident_id == Incident.id)
+            .where(Incident.status_code >= CLOSED_STATUS_MIN, closed_at > Incident.detected_at)
+        )
+        # Los archivados guardan su fecha de cierre en el catálogo
+        archived_days = func.julianday(ArchivedIncident.closed_at) - func.julianday(ArchivedIncident.detected_at)
+        archived = select(
+            cast(func.round(archived_days * 86400), Integer),
+            ArchivedIncident.severity,
+            ArchivedIncident.source,
+            ArchivedIncident.owner,
+        ).where(ArchivedIncident.closed_at > ArchivedIncident.detected_at)
+        if since:
+            statement = statement.where(Incident.detected_at >= since)
+            archived = archived.where(ArchivedIncident.detected_at >= since)
+        if until:
+            statement = statement.where(Incident.detected_at < until)
+            archived = archived.where(ArchivedIncident.detected_at < until)
+        statement = union_all(statement, archived)
+        # Filas Core (sin la carga ORM por fila): con un millón de filas es la mitad de tiempo
+        return sample_from_rows(self.session.connection().execute(statement).all())
+
+    def get_resolution_report(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> dict:
+        """Percentiles de tiempo de resolución por severidad, origen y responsable (cacheado)"""
+        return analytics_cache.get_or_load(
+            (since, until), lambda: resolution_report(self.get_resolution_sample(since, until))
+        )
+
     def search(self, query: str) -> list[Incident]:
-        """Buscar incidentes por texto en título, descripción o código"""
+        """Buscar incidentes por texto en título, descripción o código (también en el archivo)"""
         statement = select(Incident).where(
             col(Incident.title).contains(query)
             | col(Incident.description).contains(query)
             | col(Incident.code).contains(query)
         )
-        return list(self.session.exec(statement).all())
+        results = list(self.session.exec(statement).all())
+        for partition in self.archive.partitions_for():
+            results += self.archive.execute(partition, statement)
+        return results
 
 
 def get_incident_repository(session: Session) -> IncidentRepository:
@@ -0,0 +1,40 @@
+from sqlalchemy import Engine
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from app.backend.models.revision import Revision
+
+# Enlaces de incidentes con su responsable que no cambian `updated_at` (migración de `owner_id`)
+OWNERS_REVISION = "owners"
+# Altas, cambios y bajas de usuarios: vacía las cachés de usuarios de todos los workers
+USERS_REVISION = "users"
+# Migraciones de una sola vez ya completadas (0 = pendiente)
+EVENT_CODES_MIGRATION = "event_codes_migrated"
+
+
+def read_revision(target: Engine, name: str) -> int:
+    """
+    Leer un contador por la conexión DBAPI del pool, sin sesión ni ORM (unas
+    decenas de µs frente a cientos): para comprobaciones en cada petición.
+    """
+    conn = target.raw_connection()
+    try:
+        row = conn.cursor().execute("SELECT value FROM revision WHERE name = ?", (name,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else 0
+
+
+class RevisionRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def get(self, name: str) -> int:
+        return self.session.exec(select(Revision.value).where(Revision.name == name)).first() or 0
+
+    def bump(self, name: str) -> None:
+        """Incrementar el contador en la transacción en curso (la confirma quien llama)"""
+        statement = insert(Revision).values(name=name, value=1).on_conflict_do_update(
+            index_elements=[Revision.name], set_={"value": Revision.value + 1}
+        )
+        self.session.exec(statement)
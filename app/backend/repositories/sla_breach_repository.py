@@ -0,0 +1,48 @@
+from datetime import datetime
+from sqlalchemy import insert, literal
+from sqlmodel import Session, select
+
+from app.backend.core.incident_codes import severity_code, status_code
+from app.backend.core.sla_monitor import SLADeadline
+from app.backend.models.incident import Incident
+from app.backend.models.sla_breach import SLABreach
+
+
+class SLABreachRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def record(self, deadlines: list[SLADeadline], status: str, breached_at: datetime) -> list[SLADeadline]:
+        """
+        Registrar los plazos vencidos que siguen vigentes en la base de datos.
+
+        Cada inserción se hace desde la fila del incidente: si otro worker lo
+        ha cambiado de estado o severidad no se inserta nada, y la restricción
+        única evita duplicados si varios detectan el mismo plazo.
+        """
+        recorded = []
+        for entry in deadlines:
+            source = select(
+                Incident.id,
+                Incident.code,
+                Incident.severity,
+                literal(entry.opened_at),
+                literal(entry.deadline),
+                literal(breached_at),
+            ).where(
+                Incident.id == entry.incident_id,
+                Incident.status_code == status_code(status),
+                Incident.severity_code == severity_code(entry.severity),
+            )
+            statement = insert(SLABreach).prefix_with("OR IGNORE").from_select(
+                ["incident_id", "code", "severity", "opened_at", "deadline", "breached_at"], source
+            )
+            if self.session.connection().execute(statement).rowcount:
+                recorded.append(entry)
+        self.session.commit()
+        return recorded
+
+    def get_recent(self, limit: int) -> list[SLABreach]:
+        """Últimos incumplimientos registrados"""
+        statement = select(SLABreach).order_by(SLABreach.breached_at.desc(), SLABreach.id.desc()).limit(limit)
+        return list(self.session.exec(statement).all())
@@ -2,6 +2,10 @@ from typing import Optional, List
 from sqlmodel import Session, select
 
 from app.backend.models.user import User
+from app.backend.core.cache import user_cache, owner_names_cache, invalidate_user
+from app.backend.repositories.revision_repository import RevisionRepository, USERS_REVISION, read_revision
+
+UNASSIGNED = "__unassigned__"
 
 
 def get_user_by_email(session: Session, email: str) -> Optional[User]:
@@ -9,6 +13,71 @@ def get_user_by_email(session: Session, email: str) -> Optional[User]:
     return session.exec(statement).first()
 
 
+def sync_user_caches(session: Session) -> None:
+    """
+    Vaciar las cachés de usuarios si otro worker ha cambiado alguno desde la
+    última comprobación (una lectura por clave primaria de la tabla `revision`).
+
+    Se lee por una conexión propia que vuelve al pool al momento: la sesión de
+    la petición (p. ej. un stream) no abre ninguna si el usuario está en caché.
+    """
+    revision = read_revision(session.get_bind(), USERS_REVISION)
+    user_cache.sync_revision(revision)
+    owner_names_cache.sync_revision(revision)
+
+
+def get_cached_user_by_email(session: Session, email: str) -> Optional[User]:
+    """
+    Obtiene un usuario por email desde la caché de identidad (consulta la BD
+    solo en fallo). Devuelve una copia desacoplada de la sesión, de solo lectura.
+
+    La revisión se lee antes que el usuario: un cambio confirmado después
+    vaciará la caché en la siguiente petición.
+    """
+    sync_user_caches(session)
+
+    def load() -> Optional[User]:
+        user = get_user_by_email(session, email)
+        return User(**user.model_dump()) if user else None
+
+    return user_cache.get_or_load(email, load)
+
+
+def get_owner_names(session: Session, refresh: bool = False) -> dict[int, str]:
+    """Nombre de cada usuario por id (cacheado; se invalida al editar o eliminar usuarios)"""
+    def load() -> dict[int, str]:
+        return dict(session.exec(select(User.id, User.full_name)).all())
+
+    return owner_names_cache.get_or_load("all", load, refresh)
+
+
+def get_owner_name(session: Session, user_id: Optional[int]) -> Optional[str]:
+    """Nombre de un responsable (recarga la caché si el usuario es más reciente que ella)"""
+    if user_id is None:
+        return None
+    names = get_owner_names(session)
+    if user_id not in names:
+        names = get_owner_names(session, refresh=True)
+    return names.get(user_id)
+
+
+def resolve_owner_filter(session: Session, owner: Optional[str]) -> dict:
+    """
+    Filtro de responsable a partir del parámetro `owner` de la lista, la exportación o la API.
+
+    Acepta el id del usuario, `__unassigned__` o (enlaces antiguos) su nombre;
+    un nombre sin usuario se traduce al id 0, que no coincide con ningún incidente.
+    """
+    if not owner:
+        return {"owner_id": None, "filter_unassigned": False}
+    if owner == UNASSIGNED:
+        return {"owner_id": None, "filter_unassigned": True}
+    if owner.isdigit():
+        return {"owner_id": int(owner), "filter_unassigned": False}
+    ids = [user_id for user_id, name in get_owner_names(session).items() if name == owner]
+    return {"owner_id": min(ids) if ids else 0, "filter_unassigned": False}
+
+
 def get_all_users(session: Session) -> List[User]:
     """Obtiene todos los usuarios del sistema"""
     statement = select(User).order_by(User.full_name)
@@ -38,6 +107,7 @@ class UserRepository:
     def create(self, user: User) -> User:
         """Crea un nuevo usuario"""
         self.session.add(user)
+        RevisionRepository(self.session).bump(USERS_REVISION)
         self.session.commit()
         self.session.refresh(user)
         return user
@@ -45,16 +115,21 @@ class UserRepository:
     def update(self, user: User) -> User:
         """Actualiza un usuario existente"""
         self.session.add(user)
+        RevisionRepository(self.session).bump(USERS_REVISION)
         self.session.commit()
         self.session.refresh(user)
+        invalidate_user(email=user.email, user_id=user.id)
         return user
     
     def delete(self, user_id: int) -> bool:
         """Elimina un usuario por ID"""
         user = self.get_by_id(user_id)
         if user:
+            email = user.email
             self.session.delete(user)
+            RevisionRepository(self.session).bump(USERS_REVISION)
             self.session.commit()
+            invalidate_user(email=email, user_id=user_id)
             return True
         return False
     
@@ -2,5 +2,7 @@ from .auth import router as auth_router
 from .dashboard import router as dashboard_router
 from .incidents import router as incidents_router
 from .users import router as users_router
+from .api import router as api_router
+from .diagnostics import router as diagnostics_router
 
-__all__ = ["auth_router", "dashboard_router", "incidents_router", "users_router"]
\ No newline at end of file
+__all__ = ["auth_router", "dashboard_router", "incidents_router", "users_router", "api_router", "diagnostics_router"]
\ No newline at end of file
@@ -0,0 +1,344 @@
+"""
+API JSON versionada de incidentes (/api/v1) para integraciones (SOAR, scripts).
+
+- `fields=code,status` limita los campos devueltos.
+- Paginación por clave: cada página devuelve `next_cursor`, que se pasa como
+  `cursor` para obtener la siguiente sin recorrer las anteriores.
+- Todas las respuestas llevan ETag; con `If-None-Match` se responde 304.
+- `/dashboard/trend` sirve las series de las gráficas para pantallas que
+  sondean periódicamente sin renderizar el dashboard completo.
+- `/analytics/resolution` da percentiles de tiempo de resolución y SLA.
+- `/analytics/time-in-status` y `/incidents/{id}/events` salen del historial
+  de transiciones (solo inserción).
+- `/admin/jobs` (solo administradores) muestra y lanza tareas en segundo plano.
+- `since`/`until` acotan la fecha de detección; los incidentes archivados solo
+  se consultan si el rango (y el estado) pueden incluirlos.
+- `owner` es el id del responsable (`__unassigned__` para los que no tienen;
+  se sigue aceptando el nombre completo).
+- `status=__active__` devuelve todos los incidentes no cerrados; severidad y
+  estado aceptan variantes de la etiqueta ("en investigacion", "critico").
+"""
+import base64
+import binascii
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import status as http_status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlmodel import Session
+
+from app.backend.database import get_session
+from app.backend.models import Incident, User
+from app.backend.repositories.incident_repository import get_incident_repository, IncidentRow
+from app.backend.repositories.incident_attachment_repository import IncidentAttachmentRepository
+from app.backend.repositories.incident_event_repository import IncidentEventRepository
+from app.backend.repositories.user_repository import get_owner_names, resolve_owner_filter
+from app.backend.repositories.revision_repository import RevisionRepository, OWNERS_REVISION
+from app.backend.dependencies.auth import get_current_user, require_admin
+from app.backend.core.constants import API_DEFAULT_LIMIT, API_MAX_LIMIT
+from app.backend.core.cache import analytics_cache
+from app.backend.core.scheduler import scheduler, SCHEDULER_ENABLED
+from app.backend.core.http_cache import make_etag, etag_matches, not_modified, cache_headers
+from app.backend.core.time_buckets import InvalidTrendSpec, parse_trend_spec
+
+router = APIRouter(prefix="/api/v1", tags=["api"])
+
+LIST_FIELDS = IncidentRow._fields
+DETAIL_FIELDS = tuple(Incident.model_fields)
+
+
+def parse_fields(fields: Optional[str], allowed: tuple[str, ...]) -> tuple[str, ...]:
+    """Validar el parámetro `fields` (todos los campos permitidos si no se indica)"""
+    if not fields:
+        return allowed
+    selected = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    invalid = [f for f in selected if f not in allowed]
+    if invalid or not selected:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos no válidos: {', '.join(invalid)}. Permitidos: {', '.join(allowed)}",
+        )
+    return selected
+
+
+def encode_cursor(row: IncidentRow) -> str:
+    raw = f"{row.detected_at.isoformat()}|{row.id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        detected_at, incident_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(detected_at), int(incident_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="Cursor no válido")
+
+
+def build_filters(
+    session: Session,
+    severity: Optional[str],
+    status: Optional[str],
+    source: Optional[str],
+    owner: Optional[str],
+    search: Optional[str],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> dict:
+    """Filtros del repositorio (owner=__unassigned__ equivale a incidentes sin responsable)"""
+    return dict(
+        severity=severity,
+        status=status,
+        source=source,
+        **resolve_owner_filter(session, owner),
+        search=search,
+        since=to_naive_utc(since),
+        until=to_naive_utc(until),
+    )
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Las fechas se guardan en UTC sin zona: convertir las que la indiquen"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def project(values: dict, fields: tuple[str, ...]) -> dict:
+    return {field: values[field] for field in fields}
+
+
+@router.get("/incidents")
+async def list_incidents(
+    request: Request,
+    severity: Optional[str] = None,
+    status: Optional[str] = None,
+    source: Optional[str] = None,
+    owner: Optional[str] = None,
+    search: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(API_DEFAULT_LIMIT, ge=1, le=API_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Listar incidentes (más recientes primero) con paginación por cursor"""
+    selected = parse_fields(fields, LIST_FIELDS)
+    after = decode_cursor(cursor) if cursor else None
+    filters = build_filters(session, severity, status, source, owner, search, since, until)
+    repo = get_incident_repository(session)
+
+    # Recuento + última modificación (y los enlaces de responsables migrados) bastan para saber si la página ha cambiado
+    total, last_updated = repo.get_version(**filters)
+    owners = RevisionRepository(session).get(OWNERS_REVISION)
+    etag = make_etag("incidents", sorted(filters.items()), after, limit, selected, total, last_updated, owners)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    rows = repo.get_rows(**filters, limit=limit + 1, after=after)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    body = {
+        "items": [project(row._asdict(), selected) for row in rows[:limit]],
+        "total": total,
+        "next_cursor": next_cursor,
+    }
+    return JSONResponse(jsonable_encoder(body), headers=cache_headers(etag))
+
+
+@router.get("/incidents/facets")
+async def incident_facets(
+    request: Request,
+    severity: Optional[str] = None,
+    status: Optional[str] = None,
+    source: Optional[str] = None,
+    owner: Optional[str] = None,
+    search: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Valores de cada filtro con su número de incidentes"""
+    filters = build_filters(session, severity, status, source, owner, search, since, until)
+    facets = get_incident_repository(session).get_facets(**filters)
+
+    etag = make_etag("facets", facets)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    body = {
+        field: [{"value": value, "count": count} for value, count in values]
+        for field, values in facets.items()
+    }
+    owner_names = get_owner_names(session)
+    for item in body["owner_id"]:
+        item["label"] = owner_names.get(item["value"]) if item["value"] is not None else None
+    return JSONResponse(body, headers=cache_headers(etag))
+
+
+@router.get("/incidents/{incident_id}")
+async def get_incident(
+    request: Request,
+    incident_id: int,
+    fields: Optional[str] = None,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Detalle de un incidente"""
+    selected = parse_fields(fields, DETAIL_FIELDS)
+    incident = get_incident_repository(session).get_by_id(incident_id)
+    if not incident:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Incidente no encontrado")
+
+    owners = RevisionRepository(session).get(OWNERS_REVISION)
+    etag = make_etag("incident", incident.id, incident.updated_at, selected, owners)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    body = project(incident.model_dump(), selected)
+    return JSONResponse(jsonable_encoder(body), headers=cache_headers(etag))
+
+
+@router.get("/incidents/{incident_id}/attachments")
+async def list_incident_attachments(
+    request: Request,
+    incident_id: int,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Metadatos de los adjuntos de un incidente (sin contenido)"""
+    repo = get_incident_repository(session)
+    if not repo.get_by_id(incident_id):
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Incidente no encontrado")
+
+    with repo.archive.data_session(incident_id) as data_session:
+        attachments = IncidentAttachmentRepository(data_session).get_metadata_by_incident_id(incident_id)
+    items = [
+        {"id": a.id, "filename": a.filename, "uploaded_at": a.uploaded_at, "size": a.size}
+        for a in attachments
+    ]
+
+    etag = make_etag("attachments", incident_id, [tuple(item.values()) for item in items])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    return JSONResponse(jsonable_encoder({"items": items}), headers=cache_headers(etag))
+
+
+@router.get("/incidents/{incident_id}/events")
+async def list_incident_events(
+    request: Request,
+    incident_id: int,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Historial de cambios de estado, severidad y responsable de un incidente"""
+    events = IncidentEventRepository(session).get_by_incident_id(incident_id)
+    if not events and not get_incident_repository(session).get_by_id(incident_id):
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Incidente no encontrado")
+
+    items = [
+        {"ts": e.ts, "type": e.type, "old_value": e.old_value, "new_value": e.new_value}
+        for e in events
+    ]
+    etag = make_etag("events", incident_id, len(events), events[-1].id if events else None)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    return JSONResponse(jsonable_encoder({"items": items}), headers=cache_headers(etag))
+
+
+@router.get("/dashboard/trend")
+async def dashboard_trend(
+    request: Request,
+    window: str = "24h",
+    resolution: str = "1h",
+    tz: str = "UTC",
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Incidentes detectados (total y críticos) por cubeta, en la zona horaria indicada"""
+    try:
+        spec = parse_trend_spec(window, resolution, tz)
+    except InvalidTrendSpec as e:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    trend = get_incident_repository(session).get_trend(spec)
+    etag = make_etag("trend", spec, trend["starts_ms"][0], trend["total"], trend["critical"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    return JSONResponse(trend, headers=cache_headers(etag))
+
+
+@router.get("/analytics/resolution")
+async def resolution_analytics(
+    request: Request,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Tiempo de resolución (media, p50/p90/p99, histograma y SLA) de los incidentes cerrados detectados en el rango"""
+    since, until = to_naive_utc(since), to_naive_utc(until)
+    if since and until and since >= until:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="'since' debe ser anterior a 'until'")
+
+    report = get_incident_repository(session).get_resolution_report(since, until)
+    etag = make_etag("resolution", since, until, report["count"], report["overall"])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    body = {"since": since, "until": until, **report}
+    return JSONResponse(jsonable_encoder(body), headers=cache_headers(etag))
+
+
+@router.get("/analytics/time-in-status")
+async def time_in_status_analytics(
+    request: Request,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Tiempo total que los incidentes han pasado en cada estado dentro del rango"""
+    since, until = to_naive_utc(since), to_naive_utc(until)
+    if since and until and since >= until:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="'since' debe ser anterior a 'until'")
+
+    repo = IncidentEventRepository(session)
+    rows = analytics_cache.get_or_load(
+        ("time_in_status", since, until), lambda: repo.get_time_in_status(to_naive_utc(datetime.now(timezone.utc)), since, until)
+    )
+    items = [
+        {"status": status, "incidents": incidents, "seconds": round(seconds, 1)}
+        for status, incidents, seconds in sorted(rows, key=lambda row: -row[2])
+    ]
+    etag = make_etag("time_in_status", since, until, items)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    body = {"since": since, "until": until, "items": items}
+    return JSONResponse(jsonable_encoder(body), headers=cache_headers(etag))
+
+
+@router.get("/admin/jobs")
+async def list_jobs(user: User = Depends(require_admin)):
+    """Estado de las tareas en segundo plano de este worker: duraciones, fallos y último éxito"""
+    return {"enabled": SCHEDULER_ENABLED, "jobs": scheduler.stats()}
+
+
+@router.post("/admin/jobs/{name}/run", status_code=http_status.HTTP_202_ACCEPTED)
+async def run_job(name: str, user: User = Depends(require_admin)):
+    """Lanzar una tarea ahora (409 si ya está en su límite de ejecuciones simultáneas)"""
+    try:
+        started = scheduler.run(name)
+    except KeyError:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail="Tarea no encontrada")
+    if not started:
+        raise HTTPException(status_code=http_status.HTTP_409_CONFLICT, detail="La tarea ya está en ejecución")
+    return {"job": name, "started": True}
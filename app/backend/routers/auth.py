@@ -1,32 +1,35 @@
 from fastapi import APIRouter, Request, Form, Depends, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlmodel import Session, select
-from passlib.context import CryptContext
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 
 from app.backend.database import get_session
 from app.backend.models import User
-from app.backend.core.constants import BCRYPT_MAX_PASSWORD_LENGTH, SESSION_COOKIE_MAX_AGE, LOGIN_RATE_LIMIT
+from app.backend.repositories.user_repository import get_cached_user_by_email
+from app.backend.core.constants import SESSION_COOKIE_MAX_AGE, LOGIN_RATE_LIMIT
+from app.backend.core.security import password_hasher, PasswordHasherBusy
+from app.backend.core.rate_limit import limiter
+from app.backend.core.templates import templates
 
 router = APIRouter(tags=["auth"])
-templates = Jinja2Templates(directory="app/frontend/templates")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-limiter = Limiter(key_func=get_remote_address)
 
 
-def authenticate_user(session: Session, email: str, password: str):
+async def authenticate_user(session: Session, email: str, password: str):
     statement = select(User).where(User.email == email)
     user = session.exec(statement).first()
 
     if not user:
         return None
     
-    # Intentar verificar con bcrypt
+    # Liberar la conexión antes de esperar a bcrypt: el usuario queda desacoplado
+    # con sus atributos cargados y se vuelve a añadir si hay que migrar el hash
+    session.close()
+    
+    # Intentar verificar con bcrypt (en el pool de hash, fuera del event loop)
     try:
-        if not pwd_context.verify(password, user.password):
+        if not await password_hasher.verify(password, user.password):
             return None
+    except PasswordHasherBusy:
+        raise
     except Exception:
         # Si falla, puede ser texto plano (migración pendiente)
         # Verificar texto plano y migrar automáticamente
@@ -34,11 +37,7 @@ def authenticate_user(session: Session, email: str, password: str):
             return None
         
         # Migrar la contraseña a bcrypt
-        password_bytes = password.encode('utf-8')
-        if len(password_bytes) > BCRYPT_MAX_PASSWORD_LENGTH:
-            password = password_bytes[:BCRYPT_MAX_PASSWORD_LENGTH].decode('utf-8', errors='ignore')
-        
-        user.password = pwd_context.hash(password)
+        user.password = await password_hasher.hash(password)
         session.add(user)
         session.commit()
     
@@ -55,8 +54,7 @@ async def login_get(
 ):
     email = request.cookies.get("user_email")
     if email:
-        statement = select(User).where(User.email == email)
-        user = session.exec(statement).first()
+        user = get_cached_user_by_email(session, email)
         if user and user.is_active:
             return RedirectResponse(url="/dashboard", status_code=status.HTTP_302_FOUND)
     
@@ -82,7 +80,14 @@ async def login_post(
     password: str = Form(...),
     session: Session = Depends(get_session),
 ):
-    user = authenticate_user(session, email, password)
+    try:
+        user = await authenticate_user(session, email, password)
+    except PasswordHasherBusy:
+        return templates.TemplateResponse(
+            "login.html",
+            {"request": request, "error": "Demasiados inicios de sesión simultáneos. Inténtalo de nuevo en unos segundos."},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
     if not user:
         return templates.TemplateResponse(
             "login.html",
@@ -1,16 +1,56 @@
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlmodel import Session
 
-from app.backend.database import get_session
-from app.backend.models import Incident, User
+from app.backend.database import engine, get_session
+from app.backend.models import User, SLABreach
+from app.backend.repositories.incident_repository import IncidentRepository, IncidentRow
+from app.backend.repositories.incident_event_repository import IncidentEventRepository
+from app.backend.repositories.sla_breach_repository import SLABreachRepository
 from app.backend.dependencies.auth import get_current_user
+from app.backend.core.cache import dashboard_cache
+from app.backend.core.constants import SSE_MAX_CLIENTS, SSE_QUEUE_SIZE, SSE_HEARTBEAT_SECONDS, SSE_RETRY_MS
+from app.backend.core.constants import SLA_OPEN_STATUS, SLA_OPEN_TARGETS, SLA_BREACHES_SHOWN
+from app.backend.core.events import incident_events, IncidentChange
+from app.backend.core.sse import SSEBroker, BrokerFull, format_sse
+from app.backend.core.sla_monitor import SLAMonitor, SLADeadline, utcnow
+from app.backend.core.time_buckets import parse_trend_spec
+from app.backend.core.incident_codes import (
+    SEVERITY_CRITICAL,
+    SEVERITY_HIGH,
+    SEVERITY_MEDIUM,
+    SEVERITY_LOW,
+    is_active_code,
+)
+from app.backend.core.templates import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/frontend/templates")
+
+# Clientes del dashboard en vivo (por worker)
+dashboard_broker = SSEBroker(SSE_MAX_CLIENTS, SSE_QUEUE_SIZE, SSE_HEARTBEAT_SECONDS)
+
+SEVERITY_KEYS = {SEVERITY_CRITICAL: "critico", SEVERITY_HIGH: "alto", SEVERITY_MEDIUM: "medio", SEVERITY_LOW: "bajo"}
+# KPIs que se envían al cliente y se actualizan sumando deltas
+STAT_KEYS = ("open_incidents", "critical_incidents", "alerts_today", "mttr_seconds_total", "mttr_count")
+DEFAULT_TREND = parse_trend_spec("24h", "1h", "UTC")
+
+
+def record_sla_breaches(deadlines: list[SLADeadline]) -> None:
+    """Persistir los plazos vencidos y avisar a los dashboards conectados"""
+    breached_at = utcnow()
+    with Session(engine) as session:
+        recorded = SLABreachRepository(session).record(deadlines, SLA_OPEN_STATUS, breached_at)
+    if recorded:
+        dashboard_cache.clear()
+        for entry in recorded:
+            dashboard_broker.publish("sla_breach", breach_payload(entry, breached_at))
+
+
+# Plazos de atención de los incidentes abiertos (por worker; se arranca en el startup)
+sla_monitor = SLAMonitor(SLA_OPEN_TARGETS, SLA_OPEN_STATUS, on_breach=record_sla_breaches)
+incident_events.subscribe(sla_monitor.handle)
 
 
 def to_naive_utc(dt: datetime | None) -> datetime | None:
@@ -21,18 +61,37 @@ def to_naive_utc(dt: datetime | None) -> datetime | None:
     return dt.astimezone(timezone.utc).replace(tzinfo=None)
 
 
-def is_active_status(status: str) -> bool:
-    if not status:
-        return False
-    s = status.lower()
-    return "cerrado" not in s
+def to_epoch_ms(dt: datetime | None) -> int | None:
+    """Milisegundos epoch de un datetime UTC sin zona (formato que entiende JS)"""
+    if not dt:
+        return None
+    return int(dt.replace(tzinfo=timezone.utc).timestamp() * 1000)
 
 
-def build_kpis(incidents: list[Incident]) -> dict:
+def resolution_seconds(inc: IncidentRow, closed_at: datetime | None) -> float | None:
+    """Segundos desde la detección hasta el último cierre de un incidente cerrado"""
+    if is_active_code(inc.status_code):
+        return None
+    d_start = to_naive_utc(inc.detected_at)
+    d_end = to_naive_utc(closed_at)
+    if d_start and d_end and d_end > d_start:
+        return (d_end - d_start).total_seconds()
+    return None
+
+
+def type_bucket(severity_code: int | None) -> str:
+    if severity_code == SEVERITY_CRITICAL:
+        return "critical"
+    if severity_code == SEVERITY_HIGH:
+        return "high"
+    return "info"
+
+
+def build_kpis(incidents: list[IncidentRow], close_times: dict[int, datetime]) -> dict:
     now = to_naive_utc(datetime.now(timezone.utc))
-    open_inc = [i for i in incidents if is_active_status(i.status)]
+    open_inc = [i for i in incidents if is_active_code(i.status_code)]
     open_incidents = len(open_inc)
-    critical_incidents = sum(1 for i in open_inc if i.severity == "Crítico")
+    critical_incidents = sum(1 for i in open_inc if i.severity_code == SEVERITY_CRITICAL)
 
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     alerts_today = 0
@@ -41,33 +100,30 @@ def build_kpis(incidents: list[Incident]) -> dict:
         if dt >= today_start:
             alerts_today += 1
 
-    closed = [i for i in incidents if not is_active_status(i.status)]
-    mttr_hours = 0
-    if closed:
-        deltas = []
-        for i in closed:
-            d_start = to_naive_utc(i.detected_at)
-            d_end = to_naive_utc(i.updated_at)
-            if d_start and d_end and d_end > d_start:
-                deltas.append(d_end - d_start)
-        if deltas:
-            avg_delta = sum((d for d in deltas), timedelta()) / len(deltas)
-            mttr_hours = int(avg_delta.total_seconds() // 3600)
+    resolutions = [
+        seconds
+        for seconds in (resolution_seconds(i, close_times.get(i.id)) for i in incidents)
+        if seconds is not None
+    ]
+    mttr_seconds_total = sum(resolutions)
+    mttr_hours = int(mttr_seconds_total / len(resolutions) // 3600) if resolutions else 0
 
     return {
         "open_incidents": open_incidents,
         "critical_incidents": critical_incidents,
         "alerts_today": alerts_today,
         "mttr": f"{mttr_hours}h",
+        # Acumuladores para actualizar el MTTR en vivo con deltas
+        "mttr_seconds_total": mttr_seconds_total,
+        "mttr_count": len(resolutions),
     }
 
 
-def build_severity_distribution(incidents: list[Incident]) -> dict:
-    active = [i for i in incidents if is_active_status(i.status)]
-    buckets = {"Crítico": 0, "Alto": 0, "Medio": 0, "Bajo": 0}
-    for i in active:
-        if i.severity in buckets:
-            buckets[i.severity] += 1
+def build_severity_distribution(incidents: list[IncidentRow]) -> dict:
+    buckets = dict.fromkeys(SEVERITY_KEYS.values(), 0)
+    for i in incidents:
+        if is_active_code(i.status_code) and i.severity_code in SEVERITY_KEYS:
+            buckets[SEVERITY_KEYS[i.severity_code]] += 1
     total = sum(buckets.values())
     if total == 0:
         return {
@@ -83,56 +139,29 @@ def build_severity_distribution(incidents: list[Incident]) -> dict:
 
     return {
         "total_active": total,
-        "critico": {"count": buckets["Crítico"], "percent": pct(buckets["Crítico"])},
-        "alto": {"count": buckets["Alto"], "percent": pct(buckets["Alto"])},
-        "medio": {"count": buckets["Medio"], "percent": pct(buckets["Medio"])},
-        "bajo": {"count": buckets["Bajo"], "percent": pct(buckets["Bajo"])},
+        **{key: {"count": count, "percent": pct(count)} for key, count in buckets.items()},
     }
 
 
-def build_trend_data(incidents: list[Incident]) -> dict:
-    now = to_naive_utc(datetime.now(timezone.utc))
-    window_start = now - timedelta(hours=24)
-
-    labels: list[str] = []
-    total_values = [0] * 24
-    critical_values = [0] * 24
-
-    for idx in range(24):
-        hour_dt = window_start + timedelta(hours=idx)
-        labels.append(hour_dt.strftime("%Hh"))
-
-    for inc in incidents:
-        dt = to_naive_utc(inc.detected_at or inc.updated_at)
-        if not dt:
-            continue
-        if dt < window_start or dt > now:
-            continue
-        idx = int((dt - window_start).total_seconds() // 3600)
-        if 0 <= idx < 24:
-            total_values[idx] += 1
-            if inc.severity == "Crítico":
-                critical_values[idx] += 1
-
+def build_trend_data(repo: IncidentRepository) -> dict:
+    """Tendencia por defecto de la página: últimas 24 horas de reloj en UTC"""
+    trend = repo.get_trend(DEFAULT_TREND)
     return {
-        "trend_labels": labels,
-        "trend_total": total_values,
-        "trend_critical": critical_values,
+        "trend_start_ms": trend["starts_ms"][0],
+        "trend_starts_ms": trend["starts_ms"],
+        "trend_labels": trend["labels"],
+        "trend_total": trend["total"],
+        "trend_critical": trend["critical"],
     }
 
 
-def build_type_data(incidents: list[Incident]) -> dict:
+def build_type_data(incidents: list[IncidentRow]) -> dict:
     by_source: dict[str, dict[str, int]] = {}
     for inc in incidents:
         src = inc.source or "Desconocido"
         if src not in by_source:
             by_source[src] = {"info": 0, "high": 0, "critical": 0}
-        if inc.severity == "Crítico":
-            by_source[src]["critical"] += 1
-        elif inc.severity == "Alto":
-            by_source[src]["high"] += 1
-        else:
-            by_source[src]["info"] += 1
+        by_source[src][type_bucket(inc.severity_code)] += 1
 
     items = sorted(
         by_source.items(),
@@ -154,31 +183,24 @@ def build_type_data(incidents: list[Incident]) -> dict:
     }
 
 
-@router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(
-    request: Request,
-    session: Session = Depends(get_session),
-    user: User = Depends(get_current_user),
-):
-    incidents = session.exec(select(Incident)).all()
-
-    stats = build_kpis(incidents)
-    severity_data = build_severity_distribution(incidents)
-    trend = build_trend_data(incidents)
-    type_data = build_type_data(incidents)
+def build_dashboard_data(session: Session) -> dict:
+    """Agregados del dashboard (KPIs, gráficas, listas) a partir de proyecciones ligeras"""
+    repo = IncidentRepository(session)
+    # Solo las columnas que usan los KPIs y paneles (sin descripción), y solo la base activa
+    incidents = repo.get_rows(archived=False)
 
     # Incidentes detectados recientemente (ordenados por detected_at)
-    def detected_sort_key(i: Incident) -> datetime:
+    def detected_sort_key(i: IncidentRow) -> datetime:
         return to_naive_utc(i.detected_at or datetime.now(timezone.utc))
 
     recent_incidents = sorted(
-        [i for i in incidents if is_active_status(i.status)],
+        [i for i in incidents if is_active_code(i.status_code)],
         key=detected_sort_key,
         reverse=True,
     )[:6]
 
     # Actividad reciente (incidentes actualizados recientemente, ordenados por updated_at)
-    def updated_sort_key(i: Incident) -> datetime:
+    def updated_sort_key(i: IncidentRow) -> datetime:
         return to_naive_utc(i.updated_at or i.detected_at or datetime.now(timezone.utc))
 
     activity = sorted(
@@ -187,17 +209,169 @@ async def dashboard(
         reverse=True,
     )[:5]
 
-    charts = {**trend, **type_data}
+    return {
+        "stats": build_kpis(incidents, IncidentEventRepository(session).get_close_times()),
+        "severity_data": build_severity_distribution(incidents),
+        "charts": {**build_trend_data(repo), **build_type_data(incidents)},
+        "recent_incidents": recent_incidents,
+        "activity": activity,
+        "sla_breaches": SLABreachRepository(session).get_recent(SLA_BREACHES_SHOWN),
+    }
+
+
+def get_dashboard_data(session: Session, refresh: bool = False) -> dict:
+    """Agregados cacheados: se invalidan con cada escritura de incidentes"""
+    return dashboard_cache.get_or_load("dashboard", lambda: build_dashboard_data(session), refresh)
+
+
+def incident_payload(inc: IncidentRow) -> dict:
+    return {
+        "id": inc.id,
+        "code": inc.code,
+        "title": inc.title,
+        "severity": inc.severity,
+        "source": inc.source,
+        "status": inc.status,
+        "updated": inc.updated_at.strftime("%d/%m %H:%M") if inc.updated_at else "-",
+        "detected_ms": to_epoch_ms(to_naive_utc(inc.detected_at)),
+        "active": is_active_code(inc.status_code),
+    }
+
+
+def breach_payload(breach: SLADeadline | SLABreach, breached_at: datetime) -> dict:
+    return {
+        "id": breach.incident_id,
+        "code": breach.code,
+        "severity": breach.severity,
+        "overdue": breached_at.strftime("%d/%m %H:%M"),
+        "target_minutes": int((breach.deadline - breach.opened_at).total_seconds() // 60),
+    }
+
+
+def build_snapshot(data: dict) -> dict:
+    """Estado completo que recibe cada cliente al conectarse"""
+    stats = data["stats"]
+    return {
+        "stats": {key: stats[key] for key in STAT_KEYS},
+        "severity": {key: data["severity_data"][key]["count"] for key in SEVERITY_KEYS.values()},
+        "charts": data["charts"],
+        "recent": [incident_payload(i) for i in data["recent_incidents"]],
+        "activity": [incident_payload(i) for i in data["activity"]],
+        "sla_breaches": [
+            breach_payload(breach, breach.breached_at) for breach in data["sla_breaches"]
+        ],
+    }
+
+
+def build_delta(change: IncidentChange) -> dict:
+    """
+    Diferencia que produce un cambio sobre los agregados del dashboard.
+
+    Se resta la contribución de la fila anterior y se suma la de la nueva, sin
+    consultar la base de datos; el cliente aplica el delta sobre su estado.
+    """
+    now = to_naive_utc(datetime.now(timezone.utc))
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    stats = dict.fromkeys(STAT_KEYS, 0)
+    severity = dict.fromkeys(SEVERITY_KEYS.values(), 0)
+    trend = []
+    types = []
+
+    for inc, closed_at, sign in ((change.before, change.closed_before, -1), (change.after, change.closed_after, 1)):
+        if inc is None:
+            continue
+        if is_active_code(inc.status_code):
+            stats["open_incidents"] += sign
+            if inc.severity_code == SEVERITY_CRITICAL:
+                stats["critical_incidents"] += sign
+            if inc.severity_code in SEVERITY_KEYS:
+                severity[SEVERITY_KEYS[inc.severity_code]] += sign
+        if (to_naive_utc(inc.detected_at) or now) >= today_start:
+            stats["alerts_today"] += sign
+        seconds = resolution_seconds(inc, closed_at)
+        if seconds is not None:
+            stats["mttr_seconds_total"] += sign * seconds
+            stats["mttr_count"] += sign
+        trend_dt = to_naive_utc(inc.detected_at or inc.updated_at)
+        if trend_dt:
+            trend.append([to_epoch_ms(trend_dt), sign, sign if inc.severity_code == SEVERITY_CRITICAL else 0])
+        types.append([inc.source or "Desconocido", type_bucket(inc.severity_code), sign])
+
+    return {
+        "kind": change.kind,
+        "id": change.incident_id,
+        "stats": stats,
+        "severity": severity,
+        "trend": trend,
+        "type": types,
+        "incident": incident_payload(change.after) if change.after else None,
+    }
+
+
+@incident_events.subscribe
+def push_dashboard_delta(change: IncidentChange) -> None:
+    if dashboard_broker.client_count:
+        dashboard_broker.publish("delta", build_delta(change))
+
+
+def push_dashboard_snapshot() -> int:
+    """
+    Estado completo a los clientes conectados; retorna a cuántos.
+
+    Corrige la deriva de los deltas: un cambio de otro worker llega con hasta
+    CHANGE_LOG_POLL_INTERVAL segundos de retraso y puede contarse dos veces si
+    el cliente recibió entretanto un estado que ya lo incluía.
+    """
+    if not dashboard_broker.client_count:
+        return 0
+    with Session(engine) as session:
+        dashboard_broker.publish("snapshot", build_snapshot(get_dashboard_data(session)))
+    return dashboard_broker.client_count
+
+
+@router.get("/dashboard", response_class=HTMLResponse)
+async def dashboard(
+    request: Request,
+    session: Session = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    data = get_dashboard_data(session)
 
     return templates.TemplateResponse(
         "dashboard.html",
         {
             "request": request,
             "user": user,
-            "stats": stats,
-            "recent_incidents": recent_incidents,
-            "severity_data": severity_data,
-            "activity": activity,
-            "charts": charts,
+            "stats": data["stats"],
+            "recent_incidents": data["recent_incidents"],
+            "severity_data": data["severity_data"],
+            "activity": data["activity"],
+            "charts": data["charts"],
+            "sla_breaches": data["sla_breaches"],
         },
     )
+
+
+@router.get("/dashboard/stream")
+async def dashboard_stream(
+    session: Session = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """Canal SSE: estado completo al conectar y después deltas por cada cambio de incidente"""
+    try:
+        queue = dashboard_broker.connect()
+    except BrokerFull:
+        return Response(status_code=503, headers={"Retry-After": "30"})
+
+    # Sin await entre la suscripción y el snapshot: ningún cambio queda fuera ni se cuenta dos veces
+    try:
+        initial = format_sse("snapshot", build_snapshot(get_dashboard_data(session)), retry_ms=SSE_RETRY_MS)
+    except Exception:
+        dashboard_broker.disconnect(queue)
+        raise
+
+    return StreamingResponse(
+        dashboard_broker.stream(queue, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
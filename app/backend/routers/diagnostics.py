@@ -0,0 +1,70 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+
+from app.backend.dependencies.auth import require_admin
+from app.backend.models.user import User
+from app.backend.core import profiler
+from app.backend.core.memory import tracker, site_stats
+from app.backend.core.constants import MEMORY_TOP_SITES
+
+router = APIRouter(prefix="/admin/diagnostics", tags=["diagnostics"])
+
+
+@router.get("/profiles")
+def list_profiles(user: User = Depends(require_admin)):
+    """Perfiles de peticiones guardados, del más reciente al más antiguo (solo admin)"""
+    return {
+        "sample_rate": profiler.PROFILE_SAMPLE_RATE,
+        "header": "X-CyberWatch-Profile: 1",
+        "profiles": profiler.list_profiles(),
+    }
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str, user: User = Depends(require_admin)):
+    """Pilas colapsadas de un perfil (flamegraph.pl, speedscope) (solo admin)"""
+    path = profiler.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil no encontrado")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=profile_id)
+
+
+@router.get("/memory")
+def memory_report(
+    limit: int = Query(MEMORY_TOP_SITES, ge=1, le=200),
+    group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+    user: User = Depends(require_admin),
+):
+    """
+    Memoria de este worker (solo admin): residente, trazada, puntos de
+    asignación con más memoria viva, historial de instantáneas con su
+    crecimiento y picos de las peticiones muestreadas.
+    """
+    return {
+        **tracker.stats(),
+        "top_sites": site_stats(tracker.take(), limit, group_by) if tracker.tracing else [],
+        "snapshots": list(tracker.snapshots),
+        "requests": tracker.request_summary(),
+        "recent_requests": list(tracker.requests)[-limit:],
+    }
+
+
+@router.post("/memory/snapshot")
+def memory_snapshot(limit: int = Query(MEMORY_TOP_SITES, ge=1, le=200), user: User = Depends(require_admin)):
+    """Tomar una instantánea y devolver el crecimiento desde la anterior (solo admin)"""
+    entry = tracker.snapshot(limit)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="tracemalloc no está activado")
+    return entry
+
+
+@router.post("/memory/tracing")
+def memory_tracing(enabled: bool, user: User = Depends(require_admin)):
+    """Activar o desactivar tracemalloc en este worker (solo admin)"""
+    if enabled:
+        tracker.start()
+    else:
+        tracker.stop()
+    return tracker.stats()
@@ -6,20 +6,76 @@ import io
 from fastapi import APIRouter, Depends, Request, Form, HTTPException, UploadFile, File
 from fastapi import status as http_status
 from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
-from fastapi.templating import Jinja2Templates
 from sqlmodel import Session
 
-from app.backend.database import get_session
+from app.backend.database import get_session, engine
 from app.backend.models import Incident, User
 from app.backend.models.incident_attachment import IncidentAttachment
 from app.backend.repositories.incident_repository import get_incident_repository, IncidentRepository
-from app.backend.repositories.user_repository import UserRepository
+from app.backend.repositories.user_repository import UserRepository, UNASSIGNED, get_owner_names, resolve_owner_filter
 from app.backend.repositories.incident_attachment_repository import IncidentAttachmentRepository
+from app.backend.repositories.incident_event_repository import IncidentEventRepository
+from app.backend.repositories.incident_archive_repository import IncidentArchiveRepository
 from app.backend.dependencies.auth import get_current_user
-from app.backend.core.constants import PAGINATION_OPTIONS, DEFAULT_PER_PAGE
+from app.backend.core.constants import (
+    PAGINATION_OPTIONS,
+    DEFAULT_PER_PAGE,
+    TIMELINE_PAGE_SIZE,
+    TIMELINE_CHUNK_SIZE,
+    EXPORT_BATCH_SIZE,
+    INCIDENT_CREATE_RATE_LIMIT,
+    FILE_UPLOAD_RATE_LIMIT,
+)
+from app.backend.core.rate_limit import limiter
+from app.backend.core.metrics import upload_bytes, attachment_size
+from app.backend.core.log_timeline import iter_attachment_entries, merge_timelines, paginate
+from app.backend.core.templates import templates
 
 router = APIRouter(prefix="/incidents", tags=["incidents"])
-templates = Jinja2Templates(directory="app/frontend/templates")
+
+
+def parse_datetime_param(value: Optional[str]) -> Optional[datetime]:
+    """Convertir un parámetro de fecha (ISO o datetime-local) a UTC naive ignorando valores vacíos o inválidos"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        # Con desplazamiento (+02:00, Z): a UTC naive, como las fechas guardadas
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_owner_id(value: Optional[str]) -> Optional[int]:
+    """Id del responsable enviado en un formulario (vacío o "sin asignar" equivalen a ninguno)"""
+    if not value or value == UNASSIGNED:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail="Responsable no válido")
+
+
+def build_incident_timeline(
+    session: Session,
+    incident_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Timeline combinado de todos los logs de un incidente (un iterador por adjunto)"""
+    attachment_repo = IncidentAttachmentRepository(session)
+    streams = [
+        iter_attachment_entries(
+            meta.id,
+            meta.filename,
+            attachment_repo.iter_content_chunks(meta.id, TIMELINE_CHUNK_SIZE),
+            meta.uploaded_at,
+        )
+        for meta in attachment_repo.get_metadata_by_incident_id(incident_id)
+    ]
+    return merge_timelines(streams, since=since, until=until)
 
 
 @router.get("", response_class=HTMLResponse)
@@ -47,58 +103,43 @@ async def list_incidents(
     
     # Si es analista y no hay filtro de owner, establecer por defecto al analista actual
     if user.role == 'analyst' and owner is None:
-        owner = user.full_name
-    
-    # Manejar filtro especial de "sin asignar"
-    filter_unassigned = False
-    if owner == "__unassigned__":
-        filter_unassigned = True
-        owner = None  # Para que el repositorio busque incidentes sin owner
-    
-    if search:
-        incidents = repo.search(search)
-        # Filtrar por owner si está establecido
-        if filter_unassigned:
-            incidents = [inc for inc in incidents if inc.owner is None]
-        elif owner:
-            incidents = [inc for inc in incidents if inc.owner == owner]
-        total_incidents = len(incidents)
-        incidents = incidents[offset:offset + per_page]
-    else:
-        # Contar total de incidentes con filtros
-        total_incidents = repo.count(
-            severity=severity,
-            status=status,
-            source=source,
-            owner=owner,
-            filter_unassigned=filter_unassigned,
-        )
-        
-        incidents = repo.get_all(
-            severity=severity,
-            status=status,
-            source=source,
-            owner=owner,
-            filter_unassigned=filter_unassigned,
-            limit=per_page,
-            offset=offset,
-        )
+        owner = str(user.id)
+    
+    # Id del responsable, "sin asignar" o (enlaces antiguos) su nombre
+    owner_filter = resolve_owner_filter(session, owner)
+    
+    filters = dict(
+        severity=severity,
+        status=status,
+        source=source,
+        search=search,
+        **owner_filter,
+    )
+    total_incidents = repo.count(**filters)
+    incidents = repo.get_rows(**filters, limit=per_page, offset=offset)
     
     # Calcular número total de páginas
     total_pages = (total_incidents + per_page - 1) // per_page
     
-    # Obtener valores únicos para los filtros
-    severities = repo.get_unique_values("severity")
-    statuses = repo.get_unique_values("status")
-    sources = repo.get_unique_values("source")
-    
-    # Obtener usuarios activos para el filtro de responsables
-    user_repo = UserRepository(session)
-    active_users = user_repo.get_active_users()
-    owners = [u.full_name for u in active_users]
+    # Valores de los filtros con su número de incidentes (una consulta, cacheada)
+    facets = repo.get_facets(**filters)
+    facet_counts = {field: dict(values) for field, values in facets.items()}
+    sources = [value for value, _ in facets["source"] if value is not None]
+    # Responsables como (id, nombre), con los nombres de la caché de usuarios
+    owner_names = get_owner_names(session)
+    owner_ids = [value for value, _ in facets["owner_id"] if value is not None]
+    owner_id = owner_filter["owner_id"]
+    if owner_id and owner_id not in owner_ids and owner_id in owner_names:
+        owner_ids.append(owner_id)
+    owners = [(value, owner_names.get(value, f"#{value}")) for value in owner_ids]
     
     # Preparar el valor de owner para el template
-    owner_filter_value = "__unassigned__" if filter_unassigned else owner
+    if owner_filter["filter_unassigned"]:
+        owner_filter_value = UNASSIGNED
+    else:
+        owner_filter_value = str(owner_id) if owner_id is not None else None
+    # Analistas a los que se pueden asignar los incidentes seleccionados
+    analysts = UserRepository(session).get_active_analysts()
     
     return templates.TemplateResponse(
         "incidents.html",
@@ -106,10 +147,10 @@ async def list_incidents(
             "request": request,
             "user": user,
             "incidents": incidents,
-            "severities": severities,
-            "statuses": statuses,
+            "facet_counts": facet_counts,
             "sources": sources,
             "owners": owners,
+            "analysts": analysts,
             "now": datetime.now(timezone.utc),
             "page": page,
             "per_page": per_page,
@@ -154,13 +195,14 @@ async def new_incident_form(
 
 
 @router.post("/new")
+@limiter.limit(INCIDENT_CREATE_RATE_LIMIT)
 async def create_incident(
     request: Request,
     title: str = Form(...),
     severity: str = Form(...),
     status: str = Form(...),
     source: str = Form(...),
-    owner: Optional[str] = Form(None),
+    owner_id: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
     user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
@@ -177,13 +219,16 @@ async def create_incident(
         "severity": severity,
         "status": status,
         "source": source,
-        "owner": owner if owner else None,
+        "owner_id": parse_owner_id(owner_id),
         "description": description if description else None,
         "detected_at": datetime.now(timezone.utc),
         "updated_at": datetime.now(timezone.utc),
     }
     
-    repo.create(incident_data)
+    try:
+        repo.create(incident_data)
+    except ValueError as exc:  # Severidad o estado no reconocidos
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(exc))
     return RedirectResponse(url="/incidents", status_code=http_status.HTTP_303_SEE_OTHER)
 
 
@@ -211,9 +256,11 @@ async def view_incident(
             detail="Incidente no encontrado"
         )
     
-    # Obtener logs adjuntos
-    attachment_repo = IncidentAttachmentRepository(session)
-    attachments = attachment_repo.get_by_incident_id(incident_id)
+    # Obtener logs adjuntos (de la partición de archivo si el incidente está archivado)
+    archived = repo.is_archived(incident_id)
+    with repo.archive.data_session(incident_id) as data_session:
+        attachments = IncidentAttachmentRepository(data_session).get_by_incident_id(incident_id)
+    events = IncidentEventRepository(session).get_by_incident_id(incident_id)
     
     return templates.TemplateResponse(
         "incident_detail.html",
@@ -222,6 +269,8 @@ async def view_incident(
             "user": user,
             "incident": incident,
             "attachments": attachments,
+            "events": events,
+            "archived": archived,
             "return_params": {
                 "page": page,
                 "per_page": per_page,
@@ -235,6 +284,100 @@ async def view_incident(
     )
 
 
+@router.get("/{incident_id}/timeline", response_class=HTMLResponse)
+async def view_incident_timeline(
+    request: Request,
+    incident_id: int,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    page: int = 1,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Ver todos los logs del incidente combinados en orden cronológico"""
+    repo = get_incident_repository(session)
+    incident = repo.get_by_id(incident_id)
+
+    if not incident:
+        raise HTTPException(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            detail="Incidente no encontrado"
+        )
+
+    page = max(page, 1)
+    since_dt = parse_datetime_param(since)
+    until_dt = parse_datetime_param(until)
+
+    # Se pide una entrada extra para saber si existe página siguiente
+    offset = (page - 1) * TIMELINE_PAGE_SIZE
+    with repo.archive.data_session(incident_id) as data_session:
+        entries = paginate(
+            build_incident_timeline(data_session, incident_id, since_dt, until_dt),
+            offset,
+            TIMELINE_PAGE_SIZE + 1,
+        )
+        attachments = IncidentAttachmentRepository(data_session).get_metadata_by_incident_id(incident_id)
+    has_next = len(entries) > TIMELINE_PAGE_SIZE
+    entries = entries[:TIMELINE_PAGE_SIZE]
+
+    # Color fijo por fichero para distinguir el origen de cada línea
+    source_colors = {a.id: idx % 4 for idx, a in enumerate(attachments)}
+
+    return templates.TemplateResponse(
+        "incident_timeline.html",
+        {
+            "request": request,
+            "user": user,
+            "incident": incident,
+            "attachments": attachments,
+            "source_colors": source_colors,
+            "entries": entries,
+            "page": page,
+            "has_next": has_next,
+            "filters": {
+                "since": since_dt.strftime("%Y-%m-%dT%H:%M") if since_dt else "",
+                "until": until_dt.strftime("%Y-%m-%dT%H:%M") if until_dt else "",
+            },
+        },
+    )
+
+
+@router.get("/{incident_id}/timeline/stream")
+async def stream_incident_timeline(
+    incident_id: int,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Descargar el timeline combinado completo como texto plano (en streaming)"""
+    repo = get_incident_repository(session)
+    incident = repo.get_by_id(incident_id)
+
+    if not incident:
+        raise HTTPException(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            detail="Incidente no encontrado"
+        )
+
+    since_dt = parse_datetime_param(since)
+    until_dt = parse_datetime_param(until)
+    code = incident.code
+
+    def generate():
+        # La sesión de la petición se cierra antes de enviar la respuesta
+        with Session(engine) as stream_session, \
+                IncidentArchiveRepository(stream_session).data_session(incident_id) as data_session:
+            for entry in build_incident_timeline(data_session, incident_id, since_dt, until_dt):
+                yield f"{entry.timestamp:%Y-%m-%d %H:%M:%S} [{entry.filename}] {entry.text}\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename={code}_timeline.txt"}
+    )
+
+
 @router.get("/{incident_id}/edit", response_class=HTMLResponse)
 async def edit_incident_form(
     request: Request,
@@ -246,7 +389,8 @@ async def edit_incident_form(
     repo = get_incident_repository(session)
     user_repo = UserRepository(session)
     attachment_repo = IncidentAttachmentRepository(session)
-    incident = repo.get_by_id(incident_id)
+    # Los incidentes archivados son de solo lectura
+    incident = repo.get_by_id(incident_id, archived=False)
     
     if not incident:
         raise HTTPException(
@@ -281,7 +425,7 @@ async def update_incident(
     severity: str = Form(...),
     status: str = Form(...),
     source: str = Form(...),
-    owner: Optional[str] = Form(None),
+    owner_id: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
     user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
@@ -294,11 +438,14 @@ async def update_incident(
         "severity": severity,
         "status": status,
         "source": source,
-        "owner": owner if owner else None,
+        "owner_id": parse_owner_id(owner_id),
         "description": description if description else None,
     }
     
-    updated_incident = repo.update(incident_id, incident_data)
+    try:
+        updated_incident = repo.update(incident_id, incident_data)
+    except ValueError as exc:  # Severidad o estado no reconocidos
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(exc))
     
     if not updated_incident:
         raise HTTPException(
@@ -345,65 +492,108 @@ async def delete_incident(
     return RedirectResponse(url=return_url, status_code=http_status.HTTP_303_SEE_OTHER)
 
 
+@router.post("/bulk")
+async def bulk_incident_action(
+    request: Request,
+    action: str = Form(...),
+    incident_ids: list[int] = Form(...),
+    owner_id: Optional[str] = Form(None),
+    status: Optional[str] = Form(None),
+    severity: Optional[str] = Form(None),
+    user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+):
+    """Aplicar una acción a los incidentes seleccionados en la lista (una sentencia por acción)"""
+    repo = get_incident_repository(session)
+
+    try:
+        if action == "assign":
+            repo.bulk_update(incident_ids, {"owner_id": parse_owner_id(owner_id)})
+        elif action == "status" and status:
+            repo.bulk_update(incident_ids, {"status": status})
+        elif action == "severity" and severity:
+            repo.bulk_update(incident_ids, {"severity": severity})
+        elif action == "delete":
+            repo.bulk_delete(incident_ids)
+        else:
+            raise ValueError("Acción no válida")
+    except ValueError as exc:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    # Volver a la lista con los mismos filtros y página
+    from urllib.parse import urlparse
+    query = urlparse(request.headers.get('referer', '')).query
+    return RedirectResponse(url=f"/incidents?{query}" if query else "/incidents", status_code=http_status.HTTP_303_SEE_OTHER)
+
+
 @router.get("/export/csv")
 async def export_incidents_csv(
     severity: Optional[str] = None,
     status: Optional[str] = None,
     source: Optional[str] = None,
     owner: Optional[str] = None,
+    search: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
     user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
-    """Exportar incidentes a CSV"""
-    repo = get_incident_repository(session)
-    
-    incidents = repo.get_all(
+    """Exportar incidentes a CSV (en streaming, por lotes)"""
+    filters = dict(
         severity=severity,
         status=status,
         source=source,
-        owner=owner,
+        **resolve_owner_filter(session, owner),
+        search=search,
+        since=parse_datetime_param(since),
+        until=parse_datetime_param(until),
     )
-    
-    # Crear CSV en memoria
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Escribir encabezados
-    writer.writerow([
-        "ID",
-        "Código",
-        "Título",
-        "Severidad",
-        "Estado",
-        "Origen",
-        "Responsable",
-        "Fecha detección",
-        "Última actualización",
-        "Descripción",
-    ])
-    
-    # Escribir datos
-    for inc in incidents:
+
+    def generate():
+        output = io.StringIO()
+        writer = csv.writer(output)
+        
+        # Escribir encabezados
         writer.writerow([
-            inc.id,
-            inc.code,
-            inc.title,
-            inc.severity,
-            inc.status,
-            inc.source,
-            inc.owner or "",
-            inc.detected_at.strftime("%Y-%m-%d %H:%M:%S") if inc.detected_at else "",
-            inc.updated_at.strftime("%Y-%m-%d %H:%M:%S") if inc.updated_at else "",
-            inc.description or "",
+            "ID",
+            "Código",
+            "Título",
+            "Severidad",
+            "Estado",
+            "Origen",
+            "Responsable",
+            "Fecha detección",
+            "Última actualización",
+            "Descripción",
         ])
+        
+        # La respuesta se envía después de cerrar las dependencias de la petición
+        with Session(engine) as export_session:
+            repo = get_incident_repository(export_session)
+            for count, inc in enumerate(repo.iter_export_rows(**filters, batch_size=EXPORT_BATCH_SIZE), 1):
+                writer.writerow([
+                    inc.id,
+                    inc.code,
+                    inc.title,
+                    inc.severity,
+                    inc.status,
+                    inc.source,
+                    inc.owner or "",
+                    inc.detected_at.strftime("%Y-%m-%d %H:%M:%S") if inc.detected_at else "",
+                    inc.updated_at.strftime("%Y-%m-%d %H:%M:%S") if inc.updated_at else "",
+                    inc.description or "",
+                ])
+                if count % EXPORT_BATCH_SIZE == 0:
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate()
+        yield output.getvalue()
     
-    # Preparar respuesta
-    output.seek(0)
     timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
     filename = f"cyberwatch_incidents_{timestamp}.csv"
     
     return StreamingResponse(
-        iter([output.getvalue()]),
+        generate(),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
@@ -412,26 +602,22 @@ async def export_incidents_csv(
 @router.post("/{incident_id}/assign")
 async def assign_incident(
     incident_id: int,
-    owner: str = Form(...),
+    owner_id: Optional[str] = Form(None),
     user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ):
     """Asignar o cambiar el responsable de un incidente"""
     repo = get_incident_repository(session)
-    incident = repo.get_by_id(incident_id)
-    
-    if not incident:
+    if not repo.update(incident_id, {"owner_id": parse_owner_id(owner_id)}):
         raise HTTPException(status_code=404, detail="Incidente no encontrado")
     
-    incident.owner = owner
-    incident.updated_at = datetime.now(timezone.utc)
-    repo.update(incident)
-    
     return RedirectResponse(url="/incidents", status_code=303)
 
 
 @router.post("/{incident_id}/upload-attachment")
+@limiter.limit(FILE_UPLOAD_RATE_LIMIT)
 async def upload_attachment(
+    request: Request,
     incident_id: int,
     attachment: UploadFile = File(...),
     user: User = Depends(get_current_user),
@@ -441,8 +627,8 @@ async def upload_attachment(
     repo = get_incident_repository(session)
     attachment_repo = IncidentAttachmentRepository(session)
     
-    # Verificar que el incidente existe
-    incident = repo.get_by_id(incident_id)
+    # Verificar que el incidente existe (y no está archivado)
+    incident = repo.get_by_id(incident_id, archived=False)
     if not incident:
         raise HTTPException(status_code=404, detail="Incidente no encontrado")
     
@@ -453,6 +639,8 @@ async def upload_attachment(
     # Leer el contenido del archivo
     try:
         content = await attachment.read()
+        upload_bytes.inc(amount=len(content))
+        attachment_size.observe(len(content))
         text_content = content.decode('utf-8')
     except UnicodeDecodeError:
         raise HTTPException(status_code=400, detail="El archivo no es un archivo de texto válido")
@@ -489,13 +677,8 @@ async def delete_attachment(
     filename = attachment.filename
     attachment_repo.delete(attachment_id)
     
-    # Actualizar timestamp del incidente
-    repo = get_incident_repository(session)
-    incident = repo.get_by_id(incident_id)
-    if incident:
-        incident.updated_at = datetime.now(timezone.utc)
-        session.add(incident)
-        session.commit()
+    # Actualizar timestamp del incidente (a través del repositorio: invalida cachés y notifica)
+    get_incident_repository(session).update(incident_id, {})
     
     return RedirectResponse(
         url=f"/incidents/{incident_id}/edit",
@@ -1,24 +1,23 @@
 from fastapi import APIRouter, Request, Form, Depends, HTTPException
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from app.backend.dependencies.auth import get_current_user
+from app.backend.dependencies.auth import require_admin
 from app.backend.repositories.user_repository import UserRepository
 from app.backend.repositories.incident_repository import IncidentRepository
 from app.backend.database import get_session
 from sqlmodel import Session
 from app.backend.models.user import User
-from passlib.context import CryptContext
-from app.backend.core.constants import BCRYPT_MAX_PASSWORD_LENGTH
+from app.backend.core.cache import invalidate_user
+from app.backend.core.security import password_hasher, PasswordHasherBusy
+from app.backend.core.templates import templates
 
 router = APIRouter(prefix="/users", tags=["users"])
-templates = Jinja2Templates(directory="app/frontend/templates")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def require_admin(user: User = Depends(get_current_user)):
-    """Dependencia que requiere que el usuario sea administrador"""
-    if user.role != "admin":
-        raise HTTPException(status_code=403, detail="Acceso denegado: solo administradores")
-    return user
+async def hash_password_or_503(password: str) -> str:
+    """Hashear en el pool de bcrypt; si está saturado se responde 503"""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Servidor ocupado, inténtalo de nuevo en unos segundos")
 
 @router.get("")
 async def list_users(
@@ -74,13 +73,8 @@ async def create_user(
             "error": "El email ya está registrado"
         })
     
-    # Truncar password a 72 bytes (limitación de bcrypt)
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > BCRYPT_MAX_PASSWORD_LENGTH:
-        password = password_bytes[:BCRYPT_MAX_PASSWORD_LENGTH].decode('utf-8', errors='ignore')
-    
-    # Hashear password
-    hashed_password = pwd_context.hash(password)
+    # Hashear password (truncado a 72 bytes por limitación de bcrypt)
+    hashed_password = await hash_password_or_503(password)
     
     # Crear usuario
     new_user = User(
@@ -92,6 +86,7 @@ async def create_user(
     )
     
     user_repo.create(new_user)
+    invalidate_user(email=new_user.email)
     return RedirectResponse(url="/users", status_code=303)
 
 @router.get("/{user_id}/edit")
@@ -134,7 +129,11 @@ async def update_user(
     if not edit_user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
+    # Invalidar la identidad cacheada con el email anterior (puede cambiar)
+    invalidate_user(email=edit_user.email, user_id=user_id)
+    
     # Actualizar datos
+    renamed = edit_user.full_name != full_name
     edit_user.email = email
     edit_user.full_name = full_name
     edit_user.role = role
@@ -142,13 +141,13 @@ async def update_user(
     
     # Solo actualizar password si se proporciona uno nuevo
     if password and password.strip():
-        # Truncar password a 72 bytes (limitación de bcrypt)
-        password_bytes = password.encode('utf-8')
-        if len(password_bytes) > BCRYPT_MAX_PASSWORD_LENGTH:
-            password = password_bytes[:BCRYPT_MAX_PASSWORD_LENGTH].decode('utf-8', errors='ignore')
-        edit_user.password = pwd_context.hash(password)
+        # Truncado a 72 bytes (limitación de bcrypt) dentro del hasher
+        edit_user.password = await hash_password_or_503(password)
     
     user_repo.update(edit_user)
+    if renamed:
+        # Los incidentes se enlazan por id: solo cambia el nombre mostrado
+        IncidentRepository(session).rename_owner(user_id, full_name)
     return RedirectResponse(url="/users", status_code=303)
 
 @router.post("/{user_id}/delete")
@@ -170,16 +169,12 @@ async def delete_user(
     if not user_to_delete:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    # Liberar incidentes abiertos/activos (owner = None)
-    # Los incidentes cerrados mantienen el nombre del owner para filtros históricos
-    open_statuses = ["Abierto", "En Investigación", "En Progreso", "Pendiente"]
-    all_incidents = incident_repo.get_all()
-    
-    for incident in all_incidents:
-        if incident.owner == user_to_delete.full_name and incident.status in open_statuses:
-            incident_repo.update(incident.id, {"owner": None})
+    # Liberar incidentes activos (owner_id = None) en una sola sentencia
+    # Los cerrados mantienen el nombre como registro histórico, sin el id
+    incident_repo.release_owner(user_id)
     
     # Eliminar el usuario
+    invalidate_user(email=user_to_delete.email, user_id=user_id)
     success = user_repo.delete(user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Error al eliminar usuario")
@@ -1,16 +1,32 @@
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-
-from app.backend.database import init_db
-from app.backend.routers import auth_router, dashboard_router, incidents_router, users_router
-
-# Configurar rate limiter
-limiter = Limiter(key_func=get_remote_address)
+from sqlmodel import Session
+
+from app.backend.database import engine, init_db
+from app.backend.repositories.incident_event_repository import IncidentEventRepository
+from app.backend.repositories.incident_code_repository import IncidentCodeRepository
+from app.backend.repositories.incident_archive_repository import IncidentArchiveRepository
+from app.backend.repositories.incident_repository import IncidentRepository
+from app.backend.repositories.detection_slot_repository import DetectionSlotRepository
+from app.backend.core.cache import ALL_CACHES, user_cache, facet_cache, dashboard_cache
+from app.backend.core.security import password_hasher
+from app.backend.core.constants import (
+    CODE_MIGRATION_BATCH_SIZE,
+    EVENT_CODE_MIGRATION_BATCH_SIZE,
+    OWNER_MIGRATION_BATCH_SIZE,
+)
+from app.backend.core.rate_limit import limiter
+from app.backend.core.templates import templates, precompile_templates
+from app.backend.core.static_assets import create_static_app
+from app.backend.core.compression import CompressionMiddleware
+from app.backend.core import metrics, query_stats, profiler, memory
+from app.backend.routers import auth_router, dashboard_router, incidents_router, users_router, api_router, diagnostics_router
+from app.backend.routers.dashboard import dashboard_broker, sla_monitor
+from app.backend.core.scheduler import scheduler, SCHEDULER_ENABLED
+from app.backend.core.change_log import change_log, CHANGE_LOG_ENABLED
+from app.backend import jobs  # noqa: F401  (registra las tareas en el planificador)
 
 app = FastAPI(
     title="CyberWatch API",
@@ -46,23 +62,85 @@ app = FastAPI(
     debug=True
 )
 
-# Configurar limiter en la app
+# Configurar limiter en la app (almacenamiento compartido entre workers)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-app.mount("/static", StaticFiles(directory="app/frontend/static"), name="static")
+app.add_middleware(CompressionMiddleware)
+# Consultas SQL por petición (Server-Timing y log); por fuera de la compresión para medirla también
+query_stats.install()
+app.add_middleware(query_stats.QueryStatsMiddleware)
+# Perfilado por muestreo a demanda (cabecera X-CyberWatch-Profile de un admin) o de una fracción de peticiones
+app.add_middleware(profiler.ProfilerMiddleware)
+# Pico de memoria de una fracción de las peticiones (solo con tracemalloc activado)
+app.add_middleware(memory.MemoryMiddleware)
+# Recuento, latencia y peticiones en curso por ruta (/metrics)
+app.add_middleware(metrics.MetricsMiddleware)
 
-templates = Jinja2Templates(directory="app/frontend/templates")
+# Recursos con huella y precomprimidos si se ha ejecutado build_static.py
+app.mount("/static", create_static_app(), name="static")
 
 
 @app.on_event("startup")
 def startup():
+    # Antes que nada: las asignaciones del arranque (plantillas, cachés) quedan trazadas
+    if memory.TRACEMALLOC_ENABLED:
+        memory.tracker.start()
     init_db()
+    # Bases anteriores: ids monótonos para que un id archivado no se reasigne
+    with Session(engine) as session:
+        IncidentArchiveRepository(session).reserve_ids()
+    with Session(engine) as session:
+        # Tablas de consulta y códigos de severidad/estado (antes que nada que filtre por ellos)
+        codes = IncidentCodeRepository(session)
+        codes.sync()
+        codes.backfill(CODE_MIGRATION_BATCH_SIZE)
+        # Códigos en el historial anterior (las fechas de cierre se filtran por ellos)
+        IncidentEventRepository(session).backfill_codes(EVENT_CODE_MIGRATION_BATCH_SIZE)
+    # Responsables por id en bases anteriores (antes de servir filtros y facetas por owner_id)
+    with Session(engine) as session:
+        IncidentRepository(session).backfill_owner_ids(OWNER_MIGRATION_BATCH_SIZE)
+    # Historial base para incidentes sin eventos (datos previos o insertados fuera del repositorio)
+    with Session(engine) as session:
+        IncidentEventRepository(session).backfill()
+    # Agregado de detecciones de las tendencias (bases anteriores o incidentes insertados fuera del repositorio)
+    with Session(engine) as session:
+        DetectionSlotRepository(session).sync()
+    # Evita que la primera visita a cada página tras un despliegue pague la compilación
+    precompile_templates()
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Único recorrido de los incidentes abiertos: después el montículo se mantiene con los eventos
+    with Session(engine) as session:
+        open_incidents = IncidentEventRepository(session).get_open_since(sla_monitor.status)
+    sla_monitor.start(open_incidents)
+    # Cambios atendidos por otros workers: llegan al dashboard en vivo y al monitor de SLA de este
+    if CHANGE_LOG_ENABLED:
+        change_log.start()
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    # Cerrar los streams abiertos para no bloquear el apagado ordenado
+    dashboard_broker.close_all()
+    sla_monitor.stop()
+    change_log.stop()
+    scheduler.stop()
+    password_hasher.shutdown()
+    # Los contadores de este worker siguen sumando en /metrics tras su salida
+    metrics.registry.flush()
 
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Manejador personalizado para errores HTTP"""
+    # La API y los diagnósticos responden siempre en JSON (sin redirecciones a /login)
+    if request.url.path.startswith(("/api/", "/admin/diagnostics/")):
+        return JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
     if exc.status_code == 401:
         return RedirectResponse(url="/login?error=session_expired", status_code=303)
     return templates.TemplateResponse(
@@ -74,7 +152,41 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "caches": {
+            "users": user_cache.stats(),
+            "facets": facet_cache.stats(),
+            "dashboard": dashboard_cache.stats(),
+        },
+        "password_hasher": password_hasher.stats(),
+        "dashboard_stream": dashboard_broker.stats(),
+        "sla_monitor": sla_monitor.stats(),
+        # El detalle de las tareas (resultados, errores) está en /api/v1/admin/jobs
+        "jobs": {"enabled": SCHEDULER_ENABLED, **scheduler.summary()},
+    }
+
+
+@metrics.registry.register_collector
+def collect_component_metrics():
+    """Copiar en las métricas el estado de cachés, pool de conexiones y colas de este worker"""
+    for cache in ALL_CACHES:
+        stats = cache.stats()
+        metrics.cache_requests.set_total(stats["hits"], cache.name, "hit")
+        metrics.cache_requests.set_total(stats["misses"], cache.name, "miss")
+        metrics.cache_entries.set(stats["size"], cache.name)
+    metrics.observe_pool(engine.pool)
+    metrics.queue_depth.set(password_hasher.pending, "password_hash")
+    metrics.queue_depth.set(dashboard_broker.queued, "dashboard_events")
+    resident = memory.resident_bytes()
+    if resident is not None:
+        metrics.resident_memory.set(resident)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Métricas en formato de texto de Prometheus (suma de todos los workers del host)"""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -85,4 +197,6 @@ async def root(request: Request):
 app.include_router(auth_router)
 app.include_router(dashboard_router)
 app.include_router(incidents_router)
-app.include_router(users_router)
\ No newline at end of file
+app.include_router(users_router)
+app.include_router(api_router)
+app.include_router(diagnostics_router)
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Benchmark de la analítica de tiempos de resolución (NumPy).
+
+Sobre una base de datos con N incidentes cerrados mide por separado:
+  - la carga de la muestra (una consulta -> arrays NumPy),
+  - el cálculo del informe completo (global + por severidad, origen y
+    responsable: media, p50/p90/p99, histograma y SLA), que debe quedar
+    por debajo del presupuesto indicado (100 ms por defecto con 1M),
+  - como referencia, el mismo cálculo con bucles Python y `statistics`.
+
+Uso:
+    python -m benchmarks.bench_analytics --incidents 1000000 --repeat 20
+"""
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_temp_database, summarize
+
+DB_PATH = use_temp_database()
+
+from sqlmodel import Session  # noqa: E402
+
+from app.backend.database import engine, init_db  # noqa: E402
+from app.backend.core.analytics import ResolutionSample, resolution_report  # noqa: E402
+from app.backend.repositories.incident_repository import IncidentRepository  # noqa: E402
+from app.backend.core.incident_codes import STATUS_CLOSED, severity_code  # noqa: E402
+
+SEVERITIES = ["Crítico", "Alto", "Medio", "Bajo"]
+SOURCES = ["EDR", "Firewall", "SIEM", "Correo", "Usuario", "IDS", "Scanner", "SSO"]
+OWNERS = [None] + [f"Analista {i:02d}" for i in range(40)]
+
+
+def seed_incidents(count: int) -> None:
+    init_db()
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    conn = sqlite3.connect(DB_PATH)
+
+    def rows():
+        for i in range(count):
+            detected = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+            resolution = timedelta(seconds=int(rng.lognormvariate(10, 1.4)))
+            severity = rng.choice(SEVERITIES)
+            yield (
+                f"INC-BENCH-{i:07d}",
+                "Incidente de prueba",
+                severity,
+                severity_code(severity),
+                "Cerrado",
+                STATUS_CLOSED,
+                rng.choice(SOURCES),
+                rng.choice(OWNERS),
+                detected.isoformat(sep=" "),
+                (detected + resolution).isoformat(sep=" "),
+            )
+
+    conn.executemany(
+        "INSERT INTO incident (code, title, severity, severity_code, status, status_code, source, owner, "
+        "detected_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows(),
+    )
+    conn.commit()
+    conn.close()
+
+
+def python_report(sample: ResolutionSample) -> dict:
+    """Referencia: agrupación y percentiles con bucles Python"""
+    seconds = sample.seconds.tolist()
+    report = {}
+    for name, dimension in sample.dimensions.items():
+        groups: dict = {}
+        for value, code in zip(seconds, dimension.codes.tolist()):
+            groups.setdefault(code, []).append(value)
+        report[name] = {
+            dimension.labels[code]: (statistics.fmean(values), statistics.quantiles(values, n=100)[49::40])
+            for code, values in groups.items()
+            if len(values) > 1
+        }
+    return report
+
+
+def measure(fn, repeat: int) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de analítica de tiempos de resolución")
+    parser.add_argument("--incidents", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--skip-python", action="store_true", help="No medir la referencia en Python puro")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    seed_incidents(args.incidents)
+    seed_seconds = time.perf_counter() - start
+
+    with Session(engine) as session:
+        repo = IncidentRepository(session)
+        start = time.perf_counter()
+        sample = repo.get_resolution_sample()
+        load_seconds = time.perf_counter() - start
+
+    compute = measure(lambda: resolution_report(sample), args.repeat)
+    results = {
+        "incidents": sample.size,
+        "seed_s": round(seed_seconds, 2),
+        "load_sample_ms": round(load_seconds * 1000, 1),
+        "numpy_report": compute,
+        "budget_ms": args.budget_ms,
+        "within_budget": compute["p50_ms"] <= args.budget_ms,
+    }
+    if not args.skip_python:
+        results["python_report"] = measure(lambda: python_report(sample), 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Benchmark de extremo a extremo con umbrales de regresión.
+
+Genera un conjunto de datos con generate_dataset.py (o copia uno ya generado
+con `--dataset`), arranca la aplicación en proceso con sus eventos de inicio y
+lanza cada escenario con `--concurrency` clientes simultáneos: login,
+dashboard, lista con filtros, búsqueda, paginación profunda, detalle y
+timeline de incidentes con adjuntos grandes, exportación CSV y subida de
+adjuntos. Por escenario se mide throughput y latencia p50/p95/p99; el
+resultado se escribe en JSON.
+
+Con `--baseline` se comparan los resultados con una ejecución anterior y el
+proceso termina con código 1 si algún escenario empeora más que `--threshold`
+(p95 o throughput). `--results` compara un JSON existente sin volver a medir.
+
+Uso:
+    python -m benchmarks.bench_e2e --incidents 200000 --concurrency 8 --output base.json
+    python -m benchmarks.bench_e2e --dataset load.db --baseline base.json --threshold 0.2
+    python -m benchmarks.bench_e2e --results new.json --baseline base.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple
+
+from benchmarks.common import use_temp_database, summarize
+
+DB_PATH = use_temp_database()
+
+import httpx  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.backend.database import engine, init_db  # noqa: E402
+from app.backend.models import User  # noqa: E402
+from app.backend.core.security import pwd_context  # noqa: E402
+from generate_dataset import generate, load_samples, attachment_body  # noqa: E402
+
+ADMIN_EMAIL = "admin@bench.local"
+PASSWORD = "bench-password"
+
+
+class Scenario(NamedTuple):
+    name: str
+    request: Callable[[httpx.AsyncClient, int], object]  # (cliente, nº de petición) -> corrutina
+    expected: int  # Código HTTP esperado
+    share: float = 1.0  # Fracción de --requests (escenarios pesados)
+
+
+class Dataset(NamedTuple):
+    incidents: int
+    owner_id: int
+    attachment_ids: list[int]  # Incidentes con adjunto
+    last_page: int
+
+
+def prepare_dataset(args) -> Dataset:
+    """Generar (o copiar) el conjunto de datos y crear el administrador del benchmark"""
+    if args.dataset:
+        shutil.copyfile(args.dataset, DB_PATH)
+        init_db()
+    else:
+        generate(
+            args.incidents,
+            analysts=args.analysts,
+            attachments=args.attachments,
+            attachment_blocks=args.attachment_blocks,
+            seed=args.seed,
+            end=datetime(2026, 1, 1),  # Fijo: mismos datos en todas las ejecuciones
+        )
+    with Session(engine) as session:
+        session.add(User(email=ADMIN_EMAIL, password=pwd_context.hash(PASSWORD), full_name="Admin Bench", role="admin"))
+        session.commit()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        incidents = conn.execute("SELECT count(*) FROM incident").fetchone()[0]
+        # Responsable con más incidentes: el filtro más caro de la lista
+        owner_id = conn.execute(
+            "SELECT owner_id FROM incident WHERE owner_id IS NOT NULL GROUP BY owner_id ORDER BY count(*) DESC LIMIT 1"
+        ).fetchone()
+        attachment_ids = [row[0] for row in conn.execute(
+            "SELECT incident_id FROM incidentattachment GROUP BY incident_id ORDER BY sum(length(content)) DESC LIMIT 50"
+        )]
+    finally:
+        conn.close()
+    if not attachment_ids:
+        raise SystemExit("El conjunto de datos no tiene adjuntos (usa --attachments > 0)")
+    return Dataset(incidents, owner_id[0] if owner_id else 0, attachment_ids, max(1, incidents // 100))
+
+
+def build_scenarios(dataset: Dataset, upload_kb: int) -> list[Scenario]:
+    ids = dataset.attachment_ids
+    samples = load_samples()
+    sample = next(iter(samples.values()))
+    upload = attachment_body(sample, datetime(2026, 1, 1), 1, 30)
+    upload = (upload * (upload_kb * 1024 // len(upload) + 1))[: upload_kb * 1024].encode()
+
+    return [
+        Scenario("login", lambda c, i: c.post("/login", data={"email": ADMIN_EMAIL, "password": PASSWORD}), 302),
+        Scenario("dashboard", lambda c, i: c.get("/dashboard"), 200),
+        Scenario("incidents_list", lambda c, i: c.get("/incidents"), 200),
+        Scenario("incidents_filtered", lambda c, i: c.get("/incidents", params={
+            "status": "__active__", "severity": "Crítico", "owner": str(dataset.owner_id), "per_page": 100,
+        }), 200),
+        Scenario("incidents_search", lambda c, i: c.get("/incidents", params={"search": "ransomware"}), 200),
+        Scenario("incidents_deep_page", lambda c, i: c.get("/incidents", params={
+            "page": dataset.last_page - i % 10, "per_page": 100,
+        }), 200),
+        Scenario("incident_detail", lambda c, i: c.get(f"/incidents/{ids[i % len(ids)]}"), 200),
+        Scenario("incident_timeline", lambda c, i: c.get(f"/incidents/{ids[i % len(ids)]}/timeline"), 200),
+        Scenario("export_csv", export_csv, 200, share=0.1),
+        Scenario("upload_attachment", lambda c, i: c.post(
+            f"/incidents/{ids[i % len(ids)]}/upload-attachment",
+            files={"attachment": ("bench.txt", upload, "text/plain")},
+        ), 303),
+    ]
+
+
+async def export_csv(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    """Exportación de los incidentes activos de severidad alta, leyendo todo el stream"""
+    async with client.stream("GET", "/incidents/export/csv", params={"status": "__active__", "severity": "Alto"}) as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return response
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int, warmup: int) -> dict:
+    """`requests` peticiones repartidas entre `concurrency` clientes (tras `warmup` sin medir)"""
+    for i in range(warmup):
+        await scenario.request(client, i)
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    pending = iter(range(requests))
+
+    async def worker():
+        for i in pending:
+            start = time.perf_counter()
+            response = await scenario.request(client, i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != scenario.expected:
+                errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        **summarize(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "errors": errors,
+    }
+
+
+async def main_async(args, scenarios: list[Scenario]) -> dict:
+    results = {}
+    # Eventos de inicio de la aplicación (migraciones, plantillas, monitor de SLA)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await client.post("/login", data={"email": ADMIN_EMAIL, "password": PASSWORD})
+            for scenario in scenarios:
+                requests = max(1, int(args.requests * scenario.share))
+                results[scenario.name] = await run_scenario(client, scenario, requests, args.concurrency, args.warmup)
+                print(f"   {scenario.name:<22} p95 {results[scenario.name]['p95_ms']:>9} ms"
+                      f"  {results[scenario.name]['throughput_rps']:>8} req/s", file=sys.stderr)
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """
+    Regresiones de `current` frente a `baseline`.
+
+    Un escenario empeora si su p95 crece más de `threshold` (y más de
+    `min_delta_ms`, para no fallar por ruido en peticiones de pocos ms) o si
+    su throughput cae más de `threshold`.
+    """
+    regressions = []
+    for name, before in baseline["scenarios"].items():
+        after = current["scenarios"].get(name)
+        if after is None:
+            continue
+        if after["p95_ms"] > before["p95_ms"] * (1 + threshold) and after["p95_ms"] - before["p95_ms"] > min_delta_ms:
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {after['p95_ms']} ms")
+        if after["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {after['throughput_rps']} req/s")
+        if after["errors"] and not before["errors"]:
+            regressions.append(f"{name}: errores {after['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo")
+    parser.add_argument("--incidents", type=int, default=200_000, help="Incidentes a generar")
+    parser.add_argument("--analysts", type=int, default=200)
+    parser.add_argument("--attachments", type=float, default=0.01, help="Fracción de incidentes con adjunto")
+    parser.add_argument("--attachment-blocks", type=int, default=200, help="Alertas por adjunto (tamaño)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dataset", help="Base de datos ya generada (se copia; no se modifica)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultáneos")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones medidas por escenario")
+    parser.add_argument("--warmup", type=int, default=3, help="Peticiones previas sin medir por escenario")
+    parser.add_argument("--upload-kb", type=int, default=256, help="Tamaño de cada adjunto subido")
+    parser.add_argument("--scenarios", help="Escenarios a ejecutar, separados por comas (por defecto, todos)")
+    parser.add_argument("--output", help="Fichero JSON de resultados")
+    parser.add_argument("--results", help="Comparar este JSON existente en lugar de medir")
+    parser.add_argument("--baseline", help="JSON de referencia con el que comparar")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Empeoramiento relativo tolerado")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Empeoramiento absoluto mínimo del p95")
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results, encoding="utf-8") as f:
+            result = json.load(f)
+    else:
+        # Los límites por IP bloquearían el benchmark (todas las peticiones vienen del mismo cliente)
+        app.state.limiter.enabled = False
+        dataset = prepare_dataset(args)
+        scenarios = build_scenarios(dataset, args.upload_kb)
+        if args.scenarios:
+            selected = set(args.scenarios.split(","))
+            unknown = selected - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise SystemExit(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+            scenarios = [scenario for scenario in scenarios if scenario.name in selected]
+        result = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "incidents": dataset.incidents,
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "seed": args.seed,
+            },
+            "scenarios": asyncio.run(main_async(args, scenarios)),
+        }
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+        print(json.dumps(result, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold, args.min_delta_ms)
+        for regression in regressions:
+            print(f"❌ {regression}", file=sys.stderr)
+        if regressions:
+            raise SystemExit(1)
+        print(f"✅ Sin regresiones frente a {args.baseline} (umbral {args.threshold:.0%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark de proyecciones ligeras frente a filas ORM completas.
+
+Compara, sobre una base de datos con N incidentes de descripción larga:
+  - una página de la lista (100 filas): `get_all` (objetos Incident) frente a
+    `get_rows` (IncidentRow, solo columnas mostradas),
+  - la exportación CSV completa: la implementación anterior (todas las filas
+    ORM + CSV en memoria) frente a la exportación por lotes en streaming.
+
+Se mide la latencia sin instrumentar y, por separado, el pico de memoria con
+tracemalloc.
+
+Uso:
+    python -m benchmarks.bench_list_projection --incidents 100000 --page-size 100
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import random
+import sqlite3
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_temp_database, summarize
+
+DB_PATH = use_temp_database()
+
+from sqlmodel import Session  # noqa: E402
+
+from app.backend.database import engine, init_db  # noqa: E402
+from app.backend.models import User  # noqa: E402
+from app.backend.repositories.incident_repository import IncidentRepository  # noqa: E402
+from app.backend.routers.incidents import export_incidents_csv  # noqa: E402
+from app.backend.core.incident_codes import severity_code, status_code  # noqa: E402
+
+SEVERITIES = ["Crítico", "Alto", "Medio", "Bajo"]
+STATUSES = ["Abierto", "En investigación", "Mitigado", "Cerrado"]
+SOURCES = ["EDR", "Firewall", "SIEM", "Correo", "Usuario", "IDS"]
+OWNERS = [None, "Ana Pérez", "Luis Gómez", "Marta Ruiz"]
+
+
+def seed_incidents(count: int, description_chars: int) -> None:
+    init_db()
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    words = "acceso sospechoso host usuario alerta proceso conexión bloqueada regla firma".split()
+    conn = sqlite3.connect(DB_PATH)
+
+    def rows():
+        for i in range(count):
+            detected = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            description = " ".join(rng.choices(words, k=description_chars // 8))[:description_chars]
+            severity, status = rng.choice(SEVERITIES), rng.choice(STATUSES)
+            yield (
+                f"INC-BENCH-{i:07d}",
+                f"Actividad sospechosa en WKS-{rng.randint(1, 999):03d}",
+                severity,
+                severity_code(severity),
+                status,
+                status_code(status),
+                rng.choice(SOURCES),
+                rng.choice(OWNERS),
+                detected.isoformat(sep=" "),
+                (detected + timedelta(hours=rng.randint(0, 72))).isoformat(sep=" "),
+                description,
+            )
+
+    conn.executemany(
+        "INSERT INTO incident (code, title, severity, severity_code, status, status_code, source, owner, "
+        "detected_at, updated_at, description) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows(),
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_export(session: Session) -> str:
+    """Exportación previa: todas las filas ORM y el CSV completo en memoria"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for inc in IncidentRepository(session).get_all():
+        writer.writerow([
+            inc.id, inc.code, inc.title, inc.severity, inc.status, inc.source, inc.owner or "",
+            inc.detected_at.strftime("%Y-%m-%d %H:%M:%S") if inc.detected_at else "",
+            inc.updated_at.strftime("%Y-%m-%d %H:%M:%S") if inc.updated_at else "",
+            inc.description or "",
+        ])
+    return output.getvalue()
+
+
+def streaming_export(user: User) -> int:
+    async def consume() -> int:
+        response = await export_incidents_csv(user=user)
+        size = 0
+        async for chunk in response.body_iterator:
+            size += len(chunk)
+        return size
+
+    return asyncio.run(consume())
+
+
+def measure(fn, repeat: int) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {**summarize(latencies), "peak_kb": round(peak / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de proyecciones de listas")
+    parser.add_argument("--incidents", type=int, default=100_000)
+    parser.add_argument("--description-chars", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50, help="Repeticiones por página")
+    parser.add_argument("--export-repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    seed_incidents(args.incidents, args.description_chars)
+    user = User(id=1, email="admin@bench.local", password="x", full_name="Admin Bench", role="admin")
+    rng = random.Random(7)
+    max_offset = max(args.incidents - args.page_size, 0)
+
+    def page(method: str):
+        def run():
+            with Session(engine) as session:
+                getattr(IncidentRepository(session), method)(limit=args.page_size, offset=rng.randint(0, max_offset))
+        return run
+
+    def full_legacy_export():
+        with Session(engine) as session:
+            legacy_export(session)
+
+    results = {
+        "incidents": args.incidents,
+        "page": {
+            "orm_get_all": measure(page("get_all"), args.repeat),
+            "projection_get_rows": measure(page("get_rows"), args.repeat),
+        },
+        "export": {
+            "legacy_in_memory": measure(full_legacy_export, args.export_repeat),
+            "streaming_projection": measure(lambda: streaming_export(user), args.export_repeat),
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
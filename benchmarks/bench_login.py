@@ -0,0 +1,118 @@
+"""
+Benchmark de inicios de sesión concurrentes.
+
+Lanza N logins simultáneos contra la aplicación en proceso y, en paralelo,
+una sonda que pide /health cada 10 ms. La latencia de la sonda se mide desde
+el instante en que debía lanzarse, de modo que refleja cuánto se bloquea el
+event loop mientras se verifica bcrypt.
+
+Uso:
+    python -m benchmarks.bench_login --users 50 --rounds 2
+    python -m benchmarks.bench_login --inline   # bcrypt en el event loop (referencia)
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import use_temp_database, summarize
+
+DB_PATH = use_temp_database()
+
+import httpx  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.backend.database import engine, init_db  # noqa: E402
+from app.backend.models import User  # noqa: E402
+from app.backend.core.security import pwd_context, password_hasher  # noqa: E402
+
+PASSWORD = "bench-password"
+
+
+def seed_users(count: int) -> list[str]:
+    init_db()
+    hashed = pwd_context.hash(PASSWORD)
+    emails = [f"analyst{i}@bench.local" for i in range(count)]
+    with Session(engine) as session:
+        for i, email in enumerate(emails):
+            session.add(User(email=email, password=hashed, full_name=f"Analyst {i}", role="analyst"))
+        session.commit()
+    return emails
+
+
+def disable_rate_limits():
+    # Los límites por IP bloquearían el benchmark (todas las peticiones vienen del mismo cliente)
+    app.state.limiter.enabled = False
+
+
+def run_inline():
+    async def inline(fn, *args):
+        return fn(*args)
+    password_hasher._run = inline
+
+
+async def login(client: httpx.AsyncClient, email: str) -> float:
+    start = time.perf_counter()
+    response = await client.post("/login", data={"email": email, "password": PASSWORD})
+    elapsed = time.perf_counter() - start
+    if response.status_code != 302:
+        raise RuntimeError(f"Login fallido para {email}: {response.status_code}")
+    return elapsed
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, samples: list[float], interval: float = 0.01):
+    """Latencia de /health medida desde el instante en que debía lanzarse"""
+    loop = asyncio.get_running_loop()
+    due = loop.time()
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, due - loop.time()))
+        await client.get("/health")
+        samples.append(loop.time() - due)
+        due = max(due + interval, loop.time())
+
+
+async def main_async(args) -> dict:
+    emails = seed_users(args.users)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login_latencies: list[float] = []
+        probe_latencies: list[float] = []
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, stop, probe_latencies))
+
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            login_latencies += await asyncio.gather(*(login(client, e) for e in emails))
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await probe_task
+
+    return {
+        "mode": "inline" if args.inline else "pool",
+        "users": args.users,
+        "rounds": args.rounds,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(len(login_latencies) / elapsed, 2),
+        "login": summarize(login_latencies),
+        "health_probe": summarize(probe_latencies),
+        "password_hasher": password_hasher.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de login concurrente")
+    parser.add_argument("--users", type=int, default=50, help="Logins simultáneos por ronda")
+    parser.add_argument("--rounds", type=int, default=1, help="Número de rondas")
+    parser.add_argument("--inline", action="store_true", help="Ejecutar bcrypt en el event loop (referencia)")
+    args = parser.parse_args()
+
+    disable_rate_limits()
+    if args.inline:
+        run_inline()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark del almacenamiento de rate limiting compartido.
+
+1. Coste por hit de la estrategia sliding-window-counter sobre SQLiteWALStorage
+   frente al almacenamiento en memoria de `limits` (referencia por proceso).
+2. Corrección entre procesos: varios procesos consumen la misma clave a la vez
+   y el total de hits aceptados debe coincidir con el límite configurado.
+
+Uso:
+    python -m benchmarks.bench_rate_limit --hits 20000 --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from limits import parse
+from limits.storage import MemoryStorage, storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+import app.backend.core.rate_limit  # noqa: F401  (registra el esquema sqlitewal)
+from benchmarks.common import percentile
+
+
+def measure(storage, hits: int, keys: int) -> dict:
+    strategy = SlidingWindowCounterRateLimiter(storage)
+    item = parse("1000000/minute")
+    latencies = []
+    for i in range(hits):
+        start = time.perf_counter()
+        strategy.hit(item, f"10.0.{i % keys // 256}.{i % 256}")
+        latencies.append(time.perf_counter() - start)
+    return {
+        "hits": hits,
+        "mean_us": round(statistics.fmean(latencies) * 1e6, 1),
+        "p50_us": round(percentile(latencies, 50) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 99) * 1e6, 1),
+        "max_us": round(max(latencies) * 1e6, 1),
+    }
+
+
+def contend(uri: str, attempts: int, limit: int, queue) -> None:
+    strategy = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    item = parse(f"{limit}/hour")
+    accepted = sum(1 for _ in range(attempts) if strategy.hit(item, "shared-client"))
+    queue.put(accepted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del rate limiting compartido")
+    parser.add_argument("--hits", type=int, default=20000, help="Hits por medición")
+    parser.add_argument("--keys", type=int, default=1000, help="Clientes (IPs) distintos")
+    parser.add_argument("--processes", type=int, default=4, help="Procesos en la prueba de contención")
+    parser.add_argument("--limit", type=int, default=500, help="Límite compartido en la prueba de contención")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="cyberwatch_ratelimit_")
+    uri = f"sqlitewal:///{os.path.join(directory, 'ratelimit.db')}"
+
+    results = {
+        "memory": measure(MemoryStorage(), args.hits, args.keys),
+        "sqlitewal": measure(storage_from_string(uri), args.hits, args.keys),
+    }
+
+    queue = multiprocessing.Queue()
+    attempts = args.limit  # cada proceso intenta consumir el límite completo
+    workers = [
+        multiprocessing.Process(target=contend, args=(uri, attempts, args.limit, queue))
+        for _ in range(args.processes)
+    ]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    accepted = sum(queue.get() for _ in workers)
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    results["contention"] = {
+        "processes": args.processes,
+        "attempts": attempts * args.processes,
+        "limit": args.limit,
+        "accepted": accepted,
+        "elapsed_s": round(elapsed, 3),
+        "ok": accepted == args.limit,
+    }
+    shutil.rmtree(directory, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+    raise SystemExit(0 if results["contention"]["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Benchmark de plantillas Jinja2.
+
+Mide, para cada plantilla principal:
+  - compilación desde el código fuente (worker recién arrancado sin caché),
+  - carga desde la caché de bytecode persistente,
+  - tiempo de render con un volumen de filas realista.
+
+Uso:
+    python -m benchmarks.bench_templates --rows 100 --repeat 200
+"""
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from starlette.requests import Request
+
+from app.main import app
+from app.backend.core.templates import TEMPLATES_DIR, templates
+from app.backend.core.log_timeline import TimelineEntry
+from app.backend.core.time_buckets import bucket_boundaries, bucket_labels, rollup
+from app.backend.core.incident_codes import severity_code, status_code
+from app.backend.models import Incident, User, IncidentAttachment, IncidentEvent, SLABreach
+from app.backend.routers.dashboard import (
+    DEFAULT_TREND,
+    build_kpis,
+    build_severity_distribution,
+    build_type_data,
+)
+from benchmarks.common import summarize
+
+SEVERITIES = ["Crítico", "Alto", "Medio", "Bajo"]
+STATUSES = ["Abierto", "En investigación", "Asignado", "Mitigado", "Cerrado"]
+SOURCES = ["EDR", "Firewall", "SIEM", "Correo", "Usuario", "IDS"]
+
+
+def make_request() -> Request:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "root_path": "",
+        "scheme": "http",
+        "server": ("bench", 80),
+        "headers": [(b"host", b"bench")],
+        "query_string": b"",
+        "app": app,
+        "router": app.router,
+    }
+    return Request(scope)
+
+
+OWNERS = [(2, "Ana Pérez"), (3, "Luis Gómez"), (4, "Marta Ruiz")]
+
+
+def make_incidents(count: int, rng: random.Random) -> list[Incident]:
+    now = datetime.utcnow()
+    incidents = []
+    for i in range(count):
+        detected = now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+        owner_id, owner = rng.choice([(None, None), *OWNERS])
+        severity, status = rng.choice(SEVERITIES), rng.choice(STATUSES)
+        incidents.append(Incident(
+            id=i + 1,
+            code=f"INC-2025-{i + 1:04d}",
+            title=f"Actividad sospechosa detectada en host WKS-{rng.randint(1, 999):03d}",
+            severity=severity,
+            severity_code=severity_code(severity),
+            status=status,
+            status_code=status_code(status),
+            source=rng.choice(SOURCES),
+            owner_id=owner_id,
+            owner=owner,
+            detected_at=detected,
+            updated_at=detected + timedelta(hours=rng.randint(0, 72)),
+            description="Descripción del incidente " * 40,
+        ))
+    return incidents
+
+
+def make_events(incident: Incident) -> list[IncidentEvent]:
+    """Historial típico: alta, asignación y avance de estado"""
+    ts = incident.detected_at
+    changes = [("status", None, "Abierto"), ("severity", None, incident.severity), ("owner", None, "Ana Pérez"),
+               ("status", "Abierto", "Asignado"), ("status", "Asignado", "En investigación")]
+    return [
+        IncidentEvent(id=idx, incident_id=incident.id, ts=ts + timedelta(minutes=10 * idx),
+                      type=kind, old_value=old, new_value=new)
+        for idx, (kind, old, new) in enumerate(changes)
+    ]
+
+
+def make_breaches(incidents: list[Incident]) -> list[SLABreach]:
+    return [
+        SLABreach(id=i.id, incident_id=i.id, code=i.code, severity=i.severity, opened_at=i.detected_at,
+                  deadline=i.detected_at + timedelta(minutes=15), breached_at=i.detected_at + timedelta(minutes=15))
+        for i in incidents
+    ]
+
+
+def trend_charts(incidents: list[Incident]) -> dict:
+    """Serie de tendencia por defecto calculada en memoria (sin base de datos)"""
+    boundaries = bucket_boundaries(DEFAULT_TREND, datetime.now(timezone.utc))
+    slots = [
+        (int(i.detected_at.replace(tzinfo=timezone.utc).timestamp()), 1, int(i.severity == "Crítico"))
+        for i in incidents
+    ]
+    total, critical = rollup(boundaries, slots)
+    return {
+        "trend_start_ms": boundaries[0] * 1000,
+        "trend_starts_ms": [b * 1000 for b in boundaries],
+        "trend_labels": bucket_labels(DEFAULT_TREND, boundaries),
+        "trend_total": total,
+        "trend_critical": critical,
+    }
+
+
+def build_contexts(rows: int) -> dict:
+    rng = random.Random(42)
+    request = make_request()
+    user = User(id=1, email="admin@bench.local", password="x", full_name="Admin Bench", role="admin")
+    incidents = make_incidents(rows, rng)
+    all_incidents = make_incidents(5000, rng)
+    log = open("edr_detection.txt", encoding="utf-8").read()
+    attachments = [
+        IncidentAttachment(id=i, incident_id=1, filename=f"log_{i}.txt", content=log * 20, uploaded_at=datetime.utcnow())
+        for i in range(3)
+    ]
+    base = {"request": request, "user": user}
+    return {
+        "incidents.html": {
+            **base,
+            "incidents": incidents,
+            "facet_counts": {
+                "severity": {value: rows for value in SEVERITIES},
+                "status": {value: rows for value in STATUSES},
+                "source": {value: rows for value in SOURCES},
+                "owner_id": {None: rows, **{owner_id: rows for owner_id, _ in OWNERS}},
+            },
+            "sources": SOURCES,
+            "owners": OWNERS,
+            "now": datetime.utcnow(),
+            "page": 3,
+            "per_page": rows,
+            "total_incidents": rows * 40,
+            "total_pages": 40,
+            "filters": {"severity": None, "status": None, "source": None, "owner": None, "search": None},
+        },
+        "dashboard.html": {
+            **base,
+            "stats": build_kpis(all_incidents, {i.id: i.updated_at for i in all_incidents}),
+            "recent_incidents": all_incidents[:6],
+            "severity_data": build_severity_distribution(all_incidents),
+            "activity": all_incidents[:5],
+            "charts": {**trend_charts(all_incidents), **build_type_data(all_incidents)},
+            "sla_breaches": make_breaches(all_incidents[:8]),
+        },
+        "incident_detail.html": {
+            **base,
+            "incident": incidents[0],
+            "attachments": attachments,
+            "events": make_events(incidents[0]),
+            "return_params": {"page": 1, "per_page": 25, "severity": None, "status": None,
+                              "source": None, "owner": None, "search": None},
+        },
+        "incident_timeline.html": {
+            **base,
+            "incident": incidents[0],
+            "attachments": [SimpleNamespace(id=a.id, filename=a.filename, uploaded_at=a.uploaded_at) for a in attachments],
+            "source_colors": {a.id: a.id % 4 for a in attachments},
+            "entries": [
+                TimelineEntry(datetime.utcnow(), i % 3, f"log_{i % 3}.txt", i, f"2025-12-09 15:45:{i % 60:02d} linea {i}")
+                for i in range(200)
+            ],
+            "page": 1,
+            "has_next": True,
+            "filters": {"since": "", "until": ""},
+        },
+        "users.html": {
+            **base,
+            "users": [
+                User(id=i, email=f"user{i}@bench.local", password="x", full_name=f"Usuario {i}",
+                     role="analyst", is_active=bool(i % 5))
+                for i in range(50)
+            ],
+        },
+    }
+
+
+def time_compile(names: list[str], cache_dir: str | None) -> float:
+    bytecode_cache = FileSystemBytecodeCache(cache_dir) if cache_dir else None
+    env = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=True, bytecode_cache=bytecode_cache)
+    start = time.perf_counter()
+    for name in names:
+        env.get_template(name)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de render de plantillas")
+    parser.add_argument("--rows", type=int, default=100, help="Filas en la lista de incidentes")
+    parser.add_argument("--repeat", type=int, default=200, help="Renders por plantilla")
+    args = parser.parse_args()
+
+    contexts = build_contexts(args.rows)
+    names = list(contexts)
+
+    cache_dir = tempfile.mkdtemp(prefix="cyberwatch_jinja_")
+    results = {
+        "compile_from_source_ms": round(time_compile(names, None) * 1000, 2),
+    }
+    time_compile(names, cache_dir)  # rellena la caché de bytecode
+    results["load_from_bytecode_cache_ms"] = round(time_compile(names, cache_dir) * 1000, 2)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    renders = {}
+    for name, context in contexts.items():
+        template = templates.get_template(name)
+        template.render(context)
+        latencies = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            html = template.render(context)
+            latencies.append(time.perf_counter() - start)
+        renders[name] = {**summarize(latencies), "html_kb": round(len(html.encode()) / 1024, 1)}
+    results["render"] = renders
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
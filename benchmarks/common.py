@@ -0,0 +1,61 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Cada benchmark trabaja sobre una base de datos SQLite temporal: la variable
+CYBERWATCH_DATABASE_URL debe fijarse antes de importar la aplicación (y con
+ella un directorio de archivo y un almacén de métricas propios). Las tareas en
+segundo plano se desactivan para que no interfieran en las medidas.
+"""
+import atexit
+import math
+import os
+import shutil
+import statistics
+import tempfile
+
+
+def use_temp_database(prefix: str = "cyberwatch_bench_") -> str:
+    """Apuntar la aplicación a una base de datos temporal (llamar antes de importar app)"""
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".db")
+    os.close(fd)
+    os.environ["CYBERWATCH_DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["CYBERWATCH_ARCHIVE_DIR"] = tempfile.mkdtemp(prefix=prefix + "archive_")
+    os.environ["CYBERWATCH_METRICS_DB"] = path[:-len(".db")] + "_metrics.db"
+    os.environ.setdefault("CYBERWATCH_SCHEDULER", "off")
+    # La instrumentación por consulta sesgaría las latencias medidas
+    os.environ.setdefault("CYBERWATCH_QUERY_STATS", "off")
+    # Un solo proceso: no hay otros workers a los que difundir los cambios
+    os.environ.setdefault("CYBERWATCH_CHANGE_LOG", "off")
+    atexit.register(_remove_database, path)
+    atexit.register(_remove_database, os.environ["CYBERWATCH_METRICS_DB"])
+    atexit.register(shutil.rmtree, os.environ["CYBERWATCH_ARCHIVE_DIR"], True)
+    return path
+
+
+def _remove_database(path: str) -> None:
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Percentil por el método nearest-rank (valores en cualquier orden)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: list[float]) -> dict:
+    """Resumen de latencias en milisegundos"""
+    return {
+        "count": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
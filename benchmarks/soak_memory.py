@@ -0,0 +1,137 @@
+"""
+Prueba de resistencia de memoria: dashboard y exportación CSV en bucle.
+
+Sobre el mismo conjunto de datos que bench_e2e.py, ejecuta `--rounds` rondas
+de `--per-round` cargas del dashboard y exportaciones CSV (invalidando las
+cachés antes de cada una para recalcular todo, salvo con `--cached`). Tras
+cada ronda se fuerza una recolección y se anotan la memoria trazada por
+tracemalloc y la residente. Las primeras `--warmup` rondas llenan cachés,
+pools y plantillas y no cuentan.
+
+La memoria debe estabilizarse: se compara la media del último cuarto de las
+rondas medidas con la del primero y el proceso termina con código 1 si la
+trazada crece más de `--max-growth-mb` o la residente más de
+`--max-rss-growth-mb`, mostrando los puntos de asignación que más han crecido.
+
+Uso:
+    python -m benchmarks.soak_memory --incidents 100000 --rounds 40
+    python -m benchmarks.soak_memory --dataset load.db --rounds 100 --output soak.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+import httpx
+import numpy as np
+
+# Primero: apunta la aplicación a una base de datos temporal antes de importarla
+from benchmarks.bench_e2e import ADMIN_EMAIL, PASSWORD, app, prepare_dataset, export_csv
+from app.backend.core.cache import invalidate_incident_caches
+from app.backend.core.memory import tracker, resident_bytes, growth_stats
+
+MB = 1_000_000
+
+
+def quarter_growth(values: list[int]) -> float:
+    """Media del último cuarto menos media del primero"""
+    quarter = max(1, len(values) // 4)
+    return float(np.mean(values[-quarter:]) - np.mean(values[:quarter]))
+
+
+async def soak(args) -> dict:
+    rounds = []
+    baseline = None
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await client.post("/login", data={"email": ADMIN_EMAIL, "password": PASSWORD})
+            for n in range(args.warmup + args.rounds):
+                start = time.perf_counter()
+                for i in range(args.per_round):
+                    if not args.cached:
+                        invalidate_incident_caches()
+                    for response in (await client.get("/dashboard"), await export_csv(client, i)):
+                        if response.status_code != 200:
+                            raise SystemExit(f"{response.request.url.path}: HTTP {response.status_code}")
+                gc.collect()
+                traced, peak = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                if n == args.warmup - 1:
+                    baseline = tracker.take()
+                if n < args.warmup:
+                    continue
+                rounds.append({
+                    "traced_bytes": traced,
+                    "traced_peak_bytes": peak,
+                    "resident_bytes": resident_bytes(),
+                    "seconds": round(time.perf_counter() - start, 3),
+                })
+                print(f"   ronda {len(rounds):>3}  trazada {traced / MB:8.1f} MB  pico {peak / MB:8.1f} MB"
+                      f"  residente {(rounds[-1]['resident_bytes'] or 0) / MB:8.1f} MB", file=sys.stderr)
+    final = tracker.take()
+
+    traced = [r["traced_bytes"] for r in rounds]
+    resident = [r["resident_bytes"] for r in rounds if r["resident_bytes"] is not None]
+    return {
+        "rounds": rounds,
+        "traced_growth_bytes": round(quarter_growth(traced)),
+        "traced_slope_bytes_per_round": round(float(np.polyfit(range(len(traced)), traced, 1)[0])) if len(traced) > 1 else 0,
+        "resident_growth_bytes": round(quarter_growth(resident)) if resident else None,
+        # Desde la instantánea del final del calentamiento (sin calentamiento no hay referencia)
+        "growth_sites": growth_stats(final, baseline, args.top) if baseline is not None else [],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de resistencia de memoria (dashboard y exportación)")
+    parser.add_argument("--incidents", type=int, default=50_000, help="Incidentes a generar")
+    parser.add_argument("--analysts", type=int, default=100)
+    parser.add_argument("--attachments", type=float, default=0.002, help="Fracción de incidentes con adjunto")
+    parser.add_argument("--attachment-blocks", type=int, default=20, help="Alertas por adjunto (tamaño)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dataset", help="Base de datos ya generada (se copia; no se modifica)")
+    parser.add_argument("--rounds", type=int, default=30, help="Rondas medidas")
+    parser.add_argument("--warmup", type=int, default=5, help="Rondas previas sin medir")
+    parser.add_argument("--per-round", type=int, default=3, help="Dashboards y exportaciones por ronda")
+    parser.add_argument("--cached", action="store_true", help="No invalidar las cachés entre peticiones")
+    parser.add_argument("--frames", type=int, default=1, help="Marcos por traza de tracemalloc")
+    parser.add_argument("--top", type=int, default=10, help="Puntos de asignación mostrados")
+    parser.add_argument("--max-growth-mb", type=float, default=2.0, help="Crecimiento tolerado de la memoria trazada")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=25.0, help="Crecimiento tolerado de la memoria residente")
+    parser.add_argument("--output", help="Fichero JSON de resultados")
+    args = parser.parse_args()
+
+    # Los límites por IP bloquearían la prueba (todas las peticiones vienen del mismo cliente)
+    app.state.limiter.enabled = False
+    dataset = prepare_dataset(args)
+    tracker.start(args.frames)
+    result = {"incidents": dataset.incidents, **asyncio.run(soak(args))}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    print(f"Memoria trazada: {result['traced_growth_bytes'] / MB:+.2f} MB "
+          f"({result['traced_slope_bytes_per_round'] / 1000:+.1f} KB/ronda)", file=sys.stderr)
+    if result["resident_growth_bytes"] is not None:
+        print(f"Memoria residente: {result['resident_growth_bytes'] / MB:+.2f} MB", file=sys.stderr)
+    failures = []
+    if result["traced_growth_bytes"] > args.max_growth_mb * MB:
+        failures.append(f"la memoria trazada crece {result['traced_growth_bytes'] / MB:.2f} MB (máximo {args.max_growth_mb} MB)")
+    if result["resident_growth_bytes"] is not None and result["resident_growth_bytes"] > args.max_rss_growth_mb * MB:
+        failures.append(f"la memoria residente crece {result['resident_growth_bytes'] / MB:.2f} MB (máximo {args.max_rss_growth_mb} MB)")
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    if failures:
+        print("Puntos de asignación que más han crecido desde el calentamiento:", file=sys.stderr)
+        for site in result["growth_sites"]:
+            print(f"   {site['size_diff'] / 1000:+10.1f} KB  {site['site']}", file=sys.stderr)
+        raise SystemExit(1)
+    print(f"✅ La memoria se estabiliza tras {args.warmup} rondas de calentamiento", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
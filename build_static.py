@@ -0,0 +1,30 @@
+"""
+Script para generar los recursos estáticos optimizados (huella, minificado y precompresión).
+Ejecutar en cada despliegue y tras modificar ficheros de app/frontend/static.
+"""
+import os
+
+from app.backend.core.static_assets import STATIC_SOURCE_DIR, STATIC_BUILD_DIR, build, brotli
+
+
+def build_static():
+    """Generar app/frontend/static_build y mostrar el ahorro por fichero"""
+    manifest = build()
+
+    for original, hashed in sorted(manifest.items()):
+        source_size = os.path.getsize(os.path.join(STATIC_SOURCE_DIR, original))
+        built = os.path.join(STATIC_BUILD_DIR, hashed)
+        sizes = [f"{os.path.getsize(built):>8} B"]
+        for suffix in (".gz", ".br"):
+            if os.path.exists(built + suffix):
+                sizes.append(f"{suffix[1:]} {os.path.getsize(built + suffix):>7} B")
+        print(f"   {original:<24} {source_size:>8} B -> {hashed:<36} {' | '.join(sizes)}")
+
+    print(f"\n✅ {len(manifest)} recursos generados en {STATIC_BUILD_DIR}")
+    if brotli is None:
+        print("   (instala 'brotli' para generar también variantes .br)")
+
+
+if __name__ == "__main__":
+    print("📦 Generando recursos estáticos...\n")
+    build_static()
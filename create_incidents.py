@@ -4,6 +4,8 @@ from sqlmodel import Session, select
 
 from app.backend.database import engine, init_db
 from app.backend.models import Incident
+from app.backend.repositories.incident_code_repository import IncidentCodeRepository
+from app.backend.core.constants import CODE_MIGRATION_BATCH_SIZE
 
 
 def seed_incidents():
@@ -409,6 +411,8 @@ def seed_incidents():
             incident = Incident(**data)
             session.add(incident)
         session.commit()
+        # Códigos y etiquetas canónicas de severidad y estado
+        IncidentCodeRepository(session).backfill(CODE_MIGRATION_BATCH_SIZE)
 
 
 if __name__ == "__main__":
@@ -6,6 +6,8 @@ import random
 from sqlmodel import Session, create_engine, select
 from app.backend.models.incident import Incident
 from app.backend.models.user import User
+from app.backend.repositories.incident_code_repository import IncidentCodeRepository
+from app.backend.core.constants import CODE_MIGRATION_BATCH_SIZE
 
 # Conectar a la base de datos
 engine = create_engine("sqlite:///cyberwatch.db")
@@ -138,4 +140,5 @@ with Session(engine) as session:
         print(f"✓ {code} - {incident.title[:50]}... → {owner_display} ({detected_at.strftime('%Y-%m-%d %H:%M')})")
     
     session.commit()
+    IncidentCodeRepository(session).backfill(CODE_MIGRATION_BATCH_SIZE)
     print(f"\n✅ Se crearon 23 incidentes exitosamente con fechas de las últimas 24 horas")